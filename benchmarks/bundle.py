@@ -0,0 +1,84 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark ``put_bundle()`` / ``get_bundle()`` against ``put_many()`` /
+``get_many()`` for many small files over SFTP.
+
+Example::
+
+  python benchmarks/bundle.py --files 1000 --size 4 --latency 20
+
+The stand-in SFTP server runs ``tar`` for exec requests and is reached through
+a proxy that adds ``--latency`` ms of round trip time, which is what makes
+per-file transfers slow.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp.tests.servers import SFTPServer
+
+from latency import LatencyProxy
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000, help='Number of files (default=1000)')
+    parser.add_argument('--size', type=int, default=4, help='File size in kB (default=4)')
+    parser.add_argument('--latency', type=float, default=20.0,
+                        help='Added round trip time in ms (default=20)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Workers for put_many / get_many (default=8)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+        tmpdir = Path(tmpdir)
+        local = tmpdir / 'local'
+        local.mkdir()
+        files = []
+        for ii in range(opt.files):
+            path = local / 'file{:05d}.dat'.format(ii)
+            path.write_bytes(os.urandom(opt.size * 1024))
+            files.append(str(path))
+        remote = tmpdir / 'remote'
+        for name in ('many', 'bundle'):
+            (remote / name).mkdir(parents=True)
+            (tmpdir / ('out_' + name)).mkdir()
+
+        with SFTPServer(remote, exec_tar=True) as server, \
+                LatencyProxy(server.host, server.port, opt.latency / 2000) as proxy:
+            session = ska_ftp.SFTP(proxy.host, server.user, server.passwd, port=proxy.port)
+            remotefiles = ['/many/' + os.path.basename(path) for path in files]
+
+            t0 = time.perf_counter()
+            session.put_many(list(zip(files, remotefiles)), workers=opt.workers).raise_errors()
+            put_many = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            session.put_bundle(files, '/bundle')
+            put_bundle = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            session.get_many([(path, str(tmpdir / 'out_many' / os.path.basename(path)))
+                              for path in remotefiles], workers=opt.workers).raise_errors()
+            get_many = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            session.get_bundle(remotefiles, str(tmpdir / 'out_bundle'))
+            get_bundle = time.perf_counter() - t0
+            session.close()
+
+    print('{} files x {} kB, {} ms RTT'.format(opt.files, opt.size, opt.latency))
+    print('put_many ({} workers) {:7.2f} s  put_bundle {:7.2f} s'
+          .format(opt.workers, put_many, put_bundle))
+    print('get_many ({} workers) {:7.2f} s  get_bundle {:7.2f} s'
+          .format(opt.workers, get_many, get_bundle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark the throughput / CPU tradeoff of ``compress=True`` for SFTP and FTP.
+
+Example::
+
+  python benchmarks/compression.py --sizes 10 --bandwidth 10 --latency 20
+
+For compressible (ASCII telemetry-like) and incompressible (random) files this
+reports ``get`` and ``put`` MB/s and CPU seconds per MB with and without
+compression.  The stand-in servers run in this process, so CPU time covers
+both the client and the server side.  Loopback has no bandwidth limit, which
+hides the benefit of compression, so use ``--bandwidth`` (MB/s) to route the
+connections through a rate-limited proxy (``--latency`` adds round trip time).
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp.tests.servers import SFTPServer, FTPServer
+
+from latency import LatencyProxy
+
+SERVERS = {'sftp': (SFTPServer, ska_ftp.SFTP),
+           'ftp': (FTPServer, ska_ftp.FTP)}
+
+TELEMETRY_LINE = '{:04d}:{:03d}:{:02d}:{:02d}:{:06.3f} {:>10s} {:>8.3f} {:>6d}\n'
+MSIDS = ['AOPCADMD', 'AOACASEQ', 'TEPHIN', 'TCYLAFT6', 'AOATTQT1', '4OHTRZ53']
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--protocols', nargs='+', default=['sftp', 'ftp'],
+                        choices=sorted(SERVERS), help='Protocols (default=sftp ftp)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10],
+                        help='File sizes in MB (default=10)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per benchmark, the median is reported (default=3)')
+    parser.add_argument('--bandwidth', type=float, default=0.0,
+                        help='Bandwidth limit in MB/s (default=0, no limit)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Added round trip time in ms (default=0)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def make_file(path, size_mb, kind):
+    """Write a ``size_mb`` MB file of ``kind`` 'text' (compressible) or 'random'."""
+    nbytes = size_mb * 2 ** 20
+    with open(path, 'wb') as fh:
+        if kind == 'random':
+            for _ in range(size_mb):
+                fh.write(os.urandom(2 ** 20))
+            return
+        ii = 0
+        while fh.tell() < nbytes:
+            lines = [TELEMETRY_LINE.format(2024, 1 + ii // 86400, ii // 3600 % 24,
+                                           ii // 60 % 60, ii % 60 + jj / 1000,
+                                           MSIDS[jj % len(MSIDS)], (ii * 7 + jj) % 1000 / 3,
+                                           jj)
+                     for jj in range(1000)]
+            fh.write(''.join(lines).encode('ascii'))
+            ii += 1
+        fh.truncate(nbytes)
+
+
+def measure(func, repeat):
+    """Median wall clock and process CPU time of ``func()`` over ``repeat`` runs."""
+    walls = []
+    cpus = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        func()
+        cpus.append(time.process_time() - c0)
+        walls.append(time.perf_counter() - t0)
+    return statistics.median(walls), statistics.median(cpus)
+
+
+def run_protocol(protocol, opt, tmpdir):
+    server_cls, session_cls = SERVERS[protocol]
+    remote = tmpdir / 'remote'
+    remote.mkdir()
+    rate = opt.bandwidth * 2 ** 20 if opt.bandwidth else None
+
+    with contextlib.ExitStack() as stack:
+        server = stack.enter_context(server_cls(remote, compress=True))
+        host, port = server.host, server.port
+        if opt.latency or rate:
+            proxy = stack.enter_context(LatencyProxy(host, port, opt.latency / 2000,
+                                                     ftp=protocol == 'ftp', rate=rate))
+            host, port = proxy.host, proxy.port
+
+        for size_mb in opt.sizes:
+            nbytes = size_mb * 2 ** 20
+            for kind in ('text', 'random'):
+                local = tmpdir / 'local.dat'
+                make_file(local, size_mb, kind)
+                for compress in (False, True):
+                    session = session_cls(host, server.user, server.passwd, port=port,
+                                          compress=compress)
+                    outfile = str(tmpdir / 'out.dat')
+                    for op in ('put', 'get'):
+                        if op == 'put':
+                            func = lambda: session.put(str(local), '/bench.dat')  # noqa: E731
+                        else:
+                            func = lambda: session.get('/bench.dat', outfile)  # noqa: E731
+                        wall, cpu = measure(func, opt.repeat)
+                        print('{:5s} {:4s} {:6s} {:>5} MB  compress={!s:5s} {:8.1f} MB/s '
+                              '{:7.3f} CPU s/MB'.format(protocol, op, kind, size_mb, compress,
+                                                        nbytes / 2 ** 20 / wall, cpu / size_mb))
+                    session.close()
+                for path in (local, tmpdir / 'out.dat', remote / 'bench.dat'):
+                    if path.exists():
+                        path.unlink()
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    for protocol in opt.protocols:
+        with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+            run_protocol(protocol, opt, Path(tmpdir))
+
+
+if __name__ == '__main__':
+    main()
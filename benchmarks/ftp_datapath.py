@@ -0,0 +1,94 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark client CPU per GB of the FTP ``put`` / ``get`` data path.
+
+Example::
+
+  python benchmarks/ftp_datapath.py --size 256 --block-sizes 8 128 1024
+
+The baseline is ``storbinary()`` / ``retrbinary()`` with the 8 KiB default
+block size and a ``fh.write`` callback, as used by ``FTP.put()`` and
+``FTP.get()`` before they switched to ``socket.sendfile()`` and ``recv_into()``
+on a reused buffer.  The stand-in server runs in this process, so only the CPU
+time of the calling thread (``time.thread_time()``) is reported along with the
+wall clock rate.
+"""
+
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp.tests.servers import FTPServer
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=256, help='File size in MB (default=256)')
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[8, 128, 1024],
+                        help='Block sizes in KiB for put / get (default=8 128 1024)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per benchmark, the median is reported (default=3)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def timed(func, repeat):
+    cpu = []
+    wall = []
+    for _ in range(repeat):
+        c0 = time.thread_time()
+        t0 = time.perf_counter()
+        func()
+        wall.append(time.perf_counter() - t0)
+        cpu.append(time.thread_time() - c0)
+    return statistics.median(cpu), statistics.median(wall)
+
+
+def report(name, direction, nbytes, cpu, wall):
+    print('{:22s} {:3s} {:7.2f} CPU s/GB  {:7.1f} MB/s'
+          .format(name, direction, cpu * 2 ** 30 / nbytes, nbytes / wall / 2 ** 20))
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+        tmpdir = Path(tmpdir)
+        remote = tmpdir / 'remote'
+        remote.mkdir()
+        local = tmpdir / 'local.dat'
+        nbytes = opt.size * 2 ** 20
+        with open(str(local), 'wb') as fh:
+            fh.truncate(nbytes)
+        out = str(tmpdir / 'out.dat')
+
+        with FTPServer(remote) as server:
+            session = ska_ftp.FTP(server.host, server.user, server.passwd, port=server.port)
+
+            def old_put():
+                with open(str(local), 'rb') as fh:
+                    session.storbinary('STOR /data.dat', fh)
+
+            def old_get():
+                with open(out, 'wb') as fh:
+                    session.retrbinary('RETR /data.dat', fh.write)
+
+            report('storbinary/retrbinary', 'put', nbytes, *timed(old_put, opt.repeat))
+            report('storbinary/retrbinary', 'get', nbytes, *timed(old_get, opt.repeat))
+
+            for block_kb in opt.block_sizes:
+                block_size = block_kb * 1024
+                name = 'block_size={} KiB'.format(block_kb)
+                cpu_wall = timed(lambda: session.put(str(local), '/data.dat',
+                                                     block_size=block_size), opt.repeat)
+                report(name, 'put', nbytes, *cpu_wall)
+                cpu_wall = timed(lambda: session.get('/data.dat', out,
+                                                     block_size=block_size), opt.repeat)
+                report(name, 'get', nbytes, *cpu_wall)
+            session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+TCP proxy that adds a fixed delay in each direction, to reproduce WAN-like
+round trip times against the local stand-in servers.
+
+Data are forwarded in arrival order, each chunk ``delay`` seconds after it
+was received, so the link keeps its bandwidth and only latency is added.  An
+optional ``rate`` limits the bandwidth in each direction as well.  For FTP the
+``227`` reply to PASV is rewritten so that data connections also go through a
+(one-shot) delayed proxy.
+"""
+
+import re
+import time
+import queue
+import socket
+import threading
+
+PASV_RE = re.compile(rb'227 .*\((\d+),(\d+),(\d+),(\d+),(\d+),(\d+)\)')
+
+
+def _pipe(src, dst, delay, rewrite=None, rate=None):
+    """Forward ``src`` to ``dst`` with ``delay`` seconds of added latency and
+    at most ``rate`` bytes/sec."""
+    pending = queue.Queue()
+
+    def reader():
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                if rewrite is not None:
+                    data = rewrite(data)
+                pending.put((time.monotonic() + delay, data))
+        except OSError:
+            pass
+        pending.put((time.monotonic() + delay, None))
+
+    def writer():
+        free_at = 0.0
+        try:
+            while True:
+                deliver, data = pending.get()
+                wait = max(deliver, free_at) - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                if data is None:
+                    break
+                dst.sendall(data)
+                if rate:
+                    free_at = max(free_at, time.monotonic()) + len(data) / rate
+        except OSError:
+            pass
+        # Pass on the half-close, the other direction may still be sending
+        try:
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    for target in (reader, writer):
+        threading.Thread(target=target, daemon=True).start()
+
+
+class LatencyProxy(object):
+    """Listen on 127.0.0.1 and forward connections to ``host:port`` with an
+    added one-way ``delay`` (sec) in each direction (round trip = 2 * delay).
+
+    :param host: target host
+    :param port: target port
+    :param delay: one-way delay (sec)
+    :param ftp: rewrite PASV replies so FTP data connections are delayed too
+    :param once: accept a single connection and then stop listening
+    :param rate: bandwidth limit in bytes/sec in each direction (default=None)
+    """
+    def __init__(self, host, port, delay, ftp=False, once=False, rate=None):
+        self.target = (host, port)
+        self.delay = delay
+        self.rate = rate
+        self.ftp = ftp
+        self.once = once
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(64)
+        self.host, self.port = self._sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _rewrite_pasv(self, data):
+        match = PASV_RE.search(data)
+        if match is None:
+            return data
+        numbers = [int(x) for x in match.groups()]
+        host = '.'.join(str(x) for x in numbers[:4])
+        data_proxy = LatencyProxy(host, numbers[4] * 256 + numbers[5], self.delay,
+                                  once=True, rate=self.rate).start()
+        port = data_proxy.port
+        reply = '227 Entering Passive Mode (127,0,0,1,{},{})'.format(port // 256, port % 256)
+        return data[:match.start()] + reply.encode() + data[match.end():]
+
+    def _serve(self):
+        while True:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                break
+            server = socket.create_connection(self.target)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _pipe(client, server, self.delay, rate=self.rate)
+            _pipe(server, client, self.delay, self._rewrite_pasv if self.ftp else None,
+                  self.rate)
+            if self.once:
+                self.stop()
+                break
@@ -0,0 +1,103 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark ``ska_ftp.publish()`` against a sequential loop over hosts.
+
+Example::
+
+  python benchmarks/publish.py --hosts 4 --files 5 --size 2 --bandwidth 20 --latency 20
+
+Each stand-in host gets its own server behind a latency / bandwidth limiting
+proxy, with the bandwidth of the last host halved so that it is the slowest.
+The sequential baseline connects to each host in turn and calls ``put()`` for
+each file (as done before ``publish()`` existed).  With ``publish()`` the
+total time should be close to that of the slowest host alone.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp.tests.servers import SFTPServer, FTPServer
+
+from latency import LatencyProxy
+
+SERVERS = {'sftp': (SFTPServer, ska_ftp.SFTP),
+           'ftp': (FTPServer, ska_ftp.FTP)}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--protocols', nargs='+', default=['sftp', 'ftp'],
+                        choices=sorted(SERVERS), help='Protocols (default=sftp ftp)')
+    parser.add_argument('--hosts', type=int, default=4, help='Number of hosts (default=4)')
+    parser.add_argument('--files', type=int, default=5, help='Number of files (default=5)')
+    parser.add_argument('--size', type=int, default=2, help='File size in MB (default=2)')
+    parser.add_argument('--bandwidth', type=float, default=20.0,
+                        help='Bandwidth limit per host in MB/s (default=20)')
+    parser.add_argument('--latency', type=float, default=20.0,
+                        help='Added round trip time in ms (default=20)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def run_protocol(protocol, opt, tmpdir):
+    server_cls, session_cls = SERVERS[protocol]
+    local = tmpdir / 'local'
+    local.mkdir()
+    files = []
+    for ii in range(opt.files):
+        path = local / 'file{:03d}.dat'.format(ii)
+        path.write_bytes(os.urandom(opt.size * 2 ** 20))
+        files.append(str(path))
+
+    with contextlib.ExitStack() as stack:
+        hosts = []
+        for ii in range(opt.hosts):
+            root = tmpdir / 'remote{}'.format(ii)
+            root.mkdir()
+            server = stack.enter_context(server_cls(root))
+            rate = opt.bandwidth * 2 ** 20 / (2 if ii == opt.hosts - 1 else 1)
+            proxy = stack.enter_context(LatencyProxy(server.host, server.port,
+                                                     opt.latency / 2000,
+                                                     ftp=protocol == 'ftp', rate=rate))
+            hosts.append((proxy.host, proxy.port))
+        netrcfile = tmpdir / 'netrc'
+        netrcfile.write_text('machine {} login {} password {}\n'
+                             .format(hosts[0][0], server.user, server.passwd))
+
+        host_times = []
+        t0 = time.perf_counter()
+        for host, port in hosts:
+            t1 = time.perf_counter()
+            session = session_cls(host, port=port, netrcfile=str(netrcfile))
+            session.makedirs('/pub', exist_ok=True)
+            for filename in files:
+                session.put(filename, '/pub/' + os.path.basename(filename))
+            session.close()
+            host_times.append(time.perf_counter() - t1)
+        sequential = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        report = ska_ftp.publish(files, ['{}:{}'.format(*host) for host in hosts], '/pub',
+                                 protocol=protocol, netrcfile=str(netrcfile))
+        parallel = time.perf_counter() - t0
+        report.raise_errors()
+
+    print('{:5s} {} hosts x {} files x {} MB: sequential {:6.2f} s  publish {:6.2f} s  '
+          'slowest host {:6.2f} s'.format(protocol, opt.hosts, opt.files, opt.size,
+                                          sequential, parallel, max(host_times)))
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    for protocol in opt.protocols:
+        with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+            run_protocol(protocol, opt, Path(tmpdir))
+
+
+if __name__ == '__main__':
+    main()
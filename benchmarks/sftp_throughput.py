@@ -0,0 +1,87 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark SFTP get/put throughput against a local paramiko SFTP server.
+
+Example::
+
+  python benchmarks/sftp_throughput.py --sizes 1 100 1000
+
+For each file size (MB) this reports MB/s for ``get`` and ``put`` for a grid of
+block sizes and outstanding request counts, plus the defaults chosen by
+``ska_ftp.sftp_tuning()``.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp.tests.servers import SFTPServer
+
+SETTINGS = [
+    # (block_size, max_requests); None means use the ska_ftp default
+    (None, None),
+    (32768, 1),
+    (32768, 16),
+    (32768, 64),
+    (65536, 64),
+    (65536, 256),
+]
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000],
+                        help='File sizes in MB (default=1 100 1000)')
+    parser.add_argument('--window-size', type=int,
+                        help='SSH window size in bytes (default=paramiko default)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def make_file(path, size_mb):
+    block = os.urandom(2 ** 20)
+    with open(path, 'wb') as fh:
+        for _ in range(size_mb):
+            fh.write(block)
+
+
+def timeit(func):
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+        tmpdir = Path(tmpdir)
+        remote = tmpdir / 'remote'
+        remote.mkdir()
+        with SFTPServer(remote) as server:
+            sftp = ska_ftp.SFTP(server.host, server.user, server.passwd, port=server.port,
+                                window_size=opt.window_size)
+            print('{:>8s} {:>10s} {:>12s} {:>10s} {:>10s}'.format(
+                'size_MB', 'block', 'max_requests', 'get_MB/s', 'put_MB/s'))
+            for size_mb in opt.sizes:
+                local = tmpdir / 'local.dat'
+                make_file(local, size_mb)
+                for block_size, max_requests in SETTINGS:
+                    dt_put = timeit(lambda: sftp.put(local, '/bench.dat',
+                                                     block_size=block_size))
+                    dt_get = timeit(lambda: sftp.get('/bench.dat', tmpdir / 'out.dat',
+                                                     block_size=block_size,
+                                                     max_requests=max_requests))
+                    print('{:8d} {:>10s} {:>12s} {:10.1f} {:10.1f}'.format(
+                        size_mb, str(block_size or 'default'),
+                        str(max_requests or 'default'),
+                        size_mb / dt_get, size_mb / dt_put))
+                    os.unlink(tmpdir / 'out.dat')
+                os.unlink(local)
+            sftp.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark import time and startup of a short-lived script using ska_ftp.
+
+Example::
+
+  python benchmarks/startup.py --repeat 20
+
+Each case runs in a fresh interpreter and the median wall time is reported,
+less that of ``python -c pass``.  The "no-op run" cases create a session to
+a stand-in server and exit without using it, eagerly or with ``lazy=True``.
+Run ``python -m compileall ska_ftp`` first so that the times do not include
+compiling the sources.
+"""
+
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+from ska_ftp.tests.servers import SFTPServer, FTPServer
+
+CASES = [
+    ('import ska_ftp', 'import ska_ftp'),
+    ('ska_ftp.__version__', 'import ska_ftp; ska_ftp.__version__'),
+    ('ska_ftp.FTP', 'import ska_ftp; ska_ftp.FTP'),
+    ('ska_ftp.SFTP + paramiko', 'import ska_ftp, paramiko; ska_ftp.SFTP'),
+]
+
+SESSION = ('import sys, ska_ftp; '
+           'ska_ftp.{cls}(sys.argv[1], sys.argv[2], sys.argv[3], port=int(sys.argv[4]), '
+           'lazy={lazy})')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Runs per case, the median is reported (default=20)')
+    return parser
+
+
+def run(code, args=(), repeat=20):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code] + list(args), check=True)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    base = run('pass', repeat=opt.repeat)
+    print('{:32s} {:7.1f} ms'.format('python -c pass', base * 1000))
+    for name, code in CASES:
+        print('{:32s} {:+7.1f} ms'.format(name, (run(code, repeat=opt.repeat) - base) * 1000))
+
+    # Clients exiting without closing make the stand-in SSH server log errors
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for server_cls, cls in ((SFTPServer, 'SFTP'), (FTPServer, 'FTP')):
+            with server_cls(Path(tmpdir)) as server:
+                args = [server.host, server.user, server.passwd, str(server.port)]
+                for lazy in (False, True):
+                    elapsed = run(SESSION.format(cls=cls, lazy=lazy), args, opt.repeat)
+                    print('{:32s} {:+7.1f} ms'.format('no-op run {}(lazy={})'.format(cls, lazy),
+                                                      (elapsed - base) * 1000))
+
+
+if __name__ == '__main__':
+    main()
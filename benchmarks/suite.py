@@ -0,0 +1,219 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark suite for ska_ftp against local stand-in SFTP and FTP servers.
+
+Example::
+
+  python benchmarks/suite.py --output results-v4.json
+  python benchmarks/suite.py --latency 20 --compare results-v4.json
+
+This measures connect + login time, ``ls`` and ``ls_entries`` on directories of
+10, 1000 and 100000 entries, ``walk`` of a tree of directories with 1 and 8
+workers, deleting files one at a time versus ``delete_many()`` and ``get`` /
+``put`` throughput for a range of file sizes, for both
+protocols on loopback.  With ``--latency MS`` every
+connection goes through a proxy that adds MS milliseconds of round trip time
+(FTP data connections included).  Each benchmark reports the median of
+``--repeat`` runs.  Results are written as JSON with ``--output`` and can be
+compared to an earlier run with ``--compare``.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp.tests.servers import SFTPServer, FTPServer
+
+from latency import LatencyProxy
+
+SERVERS = {'sftp': (SFTPServer, ska_ftp.SFTP),
+           'ftp': (FTPServer, ska_ftp.FTP)}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--protocols', nargs='+', default=['sftp', 'ftp'],
+                        choices=sorted(SERVERS), help='Protocols (default=sftp ftp)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100],
+                        help='File sizes in MB for get/put (default=1 10 100)')
+    parser.add_argument('--ls-counts', type=int, nargs='+', default=[10, 1000, 100000],
+                        help='Directory sizes for ls (default=10 1000 100000)')
+    parser.add_argument('--walk-dirs', type=int, default=200,
+                        help='Number of directories in the walk tree (default=200)')
+    parser.add_argument('--batch-files', type=int, default=500,
+                        help='Number of files for the delete benchmark (default=500)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per benchmark, the median is reported (default=3)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Added round trip time in ms (default=0)')
+    parser.add_argument('--only', nargs='+',
+                        choices=['connect', 'ls', 'walk', 'batch', 'get', 'put'],
+                        help='Run only these benchmarks')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Compare to results in this JSON file')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def median_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def make_file(path, size_mb):
+    block = os.urandom(2 ** 20)
+    with open(path, 'wb') as fh:
+        for _ in range(size_mb):
+            fh.write(block)
+
+
+def make_dir(path, n_entries):
+    path.mkdir(exist_ok=True)
+    for ii in range(n_entries):
+        (path / 'file{:06d}.dat'.format(ii)).touch()
+
+
+def make_tree(path, n_dirs, fanout=10):
+    """Directory tree of ``n_dirs`` directories, ``fanout`` per parent, 5 files each"""
+    dirs = [path]
+    path.mkdir(exist_ok=True)
+    for ii in range(n_dirs):
+        subdir = dirs[ii // fanout] / 'dir{:04d}'.format(ii)
+        subdir.mkdir()
+        dirs.append(subdir)
+        for jj in range(5):
+            (subdir / 'file{}.dat'.format(jj)).touch()
+
+
+def run_protocol(protocol, opt, tmpdir):
+    """Run all benchmarks for ``protocol`` and return a list of result dicts."""
+    server_cls, session_cls = SERVERS[protocol]
+    remote = tmpdir / 'remote'
+    remote.mkdir(exist_ok=True)
+    results = []
+    only = set(opt.only or ['connect', 'ls', 'walk', 'batch', 'get', 'put'])
+
+    def add(bench, param, seconds, nbytes=None):
+        result = {'protocol': protocol, 'bench': bench, 'param': param, 'seconds': seconds}
+        if nbytes:
+            result['MB_per_s'] = nbytes / 2 ** 20 / seconds
+        results.append(result)
+        print('{:5s} {:12s} {:>8} {:10.4f} s {}'.format(
+            protocol, bench, param, seconds,
+            '{:8.1f} MB/s'.format(result['MB_per_s']) if nbytes else ''))
+
+    with contextlib.ExitStack() as stack:
+        server = stack.enter_context(server_cls(remote))
+        host, port = server.host, server.port
+        if opt.latency:
+            proxy = stack.enter_context(LatencyProxy(host, port, opt.latency / 2000,
+                                                     ftp=protocol == 'ftp'))
+            host, port = proxy.host, proxy.port
+
+        def connect():
+            return session_cls(host, server.user, server.passwd, port=port)
+
+        if 'connect' in only:
+            add('connect', '', median_time(lambda: connect().close(), opt.repeat))
+
+        session = connect()
+        if 'ls' in only:
+            for n_entries in opt.ls_counts:
+                dirname = 'ls{}'.format(n_entries)
+                make_dir(remote / dirname, n_entries)
+                add('ls', n_entries,
+                    median_time(lambda: session.ls('/' + dirname), opt.repeat))
+                add('ls_entries', n_entries,
+                    median_time(lambda: session.ls_entries('/' + dirname), opt.repeat))
+
+        if 'walk' in only:
+            make_tree(remote / 'tree', opt.walk_dirs)
+            for workers in (1, 8):
+                add('walk', 'w{}'.format(workers),
+                    median_time(lambda: list(session.walk('/tree', workers=workers)),
+                                opt.repeat))
+
+        if 'batch' in only:
+            paths = ['/batch/file{:06d}.dat'.format(ii) for ii in range(opt.batch_files)]
+
+            def delete_each():
+                for path in paths:
+                    session.delete(path)
+
+            for bench, func in (('delete', delete_each),
+                                ('delete_many', lambda: session.delete_many(paths))):
+                times = []
+                for _ in range(opt.repeat):
+                    make_dir(remote / 'batch', opt.batch_files)
+                    times.append(median_time(func, 1))
+                add(bench, opt.batch_files, statistics.median(times))
+
+        for size_mb in opt.sizes:
+            local = tmpdir / 'local.dat'
+            make_file(local, size_mb)
+            nbytes = size_mb * 2 ** 20
+            if 'put' in only:
+                add('put', size_mb, median_time(lambda: session.put(str(local), '/bench.dat'),
+                                                opt.repeat), nbytes)
+            if 'get' in only:
+                if not (remote / 'bench.dat').exists():
+                    session.put(str(local), '/bench.dat')
+                add('get', size_mb,
+                    median_time(lambda: session.get('/bench.dat', str(tmpdir / 'out.dat')),
+                                opt.repeat), nbytes)
+            for path in (local, tmpdir / 'out.dat', remote / 'bench.dat'):
+                if path.exists():
+                    path.unlink()
+        session.close()
+    return results
+
+
+def compare(results, filename):
+    with open(filename) as fh:
+        old = json.load(fh)
+    old_results = {(r['protocol'], r['bench'], r['param']): r for r in old['results']}
+    print()
+    print('Compared to {} (version {}, latency {} ms): time ratio new / old'
+          .format(filename, old.get('version'), old.get('latency_ms')))
+    for result in results:
+        key = (result['protocol'], result['bench'], result['param'])
+        if key in old_results:
+            print('{:5s} {:12s} {:>8} {:8.2f}'.format(
+                *key, result['seconds'] / old_results[key]['seconds']))
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    results = []
+    for protocol in opt.protocols:
+        with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+            results.extend(run_protocol(protocol, opt, Path(tmpdir)))
+
+    if opt.output:
+        out = {'version': getattr(ska_ftp, '__version__', None),
+               'python': sys.version.split()[0],
+               'platform': platform.platform(),
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'latency_ms': opt.latency,
+               'repeat': opt.repeat,
+               'results': results}
+        with open(opt.output, 'w') as fh:
+            json.dump(out, fh, indent=2)
+    if opt.compare:
+        compare(results, opt.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark latency of small urgent uploads while a bulk backfill saturates a
+shared process-wide rate limit.
+
+Example::
+
+  python benchmarks/throttle.py --rate 10 --bulk-files 8 --bulk-size 4
+
+A background ``put_many()`` of large files runs at ``LOW`` priority (or
+``NORMAL`` for the baseline) while small files are uploaded one at a time at
+``HIGH`` priority.  The median and maximum upload time of the small files are
+reported for both cases.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import statistics
+import threading
+from pathlib import Path
+
+import ska_ftp
+from ska_ftp import throttle
+from ska_ftp.tests.servers import SFTPServer, FTPServer
+
+SERVERS = {'sftp': (SFTPServer, ska_ftp.SFTP),
+           'ftp': (FTPServer, ska_ftp.FTP)}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--protocols', nargs='+', default=['sftp', 'ftp'],
+                        choices=sorted(SERVERS), help='Protocols (default=sftp ftp)')
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help='Process rate limit in MB/s (default=10)')
+    parser.add_argument('--bulk-files', type=int, default=8,
+                        help='Number of background files (default=8)')
+    parser.add_argument('--bulk-size', type=int, default=4,
+                        help='Background file size in MB (default=4)')
+    parser.add_argument('--urgent-files', type=int, default=10,
+                        help='Number of urgent files (default=10)')
+    parser.add_argument('--urgent-size', type=int, default=64,
+                        help='Urgent file size in kB (default=64)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def run_case(server, session_cls, bulk, urgent, bulk_priority):
+    bulk_session = session_cls(server.host, server.user, server.passwd, port=server.port)
+    urgent_session = session_cls(server.host, server.user, server.passwd, port=server.port)
+    thread = threading.Thread(target=bulk_session.put_many,
+                              args=([(path, '/bulk_' + os.path.basename(path)) for path in bulk],),
+                              kwargs={'workers': 4, 'priority': bulk_priority})
+    thread.start()
+    time.sleep(0.5)
+    times = []
+    for path in urgent:
+        t0 = time.perf_counter()
+        urgent_session.put(path, '/urgent_' + os.path.basename(path), priority=throttle.HIGH)
+        times.append(time.perf_counter() - t0)
+    thread.join()
+    bulk_session.close()
+    urgent_session.close()
+    return times
+
+
+def run_protocol(protocol, opt, tmpdir):
+    server_cls, session_cls = SERVERS[protocol]
+    remote = tmpdir / 'remote'
+    remote.mkdir()
+    bulk = []
+    for ii in range(opt.bulk_files):
+        path = tmpdir / 'bulk{:03d}.dat'.format(ii)
+        path.write_bytes(os.urandom(opt.bulk_size * 2 ** 20))
+        bulk.append(str(path))
+    urgent = []
+    for ii in range(opt.urgent_files):
+        path = tmpdir / 'urgent{:03d}.dat'.format(ii)
+        path.write_bytes(os.urandom(opt.urgent_size * 1024))
+        urgent.append(str(path))
+
+    throttle.set_process_limit(opt.rate * 2 ** 20)
+    try:
+        with server_cls(remote) as server:
+            for name, bulk_priority in (('same class', throttle.HIGH),
+                                        ('bulk LOW', throttle.LOW)):
+                times = run_case(server, session_cls, bulk, urgent, bulk_priority)
+                print('{:5s} {:10s} urgent put median {:6.3f} s  max {:6.3f} s'
+                      .format(protocol, name, statistics.median(times), max(times)))
+    finally:
+        throttle.set_process_limit(None)
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    for protocol in opt.protocols:
+        with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+            run_protocol(protocol, opt, Path(tmpdir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Benchmark recovery of the transfer queue worker after it is killed mid-run.
+
+Example::
+
+  python benchmarks/transfer_queue.py --files 20 --size 4 --bandwidth 20 --kill-after 2
+
+The same uploads are done by a plain script that loops over ``put()`` and by
+``ska_ftp_worker`` draining a ``TransferQueue``, each in a subprocess that is
+killed (SIGKILL) after ``--kill-after`` seconds and then started again.  The
+connections go through a bandwidth-limited proxy.  After the restart the plain
+script has to send everything again, while the worker skips finished files and
+resumes the interrupted one.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from ska_ftp.transfer_queue import TransferQueue
+from ska_ftp.tests.servers import SFTPServer
+
+from latency import LatencyProxy
+
+SCRIPT = """
+import sys, glob, os, ska_ftp
+host, port, netrcfile, local = sys.argv[1:]
+session = ska_ftp.SFTP(host, port=int(port), netrcfile=netrcfile)
+for filename in sorted(glob.glob(os.path.join(local, '*.dat'))):
+    session.put(filename, '/script/' + os.path.basename(filename))
+session.close()
+"""
+
+WORKER = """
+import sys
+from ska_ftp.transfer_queue import worker_main
+worker_main(['--queue', sys.argv[1], '--netrc', sys.argv[2], '--sessions-per-host', '1'])
+"""
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=20, help='Number of files (default=20)')
+    parser.add_argument('--size', type=int, default=4, help='File size in MB (default=4)')
+    parser.add_argument('--bandwidth', type=float, default=20.0,
+                        help='Bandwidth limit in MB/s (default=20)')
+    parser.add_argument('--kill-after', type=float, default=2.0,
+                        help='Kill the first run after this many seconds (default=2)')
+    parser.add_argument('--tmpdir', help='Directory for test files (default=system tmp)')
+    return parser
+
+
+def run_killed(args, kill_after):
+    """Run ``args``, kill it after ``kill_after`` sec, then run it again to completion.
+
+    :returns: elapsed time of the second run
+    """
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+    time.sleep(kill_after)
+    proc.kill()
+    proc.wait()
+    t0 = time.perf_counter()
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    with tempfile.TemporaryDirectory(dir=opt.tmpdir) as tmpdir:
+        tmpdir = Path(tmpdir)
+        local = tmpdir / 'local'
+        local.mkdir()
+        files = []
+        for ii in range(opt.files):
+            path = local / 'file{:03d}.dat'.format(ii)
+            path.write_bytes(os.urandom(opt.size * 2 ** 20))
+            files.append(str(path))
+        remote = tmpdir / 'remote'
+        (remote / 'script').mkdir(parents=True)
+        (remote / 'queue').mkdir()
+
+        with SFTPServer(remote) as server, \
+                LatencyProxy(server.host, server.port, 0.0,
+                             rate=opt.bandwidth * 2 ** 20) as proxy:
+            netrcfile = tmpdir / 'netrc'
+            netrcfile.write_text('machine {} login {} password {}\n'
+                                 .format(proxy.host, server.user, server.passwd))
+            os.chmod(str(netrcfile), 0o600)
+
+            script = run_killed([sys.executable, '-c', SCRIPT, proxy.host, str(proxy.port),
+                                 str(netrcfile), str(local)], opt.kill_after)
+
+            queuefile = str(tmpdir / 'queue.db')
+            with TransferQueue(queuefile) as queue:
+                queue.put('{}:{}'.format(proxy.host, proxy.port),
+                          [(path, '/queue/' + os.path.basename(path)) for path in files])
+            worker = run_killed([sys.executable, '-c', WORKER, queuefile, str(netrcfile)],
+                                opt.kill_after)
+            with TransferQueue(queuefile) as queue:
+                counts = queue.counts()
+
+    total_mb = opt.files * opt.size
+    print('{} files x {} MB at {} MB/s ({:.1f} s), killed after {} s'
+          .format(opt.files, opt.size, opt.bandwidth, total_mb / opt.bandwidth, opt.kill_after))
+    print('put() loop restarted      {:6.2f} s'.format(script))
+    print('ska_ftp_worker restarted  {:6.2f} s  ({done} done, {failed} failed)'
+          .format(worker, **counts))
+
+
+if __name__ == '__main__':
+    main()
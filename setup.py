@@ -28,4 +28,7 @@ setup(name=name,
       package_dir=package_dir,
       tests_require=['pytest'],
       cmdclass=cmdclass,
+      entry_points={'console_scripts': ['ska_ftp_publish=ska_ftp.multihost:main',
+                                        'ska_ftp=ska_ftp.transfer_queue:main',
+                                        'ska_ftp_worker=ska_ftp.transfer_queue:worker_main']},
       )
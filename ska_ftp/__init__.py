@@ -1,9 +1,46 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
-import ska_helpers
+import importlib
 
-from .ftp import *
+__all__ = ['SFTP', 'FTP', 'parse_netrc', 'sftp_tuning', 'FTP_BLOCK_SIZE', 'SessionPool',
+           'RemoteEntry', 'publish', 'TransferQueue']
 
-__version__ = ska_helpers.get_version('ska_ftp')
+# Public names and the submodule defining them, imported on first access so
+# that ``import ska_ftp`` does not pay for ftplib, paramiko, sqlite3 etc.
+_LAZY = {'SFTP': 'ftp', 'FTP': 'ftp', 'parse_netrc': 'ftp', 'sftp_tuning': 'ftp',
+         'FTP_BLOCK_SIZE': 'ftp', 'SessionPool': 'pool', 'RemoteEntry': 'listing',
+         'publish': 'multihost', 'TransferQueue': 'transfer_queue'}
+
+# Submodules, so that e.g. ``ska_ftp.manifest`` works after ``import ska_ftp``
+_SUBMODULES = {'aio', 'bundle', 'cache', 'compress', 'ftp', 'listing', 'manifest', 'metrics',
+               'multihost', 'parallel', 'pool', 'retry', 'sftp_io', 'stream', 'sync',
+               'throttle', 'transfer_queue', 'verify', 'walk'}
+
+
+def __getattr__(name):
+    if name == '__version__':
+        import ska_helpers
+        value = ska_helpers.get_version('ska_ftp')
+    elif name in _LAZY:
+        value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    elif name.startswith('__'):
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    else:
+        # Names that used to come from ``from .ftp import *``, and the
+        # submodules that ska_ftp.ftp imports
+        ftp = importlib.import_module('.ftp', __name__)
+        if name in globals():
+            return globals()[name]
+        if name.startswith('_') or not hasattr(ftp, name):
+            raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+        value = getattr(ftp, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
 
 def test(*args, **kwargs):
@@ -0,0 +1,261 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+asyncio interface to SFTP and FTP servers.
+
+``AsyncSFTP`` and ``AsyncFTP`` provide coroutine versions of the ``SFTP`` and
+``FTP`` methods.  Each call runs on a session from a ``SessionPool`` in a small
+thread pool, so the event loop is never blocked.  The number of operations in
+flight to one host is bounded by an ``asyncio.Semaphore`` shared by every
+object for that host, and waiting operations hold no thread.  A process can
+therefore start hundreds of transfers with ``asyncio.gather()`` while only
+``max_per_host`` threads and connections per host are in use::
+
+  async with ska_ftp.aio.AsyncSFTP('lucky') as lucky:
+      await lucky.cd('/home/user')
+      await asyncio.gather(*(lucky.put(filename) for filename in filenames))
+"""
+
+import os
+import time
+import asyncio
+import weakref
+import posixpath
+import concurrent.futures
+
+from .pool import SessionPool, PROTOCOLS
+from .parallel import Result, Report
+
+__all__ = ['AsyncSFTP', 'AsyncFTP']
+
+# event loop => {(protocol, host, port): asyncio.Semaphore}
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _host_semaphore(protocol, host, port, limit):
+    """Semaphore bounding concurrent operations to ``host`` in the running event loop.
+
+    The semaphore is created with ``limit`` on first use and then shared by
+    every async session for the same (protocol, host, port).
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _semaphores.setdefault(loop, {})
+    key = (protocol, host, port)
+    if key not in semaphores:
+        semaphores[key] = asyncio.Semaphore(limit)
+    return semaphores[key]
+
+
+class _AsyncSession(object):
+    protocol = None
+    default_dir = None
+
+    def __init__(self, host, user=None, passwd=None, netrcfile=None, logger=None,
+                 port=None, max_per_host=4, **kwargs):
+        self.host = host
+        self.user = user
+        self._passwd = passwd
+        self.port = PROTOCOLS[self.protocol][1] if port is None else port
+        self.logger = logger
+        self.max_per_host = max_per_host
+        self._kwargs = kwargs
+        self._cwd = None
+        self._pool = SessionPool(max_per_host=max_per_host, netrcfile=netrcfile,
+                                 logger=logger)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_per_host, thread_name_prefix='ska_ftp-' + host)
+
+    async def __aenter__(self):
+        # Connect up front so that login errors are raised here
+        await self._run(lambda session: None)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Close all sessions and stop the worker threads.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._pool.close)
+        self._executor.shutdown(wait=False)
+
+    def _session(self):
+        return self._pool.session(self.host, user=self.user, passwd=self._passwd,
+                                  port=self.port, protocol=self.protocol, **self._kwargs)
+
+    async def _run(self, func):
+        """Run ``func(session)`` on a pooled session in a worker thread.
+        """
+        def call():
+            with self._session() as session:
+                return func(session)
+
+        async with _host_semaphore(self.protocol, self.host, self.port, self.max_per_host):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, call)
+
+    def _path(self, path):
+        """Resolve remote ``path`` against the directory set by ``cd()``.
+
+        Pooled sessions are shared between calls, so the working directory is
+        kept here and applied to each path instead of on the server.
+        """
+        if self._cwd is None:
+            return path
+        return posixpath.join(self._cwd, os.fspath(path))
+
+    async def cd(self, dirname):
+        """Change to specified directory ``dirname``.
+
+        :param dirname: directory name
+        """
+        def cd(session):
+            session.cd(self._path(dirname))
+            return session._cwd()
+
+        self._cwd = await self._run(cd)
+
+    async def ls(self, dirname=None):
+        """List contents of directory ``dirname``.
+
+        :param dirname: directory name (default=current directory)
+        :returns: list of file and/or directory names
+        """
+        dirname = self._path(self.default_dir if dirname is None else dirname)
+        return await self._run(lambda session: session.ls(dirname))
+
+    async def ls_full(self, dirname=None):
+        """List full contents of directory ``dirname``.
+
+        :param dirname: directory name (default=current directory)
+        :returns: list of full output lines for LIST command
+        """
+        dirname = self._path(self.default_dir if dirname is None else dirname)
+        return await self._run(lambda session: session.ls_full(dirname))
+
+    async def put(self, localfile, remotefile=None, **kwargs):
+        """Put the ``localfile`` to the server as ``remotefile``.
+
+        :param localfile: file name on local host
+        :param remotefile: file name on remote host (default=localfile)
+        :param **kwargs: additional keyword args for ``put()``
+        """
+        if remotefile is None:
+            remotefile = os.path.basename(localfile)
+        remotefile = self._path(remotefile)
+        return await self._run(lambda session: session.put(localfile, remotefile, **kwargs))
+
+    async def get(self, remotefile, localfile=None, **kwargs):
+        """Get the ``remotefile`` from the server as ``localfile`` on the local host.
+
+        :param remotefile: file name on remote host
+        :param localfile: file name on local host (default=remotefile)
+        :param **kwargs: additional keyword args for ``get()``
+        """
+        if localfile is None:
+            localfile = os.path.basename(remotefile)
+        remotefile = self._path(remotefile)
+        return await self._run(lambda session: session.get(remotefile, localfile, **kwargs))
+
+    async def _transfer_many(self, method, pairs):
+        items = [(pair, None) if isinstance(pair, (str, os.PathLike)) else tuple(pair)
+                 for pair in pairs]
+
+        async def transfer(item):
+            t0 = time.time()
+            try:
+                value = await getattr(self, method)(*item)
+            except Exception as err:
+                return Result(item, error=err, elapsed=time.time() - t0)
+            return Result(item, value, elapsed=time.time() - t0)
+
+        return Report(await asyncio.gather(*(transfer(item) for item in items)))
+
+    async def put_many(self, pairs):
+        """Put many files concurrently (up to ``max_per_host`` at a time).
+
+        :param pairs: list of localfile or (localfile, remotefile)
+        :returns: ska_ftp.parallel.Report
+        """
+        return await self._transfer_many('put', pairs)
+
+    async def get_many(self, pairs):
+        """Get many files concurrently (up to ``max_per_host`` at a time).
+
+        :param pairs: list of remotefile or (remotefile, localfile)
+        :returns: ska_ftp.parallel.Report
+        """
+        return await self._transfer_many('get', pairs)
+
+    async def mkdir(self, remotedir):
+        """Make remote directory
+
+        :param remotedir: dir name on remote host
+        """
+        remotedir = self._path(remotedir)
+        await self._run(lambda session: session.mkdir(remotedir))
+
+    async def rename(self, oldpath, newpath):
+        """Rename remote ``oldpath`` to ``newpath``
+
+        :param oldpath: old path on remote
+        :param newpath: new path on remote
+        """
+        oldpath, newpath = self._path(oldpath), self._path(newpath)
+        await self._run(lambda session: session.rename(oldpath, newpath))
+
+    async def delete(self, path):
+        """Delete ``path`` file
+
+        :param path: path on remote to delete
+        """
+        path = self._path(path)
+        await self._run(lambda session: session.delete(path))
+
+    async def rmdir(self, path):
+        """Delete ``path`` directory
+
+        :param path: path on remote to delete
+        """
+        path = self._path(path)
+        await self._run(lambda session: session.rmdir(path))
+
+
+class AsyncSFTP(_AsyncSession):
+    """asyncio version of ``ska_ftp.SFTP``.
+
+    Sessions are opened on demand, up to ``max_per_host`` per host, and are
+    reused between calls.  User and password default to the netrc values as
+    for ``SFTP``.
+
+    :param host: sftp host name
+    :param user: user name (default=netrc value)
+    :param passwd: password (default=netrc value)
+    :param netrcfile: netrc file name (default=~/.netrc)
+    :param logger: logger object (e.g. pyyaks.logger.get_logger())
+    :param port: sftp port on host (default=22)
+    :param max_per_host: maximum number of concurrent operations to ``host``
+    :param **kwargs: additional keyword args for ``SFTP``
+    """
+    protocol = 'sftp'
+    default_dir = '.'
+
+
+class AsyncFTP(_AsyncSession):
+    """asyncio version of ``ska_ftp.FTP``.
+
+    Sessions are opened on demand, up to ``max_per_host`` per host, and are
+    reused between calls.  User and password default to the netrc values as
+    for ``FTP``.
+
+    :param host: ftp host name
+    :param user: user name (default=netrc value)
+    :param passwd: password (default=netrc value)
+    :param netrcfile: netrc file name (default=~/.netrc)
+    :param logger: logger object (e.g. pyyaks.logger.get_logger())
+    :param port: ftp port on host (default=21)
+    :param max_per_host: maximum number of concurrent operations to ``host``
+    :param **kwargs: additional keyword args for ``FTP``
+    """
+    protocol = 'ftp'
+    default_dir = ''
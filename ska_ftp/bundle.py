@@ -0,0 +1,171 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Transfer many small files as one streamed tar archive over SFTP.
+
+For small files the time of ``put_many()`` and ``get_many()`` is dominated by
+the open / write / close / stat round trips of each file.  If the server
+allows command execution, ``put_bundle()`` and ``get_bundle()`` instead run
+``tar`` on the server in an exec channel of the same SSH transport as the SFTP
+session and stream a single (optionally compressed) archive through it, so
+the transfer is limited by bandwidth instead of latency.  Otherwise they fall
+back to concurrent per-file transfers with ``put_many()`` / ``get_many()``.
+"""
+
+import os
+import shlex
+import shutil
+import tarfile
+import posixpath
+import threading
+
+__all__ = ['put_bundle', 'get_bundle']
+
+# Flag for the remote tar and tarfile stream mode for each compression
+COMPRESSIONS = {None: ('', ''), 'gz': ('z', 'gz'), 'bz2': ('j', 'bz2'), 'xz': ('J', 'xz')}
+
+
+def _check_names(paths):
+    """Base names of ``paths``, which must be unique"""
+    names = [os.path.basename(path.rstrip('/')) for path in paths]
+    if len(set(names)) != len(names):
+        raise ValueError('file base names must be unique')
+    return names
+
+
+def _compression(compress):
+    try:
+        return COMPRESSIONS[compress]
+    except KeyError:
+        raise ValueError('compress must be one of None, {}'.format(
+            ', '.join(repr(key) for key in COMPRESSIONS if key is not None)))
+
+
+def _can_exec_tar(session):
+    """True if ``tar`` can be run on the server of SFTP ``session``.
+
+    The result is cached on the session.
+    """
+    if session._exec_tar is None:
+        import paramiko
+
+        channel = session.ftp.get_channel().get_transport().open_session()
+        try:
+            channel.exec_command('tar --version')
+            session._exec_tar = channel.recv_exit_status() == 0
+        except paramiko.SSHException:
+            session._exec_tar = False
+        finally:
+            channel.close()
+        if not session._exec_tar and session.logger:
+            session.logger.info('ska_ftp: {} does not allow tar, bundles use put_many / '
+                                'get_many'.format(session.host))
+    return session._exec_tar
+
+
+def _exec(session, command):
+    """Open an exec channel on the session's transport and run ``command``"""
+    channel = session.ftp.get_channel().get_transport().open_session()
+    channel.exec_command(command)
+    return channel
+
+
+def _wait(session, channel, command):
+    """Wait for the remote command and raise IOError if it failed"""
+    status = channel.recv_exit_status()
+    stderr = channel.makefile_stderr('rb').read().decode('utf-8', 'replace').strip()
+    if status != 0:
+        raise IOError('{} on {} failed with status {}: {}'
+                      .format(command, session.host, status, stderr))
+
+
+def put_bundle(session, files, remote_dir, compress=None, workers=4):
+    """Put local ``files`` into ``remote_dir`` as one streamed tar archive.
+
+    Each file is written to ``remote_dir/<basename>``, so base names must be
+    unique.  ``remote_dir`` must exist.
+
+    :param session: ska_ftp.SFTP session
+    :param files: list of local file names
+    :param remote_dir: remote directory
+    :param compress: compress the archive with 'gz', 'bz2' or 'xz' (default=None)
+    :param workers: concurrent transfers for the per-file fallback
+    :returns: list of remote file names
+    """
+    names = _check_names(files)
+    flag, mode = _compression(compress)
+    remotefiles = [posixpath.join(remote_dir, name) for name in names]
+
+    if not _can_exec_tar(session):
+        session.put_many(list(zip(files, remotefiles)), workers=workers).raise_errors()
+        return remotefiles
+
+    base = session.ftp.getcwd() or session.ftp.normalize('.')
+    command = 'tar -x{} -f - -C {}'.format(flag, shlex.quote(posixpath.join(base, remote_dir)))
+    channel = _exec(session, command)
+    try:
+        with channel.makefile('wb') as stream:
+            with tarfile.open(fileobj=stream, mode='w|' + mode) as tar:
+                for filename, name in zip(files, names):
+                    tar.add(filename, arcname=name, recursive=False)
+        channel.shutdown_write()
+        _wait(session, channel, command)
+    finally:
+        channel.close()
+    session._invalidate(*remotefiles)
+    return remotefiles
+
+
+def get_bundle(session, remote_paths, local_dir, compress=None, workers=4):
+    """Get ``remote_paths`` into ``local_dir`` as one streamed tar archive.
+
+    Each file is written to ``local_dir/<basename>``, so base names must be
+    unique.
+
+    :param session: ska_ftp.SFTP session
+    :param remote_paths: list of remote file names
+    :param local_dir: local directory
+    :param compress: compress the archive with 'gz', 'bz2' or 'xz' (default=None)
+    :param workers: concurrent transfers for the per-file fallback
+    :returns: list of local file names
+    """
+    names = _check_names(remote_paths)
+    flag, _ = _compression(compress)
+    localfiles = [os.path.join(local_dir, name) for name in names]
+
+    if not _can_exec_tar(session):
+        session.get_many(list(zip(remote_paths, localfiles)), workers=workers).raise_errors()
+        return localfiles
+
+    # Archive members are named relative to the remote /
+    base = session.ftp.getcwd() or session.ftp.normalize('.')
+    members = [posixpath.normpath(posixpath.join(base, path)).lstrip('/')
+               for path in remote_paths]
+    targets = dict(zip(members, localfiles))
+
+    command = 'tar -c{} -f - -C / --null -T -'.format(flag)
+    channel = _exec(session, command)
+
+    def send_names():
+        # In a thread so that a long list cannot block on a full output window
+        with channel.makefile('wb') as stdin:
+            stdin.write(b''.join(member.encode('utf-8') + b'\0' for member in members))
+        channel.shutdown_write()
+
+    sender = threading.Thread(target=send_names, daemon=True)
+    sender.start()
+    try:
+        with channel.makefile('rb') as stream:
+            with tarfile.open(fileobj=stream, mode='r|*') as tar:
+                for member in tar:
+                    localfile = targets.pop(member.name, None)
+                    if localfile is None or not member.isfile():
+                        continue
+                    with open(localfile, 'wb') as fh:
+                        shutil.copyfileobj(tar.extractfile(member), fh)
+        sender.join()
+        _wait(session, channel, command)
+    finally:
+        channel.close()
+    if targets:
+        raise IOError('{} missing from archive'.format(', '.join(sorted(targets))))
+    return localfiles
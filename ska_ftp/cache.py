@@ -0,0 +1,85 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Time-limited LRU cache for remote directory listings and stat results.
+"""
+
+import time
+import posixpath
+import threading
+from collections import OrderedDict
+
+__all__ = ['ListingCache']
+
+
+class ListingCache(object):
+    """Cache of remote listing and stat results with a TTL and bounded LRU size.
+
+    Keys are tuples ``(kind, path, ...)`` where ``path`` is a normalized remote
+    path.  ``invalidate(path)`` drops every entry for ``path`` and the listings
+    of its parent directory, which is what a put, delete, rename, mkdir or rmdir
+    of ``path`` can change.  The cache is thread-safe so it can be shared by the
+    clones used for concurrent transfers.
+
+    :param ttl: time to live for entries (sec)
+    :param maxsize: maximum number of entries
+    """
+    def __init__(self, ttl=60.0, maxsize=1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return cached value for ``key`` or None if missing or expired.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or time.monotonic() - item[0] > self.ttl:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        """Store ``value`` for ``key``, evicting the least recently used entries.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *paths):
+        """Drop entries for each of ``paths`` (and anything below it if it is a
+        directory) and listings of its parent directory.
+        """
+        paths = set(posixpath.normpath(path) for path in paths)
+        parents = set(posixpath.dirname(path) or '.' for path in paths)
+        with self._lock:
+            for key in list(self._data):
+                if key[0] != 'stat' and key[1] in parents:
+                    del self._data[key]
+                    continue
+                path = key[1]
+                while True:
+                    if path in paths:
+                        del self._data[key]
+                        break
+                    parent = posixpath.dirname(path)
+                    if parent == path or not parent:
+                        break
+                    path = parent
+
+    def clear(self):
+        """Drop all entries.
+        """
+        with self._lock:
+            self._data.clear()
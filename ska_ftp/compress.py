@@ -0,0 +1,98 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Streaming zlib compression of FTP data connections (``MODE Z``).
+
+After ``MODE Z`` is accepted by the server every data connection (transfers and
+listings) carries a zlib stream.  ``ZlibSocket`` wraps the socket returned by
+``ftplib.FTP.ntransfercmd()`` so that ftplib and ``ska_ftp.stream`` read and
+write uncompressed data as usual.
+"""
+
+import io
+import zlib
+
+__all__ = ['ZlibSocket']
+
+DEFAULT_LEVEL = 6
+
+
+class _RawSocketReader(io.RawIOBase):
+    """Raw reader over a ZlibSocket, for ``makefile()``
+    """
+    def __init__(self, sock):
+        self._sock = sock
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        return self._sock.recv_into(buf)
+
+
+class ZlibSocket(object):
+    """Socket wrapper that compresses data sent and decompresses data received.
+
+    Only the methods used for FTP data connections are provided, anything else
+    is passed through to the wrapped socket.  Closing the socket after sending
+    data finishes the zlib stream.
+
+    :param sock: connected data socket
+    :param level: zlib compression level for sent data (default=6)
+    """
+    def __init__(self, sock, level=DEFAULT_LEVEL):
+        self._sock = sock
+        self._compressor = zlib.compressobj(level)
+        self._decompressor = zlib.decompressobj()
+        self._pending = b''
+        self._sending = False
+        self._eof = False
+
+    def recv(self, bufsize):
+        while not self._pending and not self._eof:
+            data = self._sock.recv(bufsize)
+            if data:
+                self._pending = self._decompressor.decompress(data)
+            else:
+                self._pending = self._decompressor.flush()
+                self._eof = True
+        data = self._pending[:bufsize]
+        self._pending = self._pending[bufsize:]
+        return data
+
+    def recv_into(self, buffer, nbytes=0):
+        view = memoryview(buffer).cast('B')
+        data = self.recv(nbytes or len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def sendall(self, data):
+        self._sending = True
+        data = self._compressor.compress(data)
+        if data:
+            self._sock.sendall(data)
+
+    def makefile(self, mode='r', encoding=None, errors=None, newline=None):
+        reader = io.BufferedReader(_RawSocketReader(self))
+        if 'b' in mode:
+            return reader
+        return io.TextIOWrapper(reader, encoding, errors, newline)
+
+    def close(self):
+        try:
+            if self._sending:
+                self._sending = False
+                self._sock.sendall(self._compressor.flush())
+        finally:
+            self._sock.close()
+
+    def __getattr__(self, attr):
+        return getattr(self._sock, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Aborted transfer, do not finish the zlib stream
+            self._sending = False
+        self.close()
@@ -6,11 +6,31 @@ Also supports using a .netrc file which is parsed internally.
 """
 
 import os
+import copy
+import stat
+import errno
+import posixpath
+import time
+import hashlib
 import warnings
 import ftplib
+import threading
 import contextlib
 import netrc
 
+from .cache import ListingCache
+from .parallel import run_parallel, fan_out, Result, Report
+from .sftp_io import read_blocks, request_many
+from .listing import from_sftp_attr, from_mlsd, parse_list_line
+from .sync import sync_dir as _sync_dir
+from . import walk as _walk
+from . import stream as _stream
+from .metrics import timed, instrument
+from .retry import retrying
+from . import verify as _verify
+from . import throttle as _throttle
+from .compress import ZlibSocket
+
 
 def parse_netrc(netrcfile=None):
     """Get default user and password for an FTP server by parsing a .netrc file.
@@ -46,6 +66,224 @@ def parse_netrc(netrcfile=None):
     return out
 
 
+def _transfer_many(session, method, pairs, workers, callback, progress, kwargs,
+                   priority=None):
+    """Run ``session.<method>`` for each pair in ``pairs`` using ``workers`` threads,
+    starting higher ``priority`` pairs first.
+    """
+    pairs = list(pairs)
+    items = [(pair, None) if isinstance(pair, (str, os.PathLike)) else tuple(pair)
+             for pair in pairs]
+    if priority is None:
+        priority = _throttle.NORMAL
+    priorities = ([priority(pair) for pair in pairs] if callable(priority)
+                  else [priority] * len(pairs))
+    # Stable sort keeps the input order within each priority class
+    order = sorted(range(len(items)), key=priorities.__getitem__)
+    lock = threading.Lock()
+    status = {'bytes': 0, 'files': 0}
+
+    def report():
+        if progress:
+            progress(status['bytes'], status['files'], len(items))
+
+    def func(worker_session, index):
+        last = [0]
+
+        def file_callback(transferred, total):
+            with lock:
+                status['bytes'] += transferred - last[0]
+                last[0] = transferred
+            if callback:
+                callback(transferred, total)
+            report()
+
+        use_callback = file_callback if (callback or progress) else None
+        out = getattr(worker_session, method)(*items[index], callback=use_callback,
+                                              priority=priorities[index], **kwargs)
+        with lock:
+            status['files'] += 1
+        report()
+        return out
+
+    results = [None] * len(items)
+    for index, result in zip(order, fan_out(session, func, order, workers)):
+        result.item = items[index]
+        results[index] = result
+    return Report(results)
+
+
+# Bytes per sendfile() call or recv_into() buffer for FTP put / get
+FTP_BLOCK_SIZE = 2 ** 17
+
+# Bytes at the end of a partial file compared before resuming when resume is
+# implied by a retry policy, since the .part file may be from an unrelated
+# earlier transfer
+RESUME_CHECK = 2 ** 16
+
+
+def sftp_tuning(file_size, block_size=None, max_requests=None):
+    """Default SFTP block size and number of outstanding read requests for a file.
+
+    Small files use the paramiko default 32 KiB requests.  Files of 1 MiB and
+    larger use 64 KiB requests, which all OpenSSH servers accept without
+    shortening the reply.  The number of outstanding prefetch requests grows with
+    file size so that large files keep the link busy (up to 16 MiB in flight for
+    files of 100 MiB or more) while bounding memory use.
+
+    :param file_size: file size (bytes)
+    :param block_size: block size override (default=None)
+    :param max_requests: outstanding requests override (default=None)
+    :returns: block_size, max_requests
+    """
+    if block_size is None:
+        block_size = 32768 if file_size < 2 ** 20 else 65536
+    if max_requests is None:
+        n_blocks = max(1, -(-file_size // block_size))
+        max_requests = min(n_blocks, 64 if file_size < 100 * 2 ** 20 else 256)
+    return block_size, max_requests
+
+
+def _split_ranges(file_size, segments, min_length=2 ** 20):
+    """Split ``file_size`` bytes into at most ``segments`` contiguous (offset, length)
+    ranges of at least ``min_length`` bytes (except for a file smaller than that).
+    """
+    segments = max(1, min(segments, file_size // min_length))
+    length, extra = divmod(file_size, segments)
+    ranges = []
+    offset = 0
+    for ii in range(segments):
+        seg_length = length + (1 if ii < extra else 0)
+        ranges.append((offset, seg_length))
+        offset += seg_length
+    return ranges
+
+
+def _copy_blocks(reader, writer, block_size, callback=None, file_size=None, hasher=None,
+                 throttle=None):
+    """Copy ``reader`` to ``writer`` in ``block_size`` chunks.
+
+    :returns: number of bytes copied
+    """
+    size = 0
+    while True:
+        data = reader.read(block_size)
+        if not data:
+            break
+        if hasher is not None:
+            hasher.update(data)
+        writer.write(data)
+        size += len(data)
+        if throttle is not None:
+            throttle(len(data))
+        if callback is not None:
+            callback(size, file_size)
+    return size
+
+
+def _put_nbytes(args, kwargs):
+    """Bytes moved by a successful ``put()`` call, for metrics"""
+    return os.path.getsize(args[0] if args else kwargs['localfile'])
+
+
+def _get_nbytes(args, kwargs):
+    """Bytes moved by a successful ``get()`` call, for metrics"""
+    remotefile = args[0] if args else kwargs['remotefile']
+    localfile = args[1] if len(args) > 1 else kwargs.get('localfile')
+    return os.path.getsize(localfile or os.path.basename(remotefile))
+
+
+def _default_resume(session, resume, resume_check, segments=None):
+    """Values of ``resume`` and ``resume_check`` for a transfer.
+
+    ``resume=None`` means resume if the session has a retry policy (so that a
+    retry continues from the interrupted offset), and then ``RESUME_CHECK``
+    bytes are checked unless ``resume_check`` is given.
+    """
+    if resume is not None:
+        return resume, resume_check
+    resume = (session.retry is not None and session.retry.resume
+              and not (segments is not None and segments > 1))
+    if resume and resume_check is None:
+        resume_check = RESUME_CHECK
+    return resume, resume_check
+
+
+def _verify_local(session, remotefile, localfile, algorithm, hasher):
+    """Check the digest of a downloaded file, removing ``localfile`` on mismatch
+    """
+    try:
+        _verify.check(session, remotefile, algorithm, hasher.digest())
+    except _verify.ChecksumError:
+        os.remove(localfile)
+        raise
+
+
+def _cached(session, key, refresh, func):
+    """Return ``func()``, using ``session._cache`` (if enabled) under ``key``.
+
+    Lists are copied so that callers cannot modify the cached value.
+    """
+    cache = session._cache
+    if cache is None:
+        return func()
+    if not refresh:
+        value = cache.get(key)
+        if value is not None:
+            return list(value) if isinstance(value, list) else value
+    value = func()
+    cache.set(key, list(value) if isinstance(value, list) else value)
+    return value
+
+
+def _sftp_status(sftp, t, msg):
+    """Raise IOError unless SFTP response ``t, msg`` is an OK status"""
+    from paramiko.sftp import CMD_STATUS, SFTPError
+
+    if t != CMD_STATUS:
+        raise SFTPError('Expected status')
+    sftp._convert_status(msg)
+
+
+def _temp_name(remotefile):
+    """Unique hidden temporary name in the same directory as ``remotefile``"""
+    import uuid
+
+    dirname, basename = posixpath.split(remotefile)
+    return posixpath.join(dirname, '.{}.{}.tmp'.format(basename, uuid.uuid4().hex[:8]))
+
+
+def _split_prefixes(path):
+    """Paths of ``path`` and each of its parent directories, parents first"""
+    parts = path.rstrip('/').split('/')
+    prefixes = ['/'.join(parts[:ii]) for ii in range(1, len(parts) + 1)]
+    return [prefix for prefix in prefixes if prefix]
+
+
+class _ParentListings(object):
+    """Listings of parent directories for ``FTP.stat_many()`` without MLST, so that
+    the concurrent workers list each parent only once.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dir_locks = {}
+        self._entries = {}
+
+    def get(self, ftp, dirname):
+        """Dict of name: RemoteEntry in ``dirname`` (empty if it cannot be listed)
+        """
+        with self._lock:
+            dir_lock = self._dir_locks.setdefault(dirname, threading.Lock())
+        with dir_lock:
+            if dirname not in self._entries:
+                try:
+                    entries = ftp._list_entries(dirname)
+                except ftplib.error_perm:
+                    entries = []
+                self._entries[dirname] = {entry.name: entry for entry in entries}
+            return self._entries[dirname]
+
+
 class SFTP(object):
     """Initialize object for simpler secure-ftp operations.
 
@@ -57,28 +295,122 @@ class SFTP(object):
     :param passwd: password (default=netrc value or anonymous@ )
     :param netrcfile: netrc file name (default=~/.netrc)
     :param logger: logger object (e.g. pyyaks.logger.get_logger())
+    :param port: sftp port on host (default=22)
+    :param window_size: SSH channel window size in bytes (default=paramiko default 2 MiB).
+        Increase this for high-latency links.
+    :param max_packet_size: SSH max packet size in bytes (default=paramiko default 32 KiB)
+    :param cache_ttl: cache ``ls()``, ``ls_full()``, ``ls_entries()`` and ``stat()``
+        results for this many seconds (default=None, no caching)
+    :param cache_size: maximum number of cached results (default=1000)
+    :param metrics: metrics sink for per-operation timing (see ``ska_ftp.metrics``,
+        default=None)
+    :param retry: ska_ftp.retry.RetryPolicy to retry failed operations and reconnect
+        dropped sessions (default=None, no retry)
+    :param compress: request zlib compression of the SSH transport.  This helps
+        for compressible data on slow links but costs CPU (default=False)
+    :param rate_limit: limit the total rate of transfers by this session and its
+        clones (bytes/sec, default=None, no limit).  See ``ska_ftp.throttle``.
+    :param lazy: defer the connection and login until the first operation
+        (default=False)
     """
-    def __init__(self, host, user=None, passwd=None, netrcfile=None, logger=None):
-        import paramiko
+    protocol = 'sftp'
 
-        auths = parse_netrc(netrcfile)
-        if host in auths:
-            if user is None:
-                user = auths[host]['login']
-            if passwd is None:
-                passwd = auths[host]['password']
+    def __init__(self, host, user=None, passwd=None, netrcfile=None, logger=None,
+                 port=22, window_size=None, max_packet_size=None, cache_ttl=None,
+                 cache_size=1000, metrics=None, retry=None, compress=False, rate_limit=None,
+                 lazy=False):
+        # Only parse netrc if needed, e.g. SessionPool supplies both user and passwd
+        if user is None or passwd is None:
+            auths = parse_netrc(netrcfile)
+            if host in auths:
+                if user is None:
+                    user = auths[host]['login']
+                if passwd is None:
+                    passwd = auths[host]['password']
 
         if user is None or passwd is None:
             raise ValueError('must provide both user and passwd (either directly '
                              f'or via .netrc for host {host}')
 
-        transport = paramiko.Transport((host, 22))
-        transport.connect(username=user, password=passwd)
-        self.ftp = paramiko.SFTPClient.from_transport(transport)
-
+        self._transport_kwargs = {}
+        if window_size is not None:
+            self._transport_kwargs['default_window_size'] = window_size
+        if max_packet_size is not None:
+            self._transport_kwargs['default_max_packet_size'] = max_packet_size
+        self.metrics = metrics
+        self.retry = retry
+        self.compress = compress
+        self._bucket = None if rate_limit is None else _throttle.TokenBucket(rate_limit)
+        self._limiter = None
+        self._retrying = False
+        # Whether the server runs tar for put_bundle / get_bundle, None until checked
+        self._exec_tar = None
+        self.host = host
+        self.port = port
+        self.user = user
+        self._passwd = passwd
         self.logger = logger
+        self._cache = None if cache_ttl is None else ListingCache(cache_ttl, cache_size)
+        # Login directory, used to make cache keys absolute before any cd
+        self._home = None
+        # False for clones, which share the SSH transport of this session
+        self._owns_transport = True
+        self._ftp = None
+        if not lazy:
+            self._open()
+
+    @property
+    def ftp(self):
+        """paramiko.SFTPClient, connected on first use for a lazy session"""
+        if self._ftp is None:
+            self._open()
+        return self._ftp
+
+    @ftp.setter
+    def ftp(self, value):
+        self._ftp = value
+
+    def _open(self):
+        """Connect and log in for the first time
+        """
+        self._ftp = self._connect()
+        if self._cache is not None:
+            self._home = self._ftp.normalize('.')
         if self.logger:
-            self.logger.info('ska_ftp: log in to {} as {}'.format(host, user))
+            self.logger.info('ska_ftp: log in to {} as {}'.format(self.host, self.user))
+
+    def _connect(self):
+        """Connect and log in, returning a new paramiko.SFTPClient
+        """
+        import paramiko
+
+        def connect():
+            transport = paramiko.Transport((self.host, self.port), **self._transport_kwargs)
+            transport.use_compression(self.compress)
+            transport.start_client()
+            return transport
+
+        transport = timed(self.metrics, self.host, self.protocol, 'connect', connect)
+        if self.compress and transport.local_compression == 'none' and self.logger:
+            self.logger.info('ska_ftp: {} refused SSH compression'.format(self.host))
+        timed(self.metrics, self.host, self.protocol, 'login', transport.auth_password,
+              (self.user, self._passwd))
+        return paramiko.SFTPClient.from_transport(transport)
+
+    def _reconnect(self):
+        """Replace a dropped connection and restore the working directory
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: reconnect to {}'.format(self.host))
+        cwd = self.ftp.getcwd()
+        try:
+            self.ftp.get_channel().get_transport().close()
+        except Exception:
+            pass
+        self.ftp = self._connect()
+        self._owns_transport = True
+        if cwd is not None:
+            self.ftp.chdir(cwd)
 
     def __del__(self):
         """
@@ -91,10 +423,39 @@ class SFTP(object):
         # already gone.  Exceptions are ignored in __del__ anyway, but can be
         # printed to console (which can cause errors for test checking)
         try:
-            self.ftp.close()
+            self._ftp.close()
         except Exception:
             pass
 
+    def close(self):
+        """Close the SFTP session and its SSH connection.  A lazy session that
+        never connected is left as is.
+        """
+        if self._ftp is not None:
+            transport = self._ftp.get_channel().get_transport()
+            self._ftp.close()
+            if self._owns_transport:
+                transport.close()
+
+    def is_alive(self):
+        """Return True if the SFTP session is still usable.
+
+        This checks that the SSH transport is active and then does a cheap
+        ``stat('.')`` round trip to the server.
+
+        :returns: bool
+        """
+        try:
+            transport = self.ftp.get_channel().get_transport()
+            if not transport.is_active():
+                return False
+            self.ftp.stat('.')
+        except Exception:
+            return False
+        return True
+
+    @instrument('cd')
+    @retrying
     def cd(self, dirname):
         """Change to specified directory ``dirname``.
 
@@ -104,52 +465,703 @@ class SFTP(object):
             self.logger.info('ska_ftp: cd {}'.format(dirname))
         self.ftp.chdir(dirname)
 
-    def ls(self, dirname='.'):
+    @instrument('ls')
+    @retrying
+    def ls(self, dirname='.', refresh=False):
         """List contents of directory ``dirname`` via NLST command.
 
         :param dirname: directory name
+        :param refresh: bypass the listing cache (default=False)
         :returns: list of file and/or directory names
         """
         if self.logger:
             self.logger.info('ska_ftp: ls {}'.format(dirname))
-        return self.ftp.listdir(dirname)
+        return _cached(self, ('ls', self._abspath(dirname)), refresh,
+                       lambda: self.ftp.listdir(dirname))
 
-    def ls_full(self, dirname='.'):
+    @instrument('ls_full')
+    @retrying
+    def ls_full(self, dirname='.', refresh=False):
         """List full contents of directory ``dirname``.
 
         :param dirname: directory name
+        :param refresh: bypass the listing cache (default=False)
         :returns: list of full FTP output for LIST command
         """
         if self.logger:
             self.logger.info('ska_ftp: ls {}'.format(dirname))
-        return [x.longname for x in self.ftp.listdir_attr(dirname)]
+        return _cached(self, ('ls_full', self._abspath(dirname)), refresh,
+                       lambda: [x.longname for x in self.ftp.listdir_attr(dirname)])
+
+    @instrument('ls_entries')
+    @retrying
+    def ls_entries(self, dirname='.', refresh=False):
+        """List contents of directory ``dirname`` as structured entries.
 
-    def put(self, localfile, remotefile=None, callback=None, confirm=True):
+        :param dirname: directory name
+        :param refresh: bypass the listing cache (default=False)
+        :returns: list of ska_ftp.listing.RemoteEntry (name, size, mtime, mode, is_dir)
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: ls {}'.format(dirname))
+        return _cached(self, ('ls_entries', self._abspath(dirname)), refresh,
+                       lambda: [from_sftp_attr(attr) for attr in self.ftp.listdir_attr(dirname)])
+
+    @instrument('stat')
+    @retrying
+    def stat(self, path, refresh=False):
+        """Get attributes of remote ``path``.
+
+        :param path: path on remote
+        :param refresh: bypass the stat cache (default=False)
+        :returns: paramiko.SFTPAttributes
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: stat {}'.format(path))
+        return _cached(self, ('stat', self._abspath(path)), refresh,
+                       lambda: self.ftp.stat(path))
+
+    def clear_cache(self):
+        """Drop all cached listing and stat results
+        """
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _abspath(self, path):
+        """Normalized absolute remote path for cache keys
+        """
+        if self._cache is None:
+            return path
+        return posixpath.normpath(posixpath.join(self.ftp.getcwd() or self._home, path))
+
+    def _invalidate(self, *paths):
+        """Drop cached results that a change to remote ``paths`` could affect
+        """
+        if self._cache is not None:
+            self._cache.invalidate(*[self._abspath(path) for path in paths])
+
+    @instrument('put', _put_nbytes)
+    @retrying
+    def put(self, localfile, remotefile=None, callback=None, confirm=True, block_size=None,
+            segments=None, resume=None, resume_check=None, verify=None, atomic=False,
+            rate_limit=None, priority=_throttle.NORMAL):
         """Put the ``localfile`` to the FTP server as ``remotefile``.
 
+        Writes are pipelined, i.e. the next block is sent without waiting for the
+        server to acknowledge the previous one.  With ``segments=N`` the file is
+        split into N byte ranges that are written concurrently at their offsets
+        over N SFTP channels on the same SSH transport.
+
         :param localfile: file name  on local host
         :param remotefile: file name on remote FTP host (default=localfile)
         :param callback: optional callback function that accepts bytes transferred so far
         :param confirm: confirm file size after transfer
+        :param block_size: bytes per SFTP write request (default=based on file size,
+            see ``sftp_tuning()``)
+        :param segments: number of concurrent segments for large files (default=None)
+        :param resume: upload to ``<remotefile>.part``, continuing from the end of
+            that file if it exists, then rename to ``remotefile`` (default=True if
+            the session has a retry policy and segments is not set, else False)
+        :param resume_check: number of bytes at the end of an existing partial file
+            to compare before resuming.  On mismatch the upload restarts from zero.
+            (default=None, no check, or RESUME_CHECK if resume is implied by a retry
+            policy)
+        :param verify: hash algorithm (e.g. 'md5' or 'sha256') to checksum the data as
+            it is sent and compare to the server or sidecar hash (default=None)
+        :param atomic: upload to a unique temporary name in the same directory and
+            rename it to ``remotefile`` (with ``posix-rename`` if available) only after
+            the size and checksum are confirmed, so ``remotefile`` is never seen
+            partially written.  A resumed upload is always atomic in this way, with
+            ``<remotefile>.part`` as the temporary name.  (default=False)
+        :param rate_limit: maximum rate for this transfer (bytes/sec, default=None).
+            Session and process limits also apply, see ``ska_ftp.throttle``.
+        :param priority: priority class when sharing a rate limit: ska_ftp.throttle.HIGH,
+            NORMAL (default) or LOW
+        :returns: hex digest if ``verify`` is set, else None
         """
         if remotefile is None:
             remotefile = os.path.basename(localfile)
         if self.logger:
             self.logger.info('ska_ftp: put {} as {}'.format(localfile, remotefile))
-        self.ftp.put(localfile, remotefile, callback=callback, confirm=confirm)
+        resume, resume_check = _default_resume(self, resume, resume_check, segments)
+        hasher = None if verify is None else _verify.new_hasher(verify)
+        with self._limited(rate_limit, priority):
+            # The data are renamed to remotefile only after they are checked
+            partfile = remotefile + '.part' if resume else None
+            tmpfile = _temp_name(remotefile) if atomic and not resume else None
+            target = partfile or tmpfile or remotefile
+            try:
+                if segments is not None and segments > 1:
+                    if resume:
+                        raise ValueError('resume is not supported with segments')
+                    size = self._put_segmented(localfile, target, callback, block_size, segments)
+                    if hasher is not None:
+                        # Segments are sent out of order, hash the local file instead
+                        _verify.hash_file(localfile, hasher)
+                elif resume:
+                    try:
+                        offset = self.ftp.stat(partfile).st_size
+                    except IOError:
+                        offset = 0
+                    if offset > os.path.getsize(localfile):
+                        offset = 0
+                    if offset and resume_check:
+                        if not self._tail_matches(partfile, localfile, offset, resume_check):
+                            if self.logger:
+                                self.logger.info('ska_ftp: {} does not match {}, restarting put'
+                                                 .format(partfile, localfile))
+                            offset = 0
+                    if offset and self.logger:
+                        self.logger.info('ska_ftp: resume put of {} at {}'
+                                         .format(localfile, offset))
+                    size = self._put_file(localfile, partfile, callback, block_size, offset,
+                                          hasher)
+                else:
+                    size = self._put_file(localfile, target, callback, block_size,
+                                          hasher=hasher)
+                try:
+                    if confirm:
+                        remote_size = self.ftp.stat(target).st_size
+                        if remote_size != size:
+                            raise IOError('size mismatch in put!  {} != {}'
+                                          .format(remote_size, size))
+                    if hasher is not None:
+                        _verify.check(self, target, verify, hasher.digest())
+                except IOError:
+                    # Do not resume from bad data
+                    if partfile is not None:
+                        try:
+                            self.ftp.remove(partfile)
+                        except Exception:
+                            pass
+                    raise
+                if target != remotefile:
+                    self._replace(target, remotefile)
+            except BaseException:
+                if tmpfile is not None:
+                    try:
+                        self.ftp.remove(tmpfile)
+                    except Exception:
+                        pass
+                raise
+            finally:
+                self._invalidate(remotefile, remotefile + '.part')
+            if hasher is not None:
+                return hasher.hexdigest()
 
-    def get(self, remotefile, localfile=None, callback=None):
+    @instrument('get', _get_nbytes)
+    @retrying
+    def get(self, remotefile, localfile=None, callback=None, block_size=None,
+            max_requests=None, segments=None, resume=None, resume_check=None, verify=None,
+            rate_limit=None, priority=_throttle.NORMAL):
         """Get the ``remotefile`` from the FTP server as ``localfile`` on the local host.
 
+        Reads are pipelined with up to ``max_requests`` outstanding read requests
+        to hide the round trip latency of the SFTP protocol.  With ``segments=N``
+        the file is split into N byte ranges that are read concurrently over N
+        SFTP channels on the same SSH transport.  The ranges are written into a
+        preallocated temporary file which is renamed to ``localfile`` only after
+        every segment has succeeded.
+
         :param remotefile: file name on remote FTP host
         :param localfile: file name  on local host (default=remotefile)
+        :param callback: optional callback function that accepts bytes transferred so far
+        :param block_size: bytes per SFTP read request (default=based on file size,
+            see ``sftp_tuning()``)
+        :param max_requests: max outstanding read requests (default=based on file size)
+        :param segments: number of concurrent segments for large files (default=None)
+        :param resume: download to ``<localfile>.part``, continuing from the end of
+            that file if it exists, then rename to ``localfile`` (default=True if
+            the session has a retry policy and segments is not set, else False)
+        :param resume_check: number of bytes at the end of an existing partial file
+            to compare before resuming.  On mismatch the download restarts from zero.
+            (default=None, no check, or RESUME_CHECK if resume is implied by a retry
+            policy)
+        :param verify: hash algorithm (e.g. 'md5' or 'sha256') to checksum the data as
+            it is received and compare to the server or sidecar hash.  On mismatch
+            ``localfile`` is removed and ChecksumError is raised.  (default=None)
+        :param rate_limit: maximum rate for this transfer (bytes/sec, default=None).
+            Session and process limits also apply, see ``ska_ftp.throttle``.
+        :param priority: priority class when sharing a rate limit: ska_ftp.throttle.HIGH,
+            NORMAL (default) or LOW
+        :returns: hex digest if ``verify`` is set, else None
         """
         if localfile is None:
             localfile = os.path.basename(remotefile)
         if self.logger:
             self.logger.info('ska_ftp: get {} as {}'.format(remotefile, localfile))
-        self.ftp.get(remotefile, localfile, callback=callback)
+        resume, resume_check = _default_resume(self, resume, resume_check, segments)
+        hasher = None if verify is None else _verify.new_hasher(verify)
+        with self._limited(rate_limit, priority):
+            if segments is not None and segments > 1:
+                if resume:
+                    raise ValueError('resume is not supported with segments')
+                self._get_segmented(remotefile, localfile, callback, block_size, max_requests,
+                                    segments)
+                if hasher is not None:
+                    # Segments arrive out of order, hash the local file instead
+                    _verify.hash_file(localfile, hasher)
+            elif resume:
+                partfile = str(localfile) + '.part'
+                offset = os.path.getsize(partfile) if os.path.exists(partfile) else 0
+                if offset > self.ftp.stat(remotefile).st_size:
+                    offset = 0
+                if offset and resume_check:
+                    if not self._tail_matches(remotefile, partfile, offset, resume_check):
+                        if self.logger:
+                            self.logger.info('ska_ftp: {} does not match {}, restarting get'
+                                             .format(partfile, remotefile))
+                        offset = 0
+                if offset and self.logger:
+                    self.logger.info('ska_ftp: resume get of {} at {}'.format(remotefile, offset))
+                self._get_file(remotefile, partfile, callback, block_size, max_requests, offset,
+                               hasher)
+                os.replace(partfile, localfile)
+            else:
+                self._get_file(remotefile, localfile, callback, block_size, max_requests,
+                               hasher=hasher)
+            if hasher is not None:
+                _verify_local(self, remotefile, localfile, verify, hasher)
+                return hasher.hexdigest()
+
+    def open_stream(self, remotefile, mode='rb', block_size=None, max_requests=None):
+        """Open ``remotefile`` as a buffered binary file-like object.
+
+        Data are streamed to or from the server without a local copy.  Reads
+        are pipelined as for ``get()``.  The returned reader supports
+        ``read()``, ``readinto()`` (into a ``bytearray`` or ``memoryview``),
+        iteration and ``chunks(size)``.  Use it in a ``with`` block or call
+        ``close()`` when done::
+
+          with lucky.open_stream('data.fits.gz') as fh:
+              data = gzip.GzipFile(fileobj=fh).read()
+
+        :param remotefile: file name on remote host
+        :param mode: 'rb' or 'wb'
+        :param block_size: bytes per SFTP request and buffer size (default=based on
+            file size, see ``sftp_tuning()``)
+        :param max_requests: max outstanding read requests (default=based on file size)
+        :returns: ska_ftp.stream.RemoteReader ('rb') or io.BufferedWriter ('wb')
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: open_stream {} {}'.format(remotefile, mode))
+        return _stream.open_sftp(self, remotefile, mode, block_size, max_requests)
+
+    @contextlib.contextmanager
+    def _limited(self, rate_limit, priority):
+        """Apply the transfer, session and process rate limits to block transfers
+        within the context
+        """
+        self._limiter = _throttle.limiter(rate_limit, self._bucket, priority)
+        try:
+            yield
+        finally:
+            self._limiter = None
 
+    def _put_file(self, localfile, remotefile, callback, block_size, offset=0, hasher=None):
+        """Upload ``localfile`` to ``remotefile`` starting at ``offset``.
+
+        :returns: size of remote file after upload
+        """
+        if hasher is not None and offset:
+            _verify.hash_file(localfile, hasher, offset)
+        with open(localfile, 'rb') as fl:
+            file_size = os.fstat(fl.fileno()).st_size
+            block_size, _ = sftp_tuning(file_size, block_size)
+            with self.ftp.open(remotefile, 'r+b' if offset else 'wb') as fr:
+                fr.MAX_REQUEST_SIZE = block_size
+                fr.set_pipelined(True)
+                if offset:
+                    fr.seek(offset)
+                    fl.seek(offset)
+
+                def offset_callback(size, total):
+                    callback(size + offset, total)
+
+                size = offset + _copy_blocks(fl, fr, block_size,
+                                             offset_callback if callback else None, file_size,
+                                             hasher, self._limiter)
+        return size
+
+    def _get_file(self, remotefile, localfile, callback, block_size, max_requests,
+                  offset=0, hasher=None):
+        """Download ``remotefile`` to ``localfile`` starting at ``offset``.
+        """
+        if hasher is not None and offset:
+            _verify.hash_file(localfile, hasher, offset)
+        with self.ftp.open(remotefile, 'rb') as fr:
+            file_size = fr.stat().st_size
+            block_size, max_requests = sftp_tuning(file_size - offset, block_size,
+                                                   max_requests)
+            size = offset
+            with open(localfile, 'r+b' if offset else 'wb') as fl:
+                if offset:
+                    fl.truncate(offset)
+                    fl.seek(offset)
+                for _, data in read_blocks(fr, offset, file_size - offset, block_size,
+                                           max_requests):
+                    if hasher is not None:
+                        hasher.update(data)
+                    fl.write(data)
+                    size += len(data)
+                    if self._limiter is not None:
+                        self._limiter(len(data))
+                    if callback is not None:
+                        callback(size, file_size)
+        if size != file_size:
+            raise IOError('size mismatch in get!  {} != {}'.format(size, file_size))
+
+    def _tail_matches(self, remotefile, localfile, offset, n_check):
+        """Check that the ``n_check`` bytes before ``offset`` are the same in
+        ``remotefile`` and ``localfile``.
+
+        The server-side ``check-file`` extension is used to get an MD5 of the
+        remote range if available, otherwise the remote bytes are read.
+        """
+        n_check = min(n_check, offset)
+        with open(localfile, 'rb') as fl:
+            fl.seek(offset - n_check)
+            local_tail = fl.read(n_check)
+        with self.ftp.open(remotefile, 'rb') as fr:
+            try:
+                remote_md5 = fr.check('md5', offset - n_check, n_check)
+            except IOError:
+                remote_tail = b''.join(data for _, data in
+                                       read_blocks(fr, offset - n_check, n_check, 32768, 16))
+                return remote_tail == local_tail
+        return remote_md5 == hashlib.md5(local_tail).digest()
+
+    def _replace(self, oldpath, newpath):
+        """Rename ``oldpath`` to ``newpath``, replacing ``newpath`` if it exists.
+
+        This uses the ``posix-rename@openssh.com`` extension if the server
+        supports it, otherwise removes ``newpath`` before a plain rename.
+        """
+        try:
+            self.ftp.posix_rename(oldpath, newpath)
+        except IOError as err:
+            # Mapped errors like ENOENT or EACCES are real failures, others
+            # (no errno) mean the extension is not supported.
+            if err.errno is not None:
+                raise
+            try:
+                self.ftp.remove(newpath)
+            except IOError:
+                pass
+            self.ftp.rename(oldpath, newpath)
+        self._invalidate(oldpath, newpath)
+
+    def _run_segments(self, func, ranges):
+        """Run ``func(session, (offset, length))`` for each range, each on its own
+        SFTP channel, and raise the first error if any segment failed.
+        """
+        cwd = self._cwd()
+        report = run_parallel(func, ranges, workers=len(ranges),
+                              setup=lambda: self._clone(cwd),
+                              teardown=lambda session: session.ftp.close())
+        report.raise_errors()
+
+    def _get_segmented(self, remotefile, localfile, callback, block_size, max_requests,
+                       segments):
+        import tempfile
+
+        file_size = self.ftp.stat(remotefile).st_size
+        ranges = _split_ranges(file_size, segments)
+        block_size, max_requests = sftp_tuning(ranges[0][1], block_size, max_requests)
+
+        # Preallocated temporary file in the same directory so the final rename is atomic
+        fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(localfile)),
+                                       prefix='.' + os.path.basename(localfile) + '.',
+                                       suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.truncate(file_size)
+
+        lock = threading.Lock()
+        status = {'size': 0}
+
+        def get_segment(session, segment):
+            offset, length = segment
+            size = 0
+            with session.ftp.open(remotefile, 'rb') as fr, open(tmpfile, 'r+b') as fl:
+                fl.seek(offset)
+                for _, data in read_blocks(fr, offset, length, block_size, max_requests):
+                    fl.write(data)
+                    size += len(data)
+                    if session._limiter is not None:
+                        session._limiter(len(data))
+                    if callback is not None:
+                        with lock:
+                            status['size'] += len(data)
+                            callback(status['size'], file_size)
+            if size != length:
+                raise IOError('size mismatch in get segment at {}!  {} != {}'
+                              .format(offset, size, length))
+
+        try:
+            self._run_segments(get_segment, ranges)
+            os.replace(tmpfile, localfile)
+        except BaseException:
+            os.unlink(tmpfile)
+            raise
+
+    def _put_segmented(self, localfile, remotefile, callback, block_size, segments):
+        file_size = os.path.getsize(localfile)
+        ranges = _split_ranges(file_size, segments)
+        block_size, _ = sftp_tuning(ranges[0][1], block_size)
+
+        # Create or truncate the remote file, then each segment writes at its offset
+        self.ftp.open(remotefile, 'wb').close()
+
+        lock = threading.Lock()
+        status = {'size': 0}
+
+        def put_segment(session, segment):
+            offset, length = segment
+            with open(localfile, 'rb') as fl, session.ftp.open(remotefile, 'r+b') as fr:
+                fr.MAX_REQUEST_SIZE = block_size
+                fr.set_pipelined(True)
+                fl.seek(offset)
+                fr.seek(offset)
+                remaining = length
+                while remaining > 0:
+                    data = fl.read(min(block_size, remaining))
+                    if not data:
+                        raise IOError('local file {} changed size during put'
+                                      .format(localfile))
+                    fr.write(data)
+                    remaining -= len(data)
+                    if session._limiter is not None:
+                        session._limiter(len(data))
+                    if callback is not None:
+                        with lock:
+                            status['size'] += len(data)
+                            callback(status['size'], file_size)
+
+        self._run_segments(put_segment, ranges)
+        return file_size
+
+    def _cwd(self):
+        """Current remote working directory (None if ``cd`` was never called)
+        """
+        return self.ftp.getcwd()
+
+    def _clone(self, cwd=None):
+        """Return a copy of this object that uses a new SFTP channel on the same
+        SSH transport.
+
+        :param cwd: initial working directory for the copy (default=None)
+        """
+        import paramiko
+
+        clone = copy.copy(self)
+        transport = self.ftp.get_channel().get_transport()
+        clone.ftp = paramiko.SFTPClient.from_transport(transport)
+        clone._owns_transport = False
+        if cwd is not None:
+            clone.ftp.chdir(cwd)
+        return clone
+
+    def put_many(self, pairs, workers=4, callback=None, confirm=True, progress=None,
+                 priority=None, **kwargs):
+        """Put many files concurrently, using ``workers`` SFTP channels on the
+        same SSH transport.
+
+        Each element of ``pairs`` is either ``localfile`` or a tuple
+        ``(localfile, remotefile)``.  A failure for one file does not stop the
+        other transfers, instead each outcome is recorded in the returned report.
+
+        :param pairs: list of localfile or (localfile, remotefile)
+        :param workers: number of concurrent transfers
+        :param callback: optional per-file callback that accepts bytes transferred so far
+            and total bytes
+        :param confirm: confirm file size after each transfer
+        :param progress: optional aggregate callback that accepts total bytes transferred,
+            number of files completed and total number of files
+        :param priority: priority class (ska_ftp.throttle.HIGH, NORMAL or LOW) for all
+            files, or a function of each element of ``pairs`` that returns its class.
+            Higher priority files are started first and go first when sharing a rate
+            limit (default=NORMAL).
+        :param **kwargs: additional keyword args for ``put()``
+        :returns: ska_ftp.parallel.Report
+        """
+        kwargs['confirm'] = confirm
+        return _transfer_many(self, 'put', pairs, workers, callback, progress, kwargs,
+                              priority)
+
+    def get_many(self, pairs, workers=4, callback=None, progress=None, priority=None,
+                 **kwargs):
+        """Get many files concurrently, using ``workers`` SFTP channels on the
+        same SSH transport.
+
+        Each element of ``pairs`` is either ``remotefile`` or a tuple
+        ``(remotefile, localfile)``.  A failure for one file does not stop the
+        other transfers, instead each outcome is recorded in the returned report.
+
+        :param pairs: list of remotefile or (remotefile, localfile)
+        :param workers: number of concurrent transfers
+        :param callback: optional per-file callback that accepts bytes transferred so far
+            and total bytes
+        :param progress: optional aggregate callback that accepts total bytes transferred,
+            number of files completed and total number of files
+        :param priority: priority class (ska_ftp.throttle.HIGH, NORMAL or LOW) for all
+            files, or a function of each element of ``pairs`` that returns its class.
+            Higher priority files are started first and go first when sharing a rate
+            limit (default=NORMAL).
+        :param **kwargs: additional keyword args for ``get()``
+        :returns: ska_ftp.parallel.Report
+        """
+        return _transfer_many(self, 'get', pairs, workers, callback, progress, kwargs,
+                              priority)
+
+    @instrument('put_bundle')
+    @retrying
+    def put_bundle(self, files, remote_dir, compress=None, workers=4):
+        """Put many small local ``files`` into ``remote_dir`` as one tar archive
+        streamed to ``tar`` on the server over an SSH exec channel.
+
+        If the server does not allow command execution the files are uploaded
+        with ``put_many()`` instead.  See ``ska_ftp.bundle``.
+
+        :param files: list of local file names with unique base names
+        :param remote_dir: existing remote directory
+        :param compress: compress the archive with 'gz', 'bz2' or 'xz' (default=None)
+        :param workers: number of concurrent transfers for the fallback
+        :returns: list of remote file names
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: put bundle of {} files to {}'
+                             .format(len(files), remote_dir))
+        from . import bundle as _bundle
+
+        return _bundle.put_bundle(self, files, remote_dir, compress=compress, workers=workers)
+
+    @instrument('get_bundle')
+    @retrying
+    def get_bundle(self, remote_paths, local_dir, compress=None, workers=4):
+        """Get many small ``remote_paths`` into ``local_dir`` as one tar archive
+        streamed from ``tar`` on the server over an SSH exec channel.
+
+        If the server does not allow command execution the files are downloaded
+        with ``get_many()`` instead.  See ``ska_ftp.bundle``.
+
+        :param remote_paths: list of remote file names with unique base names
+        :param local_dir: existing local directory
+        :param compress: compress the archive with 'gz', 'bz2' or 'xz' (default=None)
+        :param workers: number of concurrent transfers for the fallback
+        :returns: list of local file names
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: get bundle of {} files to {}'
+                             .format(len(remote_paths), local_dir))
+        from . import bundle as _bundle
+
+        return _bundle.get_bundle(self, remote_paths, local_dir, compress=compress,
+                                  workers=workers)
+
+    def sync_dir(self, remote, local, direction='down', delete=False, checksum=False,
+                 workers=4):
+        """Incrementally mirror directory ``remote`` to ``local`` (direction='down')
+        or ``local`` to ``remote`` (direction='up').
+
+        Only new or changed files are transferred.  See ``ska_ftp.sync.sync_dir()``
+        for details.
+
+        :param remote: remote directory
+        :param local: local directory
+        :param direction: 'down' (remote to local) or 'up' (local to remote)
+        :param delete: delete files and directories that are not in the source
+        :param checksum: compare files by MD5 instead of modification time
+        :param workers: number of concurrent transfers
+        :returns: ska_ftp.sync.SyncSummary
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: sync_dir {} {} {}'.format(remote, local, direction))
+        return _sync_dir(self, remote, local, direction=direction, delete=delete,
+                         checksum=checksum, workers=workers)
+
+    def walk(self, top, workers=4, onerror=None):
+        """Generate ``(dirpath, dirnames, filenames)`` for each directory under ``top``,
+        like ``os.walk()``.
+
+        Sibling directories are listed concurrently using up to ``workers``
+        SFTP channels on the same SSH transport.  See ``ska_ftp.walk.walk()`` for details.
+
+        :param top: remote directory
+        :param workers: maximum number of concurrent directory listings
+        :param onerror: function called with the exception if a listing fails
+            (default=None, errors are ignored)
+        :returns: generator of (dirpath, dirnames, filenames)
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: walk {}'.format(top))
+        return _walk.walk(self, top, workers=workers, onerror=onerror)
+
+    def glob(self, pattern, workers=4, onerror=None):
+        """Generate remote paths matching ``pattern``, e.g. ``'data/*/2026*/*.fits.gz'``.
+
+        A ``**`` component matches any number of directories.  See
+        ``ska_ftp.walk.glob()`` for details.
+
+        :param pattern: remote path pattern
+        :param workers: maximum number of concurrent directory listings
+        :param onerror: function called with the exception if a listing fails
+            (default=None, errors are ignored)
+        :returns: generator of matching paths
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: glob {}'.format(pattern))
+        return _walk.glob(self, pattern, workers=workers, onerror=onerror)
+
+    def scan(self, root, index, skip_unchanged_dirs=False, checksum=None, workers=4):
+        """Scan the remote tree ``root`` and return the files added, modified or
+        deleted since the previous scan recorded in ``index``.
+
+        See ``ska_ftp.manifest.scan()`` for details.
+
+        :param root: remote directory (preferably an absolute path)
+        :param index: ska_ftp.manifest.ManifestIndex or SQLite file name
+        :param skip_unchanged_dirs: do not list directories with an unchanged mtime
+        :param checksum: hash algorithm to store checksums of new and modified files
+            (default=None)
+        :param workers: maximum number of concurrent directory listings
+        :returns: ska_ftp.manifest.ScanResult
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: scan {}'.format(root))
+        from . import manifest as _manifest
+
+        return _manifest.scan(self, root, index, skip_unchanged_dirs=skip_unchanged_dirs,
+                              checksum=checksum, workers=workers)
+
+    def _remote_md5(self, path):
+        """MD5 digest of remote ``path`` using the server ``check-file`` extension
+        """
+        with self.ftp.open(path, 'rb') as fr:
+            return fr.check('md5')
+
+    def _remote_hash(self, path, algorithm):
+        """Digest of remote ``path`` from the server ``check-file`` extension or a
+        ``<path>.<algorithm>`` sidecar file, or None if neither is available
+        """
+        try:
+            with self.ftp.open(path, 'rb') as fr:
+                return fr.check(algorithm)
+        except IOError:
+            pass
+        try:
+            with self.ftp.open(path + '.' + algorithm, 'rb') as fr:
+                return _verify.parse_sidecar(fr.read().decode('ascii'))
+        except (IOError, ValueError, IndexError):
+            return None
+
+    def _set_mtime(self, path, mtime):
+        """Set modification time of remote ``path``
+        """
+        self.ftp.utime(path, (mtime, mtime))
+        self._invalidate(path)
+
+    @instrument('mkdir')
+    @retrying
     def mkdir(self, remotedir):
         """Make remote directory
 
@@ -158,7 +1170,10 @@ class SFTP(object):
         if self.logger:
             self.logger.info('ska_ftp: mkdir {}'.format(remotedir))
         self.ftp.mkdir(remotedir)
+        self._invalidate(remotedir)
 
+    @instrument('rename')
+    @retrying
     def rename(self, oldpath, newpath):
         """Rename remote ``oldpath`` to ``newpath``
 
@@ -168,7 +1183,10 @@ class SFTP(object):
         if self.logger:
             self.logger.info('ska_ftp: rename {} {}'.format(oldpath, newpath))
         self.ftp.rename(oldpath, newpath)
+        self._invalidate(oldpath, newpath)
 
+    @instrument('delete')
+    @retrying
     def delete(self, path):
         """Delete ``path`` file
 
@@ -177,7 +1195,10 @@ class SFTP(object):
         if self.logger:
             self.logger.info('ska_ftp: delete {}'.format(path))
         self.ftp.remove(path)
+        self._invalidate(path)
 
+    @instrument('rmdir')
+    @retrying
     def rmdir(self, path):
         """Delete ``path`` directory
 
@@ -186,12 +1207,143 @@ class SFTP(object):
         if self.logger:
             self.logger.info('ska_ftp: rmdir {}'.format(path))
         self.ftp.rmdir(path)
+        self._invalidate(path)
+
+    def _request_many(self, items, requests, convert, max_requests):
+        """Send one pipelined SFTP request per item and return a Report with
+        ``convert(item, t, msg)`` as the value for each item.
+        """
+        report = Report()
+        try:
+            responses = request_many(self.ftp, requests, max_requests)
+            for item, (t, msg, elapsed) in zip(items, responses):
+                try:
+                    value = convert(item, t, msg)
+                except Exception as err:
+                    report.append(Result(item, error=err, elapsed=elapsed))
+                else:
+                    report.append(Result(item, value=value, elapsed=elapsed))
+        except Exception as err:
+            # The channel failed so the remaining items were not done
+            report.extend(Result(item, error=err) for item in items[len(report):])
+        return report
+
+    @instrument('delete_many')
+    def delete_many(self, paths, max_requests=64):
+        """Delete many files, with up to ``max_requests`` requests in flight on the
+        SFTP channel.
+
+        A failure for one file does not stop the others.
+
+        :param paths: list of paths on remote to delete
+        :param max_requests: maximum number of outstanding requests
+        :returns: ska_ftp.parallel.Report with one result per path
+        """
+        from paramiko.sftp import CMD_REMOVE
+
+        paths = list(paths)
+        if self.logger:
+            self.logger.info('ska_ftp: delete_many {} paths'.format(len(paths)))
+        requests = ((CMD_REMOVE, self.ftp._adjust_cwd(path)) for path in paths)
+        try:
+            return self._request_many(paths, requests,
+                                      lambda path, t, msg: _sftp_status(self.ftp, t, msg),
+                                      max_requests)
+        finally:
+            self._invalidate(*paths)
+
+    @instrument('rename_many')
+    def rename_many(self, pairs, max_requests=64):
+        """Rename many remote paths, with up to ``max_requests`` requests in flight
+        on the SFTP channel.
+
+        A failure for one rename does not stop the others.
+
+        :param pairs: list of (oldpath, newpath) tuples
+        :param max_requests: maximum number of outstanding requests
+        :returns: ska_ftp.parallel.Report with one result per pair
+        """
+        from paramiko.sftp import CMD_RENAME
+
+        pairs = [tuple(pair) for pair in pairs]
+        if self.logger:
+            self.logger.info('ska_ftp: rename_many {} paths'.format(len(pairs)))
+        requests = ((CMD_RENAME, self.ftp._adjust_cwd(oldpath), self.ftp._adjust_cwd(newpath))
+                    for oldpath, newpath in pairs)
+        try:
+            return self._request_many(pairs, requests,
+                                      lambda pair, t, msg: _sftp_status(self.ftp, t, msg),
+                                      max_requests)
+        finally:
+            self._invalidate(*[path for pair in pairs for path in pair])
+
+    @instrument('stat_many')
+    def stat_many(self, paths, max_requests=64):
+        """Get attributes of many remote paths, with up to ``max_requests`` requests
+        in flight on the SFTP channel.
+
+        :param paths: list of paths on remote
+        :param max_requests: maximum number of outstanding requests
+        :returns: ska_ftp.parallel.Report with a ska_ftp.listing.RemoteEntry value
+            for each path that exists
+        """
+        import paramiko
+        from paramiko.sftp import CMD_STAT, CMD_ATTRS
+
+        paths = list(paths)
+        if self.logger:
+            self.logger.info('ska_ftp: stat_many {} paths'.format(len(paths)))
+
+        def convert(path, t, msg):
+            if t != CMD_ATTRS:
+                _sftp_status(self.ftp, t, msg)
+            attr = paramiko.SFTPAttributes._from_msg(msg, posixpath.basename(path))
+            return from_sftp_attr(attr)
+
+        requests = ((CMD_STAT, self.ftp._adjust_cwd(path)) for path in paths)
+        return self._request_many(paths, requests, convert, max_requests)
+
+    @instrument('makedirs')
+    def makedirs(self, path, exist_ok=False):
+        """Make remote directory ``path`` and any missing parent directories, like
+        ``os.makedirs()``.
+
+        The mkdir requests for all levels are sent at once, so this takes a
+        single round trip however deep ``path`` is.
+
+        :param path: directory path on remote
+        :param exist_ok: do not raise an error if ``path`` is already a directory
+        :raises FileExistsError: if ``path`` exists and ``exist_ok`` is False or
+            ``path`` is not a directory
+        """
+        import paramiko
+        from paramiko.sftp import CMD_MKDIR
+
+        if self.logger:
+            self.logger.info('ska_ftp: makedirs {}'.format(path))
+        attr = paramiko.SFTPAttributes()
+        attr.st_mode = 0o777
+        prefixes = _split_prefixes(path)
+        requests = ((CMD_MKDIR, self.ftp._adjust_cwd(prefix), attr) for prefix in prefixes)
+        report = self._request_many(prefixes, requests,
+                                    lambda prefix, t, msg: _sftp_status(self.ftp, t, msg), 64)
+        self._invalidate(*prefixes)
+        if report[-1].ok:
+            return
+        try:
+            mode = self.ftp.stat(path).st_mode
+        except IOError:
+            raise report[-1].error
+        if not (exist_ok and stat.S_ISDIR(mode)):
+            raise FileExistsError(errno.EEXIST, 'File exists', path)
 
     def __getattr__(self, attr):
         """
         Fall through to SFTPClient methods, and fail if not found.
         """
-        if (attr == 'ftp') or (attr == 'logger'):
+        if attr in ('ftp', '_ftp', 'logger', 'host', 'port', 'user', '_passwd', '_cache', '_home',
+                    'metrics', 'retry', 'compress', '_retrying', '_transport_kwargs',
+                    '_exec_tar'):
             raise AttributeError("'{}' attr missing from ska_ftp object".format(attr))
         val = getattr(self.ftp, attr)
         if self.logger:
@@ -199,6 +1351,10 @@ class SFTP(object):
         return val
 
 
+class _TailMismatch(Exception):
+    """Existing partial file does not match the source, so resume is not safe"""
+
+
 class FTP(ftplib.FTP):
     """Initialize object for simpler ftp operations.
 
@@ -210,27 +1366,140 @@ class FTP(ftplib.FTP):
     :param passwd: password (default=netrc value or anonymous@ )
     :param netrcfile: netrc file name (default=~/.netrc)
     :param logger: logger object (e.g. pyyaks.logger.get_logger())
+    :param port: ftp port on host (default=21)
+    :param cache_ttl: cache ``ls()``, ``ls_full()`` and ``ls_entries()`` results for
+        this many seconds (default=None, no caching)
+    :param cache_size: maximum number of cached results (default=1000)
+    :param metrics: metrics sink for per-operation timing (see ``ska_ftp.metrics``,
+        default=None)
+    :param retry: ska_ftp.retry.RetryPolicy to retry failed operations and reconnect
+        dropped sessions (default=None, no retry)
+    :param compress: compress data connections with ``MODE Z`` (zlib) if the server
+        supports it, otherwise fall back to uncompressed transfers (default=False)
+    :param rate_limit: limit the total rate of transfers by this session and its
+        clones (bytes/sec, default=None, no limit).  See ``ska_ftp.throttle``.
+    :param lazy: defer the connection and login until the first command
+        (default=False)
     """
-    def __init__(self, host, user=None, passwd=None, netrcfile=None, logger=None):
-        auths = parse_netrc(netrcfile)
-        if host in auths:
-            if user is None:
-                user = auths[host]['login']
-            if passwd is None:
-                passwd = auths[host]['password']
+    protocol = 'ftp'
+
+    def __init__(self, host, user=None, passwd=None, netrcfile=None, logger=None,
+                 port=21, cache_ttl=None, cache_size=1000, metrics=None, retry=None,
+                 compress=False, rate_limit=None, lazy=False):
+        if user is None or passwd is None:
+            auths = parse_netrc(netrcfile)
+            if host in auths:
+                if user is None:
+                    user = auths[host]['login']
+                if passwd is None:
+                    passwd = auths[host]['password']
         args = []
         if user is not None:
             args.append(user)
             # Password requires that a user was specified
             if passwd is not None:
                 args.append(passwd)
-        ftplib.FTP.__init__(self, host)
-        self.login(*args)
-        self.ftp = self  # for back compatibility with initial release
+        ftplib.FTP.__init__(self)
+        self.metrics = metrics
+        self.retry = retry
+        self.compress = compress
+        self._bucket = None if rate_limit is None else _throttle.TokenBucket(rate_limit)
+        self._limiter = None
         self.logger = logger
+        self._retrying = False
+        self._login_args = tuple(args)
+        self.host = host
+        self.port = port
+        self.ftp = self  # for back compatibility with initial release
+        self.user = user
+        self._passwd = passwd
+        self._mlsd_supported = None
+        self._mlst_supported = None
+        self._mode_z = False
+        self._cache = None if cache_ttl is None else ListingCache(cache_ttl, cache_size)
+        # Working directory for cache keys and reconnection, tracked by cd() to
+        # avoid a PWD per call
+        self._cwd_path = None
+        self._pending = lazy
+        if not lazy:
+            self._open()
+
+    def _open(self):
+        """Connect and log in for the first time
+        """
+        self._connect(self.host, self.port)
+        if self._cache is not None or self.retry is not None:
+            self._cwd_path = self.pwd()
+        if self.logger:
+            self.logger.info('ska_ftp: log in to {} as {}'.format(self.host, self.user))
+
+    def _ensure_open(self):
+        """Connect a lazy session if that has not been done yet
+        """
+        if self._pending:
+            self._pending = False
+            try:
+                self._open()
+            except Exception:
+                ftplib.FTP.close(self)
+                self._pending = True
+                raise
+
+    def putline(self, line):
+        """Send one line to the server, first connecting a lazy session
+        """
+        self._ensure_open()
+        ftplib.FTP.putline(self, line)
+
+    def _connect(self, host, port):
+        """Connect and log in
+        """
+        timed(self.metrics, host, self.protocol, 'connect', self.connect, (host, port))
+        timed(self.metrics, host, self.protocol, 'login', self.login, self._login_args)
+        self._mode_z = False
+        if self.compress:
+            try:
+                self.voidcmd('MODE Z')
+                self._mode_z = True
+            except ftplib.error_perm:
+                if self.logger:
+                    self.logger.info('ska_ftp: {} does not support MODE Z, transfers '
+                                     'are not compressed'.format(host))
+
+    def ntransfercmd(self, cmd, rest=None):
+        """Initiate a data transfer, wrapping the data connection in a zlib stream
+        if MODE Z is active.
+        """
+        conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        if self._mode_z:
+            conn = ZlibSocket(conn)
+        return conn, size
+
+    def _reconnect(self):
+        """Replace a dropped connection and restore the working directory
+        """
         if self.logger:
-            self.logger.info('ska_ftp: log in to {} as {}'.format(host, user))
+            self.logger.info('ska_ftp: reconnect to {}'.format(self.host))
+        ftplib.FTP.close(self)
+        self._connect(self.host, self.port)
+        if self._cwd_path is not None:
+            self.cwd(self._cwd_path)
+
+    def is_alive(self):
+        """Return True if the FTP control connection is still usable.
+
+        This sends a NOOP command to the server.
+
+        :returns: bool
+        """
+        try:
+            self.voidcmd('NOOP')
+        except Exception:
+            return False
+        return True
 
+    @instrument('cd')
+    @retrying
     def cd(self, dirname):
         """Change to specified directory ``dirname``.
 
@@ -240,48 +1509,867 @@ class FTP(ftplib.FTP):
             self.logger.info('ska_ftp: cd {}'.format(dirname))
         self.cwd(dirname)
 
-    def ls(self, dirname='', *args):
+    def cwd(self, dirname):
+        """Change to directory ``dirname`` like ``ftplib.FTP.cwd()``, keeping track of
+        the working directory for cache keys and reconnection.
+        """
+        resp = ftplib.FTP.cwd(self, dirname)
+        if self._cwd_path is not None:
+            self._cwd_path = self.pwd()
+        return resp
+
+    @instrument('ls')
+    @retrying
+    def ls(self, dirname='', *args, refresh=False):
         """List contents of directory ``dirname`` via NLST command.
 
         :param dirname: directory name
+        :param refresh: bypass the listing cache (default=False)
         :returns: list of file and/or directory names
         """
         if self.logger:
             self.logger.info('ska_ftp: ls {} {}'.format(dirname, ' '.join(str(x) for x in args)))
-        return self.nlst(dirname, *args)
+        return _cached(self, ('ls', self._abspath(dirname)) + args, refresh,
+                       lambda: self.nlst(dirname, *args))
 
-    def ls_full(self, dirname='', *args):
+    @instrument('ls_full')
+    @retrying
+    def ls_full(self, dirname='', *args, refresh=False):
         """List full contents of directory ``dirname``.
 
         :param dirname: directory name
+        :param refresh: bypass the listing cache (default=False)
         :returns: list of full FTP output for LIST command
         """
         if self.logger:
             self.logger.info('ska_ftp: ls {} {}'.format(dirname, ' '.join(str(x) for x in args)))
-        return self.dir(dirname, *args)
 
-    def put(self, localfile, remotefile=None):
+        def list_lines():
+            lines = []
+            self.dir(dirname, *args, lines.append)
+            return lines
+
+        return _cached(self, ('ls_full', self._abspath(dirname)) + args, refresh, list_lines)
+
+    @instrument('ls_entries')
+    @retrying
+    def ls_entries(self, dirname='', refresh=False):
+        """List contents of directory ``dirname`` as structured entries.
+
+        This uses MLSD if the server supports it, otherwise the output of LIST
+        is parsed (Unix ``ls -l`` and DOS formats are recognized, other lines
+        are skipped).
+
+        :param dirname: directory name
+        :param refresh: bypass the listing cache (default=False)
+        :returns: list of ska_ftp.listing.RemoteEntry (name, size, mtime, mode, is_dir)
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: ls {}'.format(dirname))
+        return _cached(self, ('ls_entries', self._abspath(dirname)), refresh,
+                       lambda: self._list_entries(dirname))
+
+    def _list_entries(self, dirname):
+        if self._mlsd_supported is not False:
+            try:
+                entries = [from_mlsd(name, facts) for name, facts in self.mlsd(dirname)]
+            except ftplib.error_perm as err:
+                # 500/502 means MLSD is not implemented, anything else is a real error
+                if not str(err).startswith(('500', '502')):
+                    raise
+                self._mlsd_supported = False
+            else:
+                self._mlsd_supported = True
+                return [entry for entry in entries if entry is not None]
+
+        lines = []
+        self.dir(dirname, lines.append)
+        entries = (parse_list_line(line) for line in lines)
+        return [entry for entry in entries
+                if entry is not None and entry.name not in ('.', '..')]
+
+    def clear_cache(self):
+        """Drop all cached listing results
+        """
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _abspath(self, path):
+        """Normalized absolute remote path for cache keys
+        """
+        if self._cache is None:
+            return path
+        self._ensure_open()
+        return posixpath.normpath(posixpath.join(self._cwd_path, path))
+
+    def _invalidate(self, *paths):
+        """Drop cached results that a change to remote ``paths`` could affect
+        """
+        if self._cache is not None:
+            self._cache.invalidate(*[self._abspath(path) for path in paths])
+
+    @instrument('put', _put_nbytes)
+    @retrying
+    def put(self, localfile, remotefile=None, callback=None, resume=None,
+            resume_check=None, verify=None, atomic=False,
+            rate_limit=None, priority=_throttle.NORMAL, block_size=None):
         """Put the ``localfile`` to the FTP server as ``remotefile``.
 
+        The data are sent with ``socket.sendfile()`` (zero-copy in the kernel)
+        unless they must be hashed (``verify``) or compressed (``compress=True``),
+        in which case they are read into one reused buffer.
+
+        With ``resume=True`` the data are uploaded to ``<remotefile>.part``.  If
+        that file already exists from an interrupted upload then only the rest
+        of ``localfile`` is appended (APPE).  When complete and checked the
+        ``.part`` file is renamed to ``remotefile``.
+
         :param localfile: file name  on local host
         :param remotefile: file name on remote FTP host (default=localfile)
+        :param callback: optional callback function that accepts bytes transferred so far
+            and total bytes
+        :param resume: resume an interrupted upload (default=True if the session has
+            a retry policy, else False)
+        :param resume_check: number of bytes at the end of an existing partial file
+            to compare before resuming.  On mismatch the upload restarts from zero.
+            (default=None, no check, or RESUME_CHECK if resume is implied by a retry
+            policy)
+        :param verify: hash algorithm (e.g. 'md5' or 'sha256') to checksum the data as
+            it is sent and compare to the server or sidecar hash (default=None)
+        :param atomic: upload to a unique temporary name in the same directory and
+            rename it to ``remotefile`` only after the checksum is confirmed, so
+            ``remotefile`` is never seen partially written.  A resumed upload is
+            always atomic in this way, with ``<remotefile>.part`` as the temporary
+            name.  (default=False)
+        :param rate_limit: maximum rate for this transfer (bytes/sec, default=None).
+            Session and process limits also apply, see ``ska_ftp.throttle``.
+        :param priority: priority class when sharing a rate limit: ska_ftp.throttle.HIGH,
+            NORMAL (default) or LOW
+        :param block_size: bytes per send call (default=FTP_BLOCK_SIZE, 128 KiB)
+        :returns: hex digest if ``verify`` is set, else None
         """
         if remotefile is None:
             remotefile = os.path.basename(localfile)
         if self.logger:
             self.logger.info('ska_ftp: put {} as {}'.format(localfile, remotefile))
-        with contextlib.closing(open(localfile, 'rb')) as fh:
-            self.storbinary('STOR ' + remotefile, fh)
+        resume, resume_check = _default_resume(self, resume, resume_check)
+        hasher = None if verify is None else _verify.new_hasher(verify)
+        with self._limited(rate_limit, priority):
+            # The data are renamed to remotefile only after they are checked
+            partfile = remotefile + '.part' if resume else None
+            tmpfile = _temp_name(remotefile) if atomic and not resume else None
+            target = partfile or tmpfile or remotefile
+            try:
+                if resume:
+                    self._put_resume(localfile, partfile, callback, resume_check, hasher,
+                                     block_size)
+                else:
+                    with contextlib.closing(open(localfile, 'rb')) as fh:
+                        self._store('STOR ' + target, fh, callback, hasher=hasher,
+                                    block_size=block_size)
+                if hasher is not None:
+                    try:
+                        _verify.check(self, target, verify, hasher.digest())
+                    except _verify.ChecksumError:
+                        # Do not resume from bad data
+                        if partfile is not None:
+                            try:
+                                ftplib.FTP.delete(self, partfile)
+                            except Exception:
+                                pass
+                        raise
+                if target != remotefile:
+                    self._replace(target, remotefile)
+            except BaseException:
+                if tmpfile is not None:
+                    try:
+                        ftplib.FTP.delete(self, tmpfile)
+                    except Exception:
+                        pass
+                raise
+            finally:
+                self._invalidate(remotefile, remotefile + '.part')
+            if hasher is not None:
+                return hasher.hexdigest()
+
+    @contextlib.contextmanager
+    def _limited(self, rate_limit, priority):
+        """Apply the transfer, session and process rate limits to block transfers
+        within the context
+        """
+        self._limiter = _throttle.limiter(rate_limit, self._bucket, priority)
+        try:
+            yield
+        finally:
+            self._limiter = None
+
+    def _put_resume(self, localfile, partfile, callback, resume_check, hasher,
+                    block_size=None):
+        """Upload to ``partfile``, appending to an existing partial file.
+        """
+        with open(localfile, 'rb') as fh:
+            file_size = os.fstat(fh.fileno()).st_size
+            offset = self._size(partfile) or 0
+            if offset > file_size:
+                offset = 0
+            if offset and resume_check:
+                n_check = min(resume_check, offset)
+                fh.seek(offset - n_check)
+                local_tail = fh.read(n_check)
+                remote_tail = []
+                self.retrbinary('RETR ' + partfile, remote_tail.append, rest=offset - n_check)
+                if b''.join(remote_tail) != local_tail:
+                    if self.logger:
+                        self.logger.info('ska_ftp: {} does not match {}, restarting put'
+                                         .format(partfile, localfile))
+                    offset = 0
+            if offset and self.logger:
+                self.logger.info('ska_ftp: resume put of {} at {}'.format(localfile, offset))
+            if hasher is not None and offset:
+                _verify.hash_file(localfile, hasher, offset)
+            fh.seek(offset)
+            cmd = ('APPE ' if offset else 'STOR ') + partfile
+            self._store(cmd, fh, callback, offset, hasher, block_size)
+
+    def _store(self, cmd, fh, callback=None, offset=0, hasher=None, block_size=None):
+        """Upload open file ``fh`` from its current position with ``cmd``.
 
-    def get(self, remotefile, localfile=None):
+        This sends the same commands as ``storbinary()``, but the data go out
+        with ``socket.sendfile()`` in ``block_size`` chunks, or from one reused
+        buffer if they must be hashed or the connection is compressed.
+        """
+        if block_size is None:
+            block_size = FTP_BLOCK_SIZE
+        total = os.fstat(fh.fileno()).st_size
+        transferred = offset
+
+        self.voidcmd('TYPE I')
+        conn = self.transfercmd(cmd)
+        try:
+            with conn:
+                if hasher is None and not isinstance(conn, ZlibSocket):
+                    position = fh.tell()
+                    while True:
+                        n_bytes = conn.sendfile(fh, position, block_size)
+                        if not n_bytes:
+                            break
+                        position += n_bytes
+                        transferred += n_bytes
+                        if self._limiter is not None:
+                            self._limiter(n_bytes)
+                        if callback is not None:
+                            callback(transferred, total)
+                else:
+                    buf = bytearray(block_size)
+                    view = memoryview(buf)
+                    while True:
+                        n_bytes = fh.readinto(buf)
+                        if not n_bytes:
+                            break
+                        block = view[:n_bytes]
+                        if hasher is not None:
+                            hasher.update(block)
+                        conn.sendall(block)
+                        transferred += n_bytes
+                        if self._limiter is not None:
+                            self._limiter(n_bytes)
+                        if callback is not None:
+                            callback(transferred, total)
+        except Exception:
+            # Data connection was closed early, consume the server's reply
+            self._drain_reply()
+            raise
+        self.voidresp()
+
+    def _drain_reply(self):
+        """Consume the server's reply after a data transfer was aborted by the
+        client, so that the control connection stays in sync.
+        """
+        try:
+            self.voidresp()
+        except ftplib.all_errors:
+            pass
+
+    def _replace(self, oldpath, newpath):
+        """Rename ``oldpath`` to ``newpath``, replacing ``newpath`` if the server
+        does not allow RNTO to overwrite an existing file.
+        """
+        try:
+            self.rename(oldpath, newpath)
+        except ftplib.error_perm:
+            if self._size(newpath) is None:
+                raise
+            self.delete(newpath)
+            self.rename(oldpath, newpath)
+
+    @instrument('get', _get_nbytes)
+    @retrying
+    def get(self, remotefile, localfile=None, callback=None, resume=None,
+            resume_check=None, verify=None,
+            rate_limit=None, priority=_throttle.NORMAL, block_size=None):
         """Get the ``remotefile`` from the FTP server as ``localfile`` on the local host.
 
+        With ``resume=True`` the data are downloaded to ``<localfile>.part``.  If
+        that file already exists from an interrupted download then only the rest
+        of ``remotefile`` is retrieved (REST).  When complete the ``.part`` file
+        is renamed to ``localfile``, so ``localfile`` never contains partial data.
+
         :param remotefile: file name on remote FTP host
         :param localfile: file name  on local host (default=remotefile)
+        :param callback: optional callback function that accepts bytes transferred so far
+            and total bytes (None if the server does not support SIZE)
+        :param resume: resume an interrupted download (default=True if the session has
+            a retry policy, else False)
+        :param resume_check: number of bytes at the end of an existing partial file
+            to compare before resuming.  On mismatch the download restarts from zero.
+            (default=None, no check, or RESUME_CHECK if resume is implied by a retry
+            policy)
+        :param verify: hash algorithm (e.g. 'md5' or 'sha256') to checksum the data as
+            it is received and compare to the server or sidecar hash.  On mismatch
+            ``localfile`` is removed and ChecksumError is raised.  (default=None)
+        :param rate_limit: maximum rate for this transfer (bytes/sec, default=None).
+            Session and process limits also apply, see ``ska_ftp.throttle``.
+        :param priority: priority class when sharing a rate limit: ska_ftp.throttle.HIGH,
+            NORMAL (default) or LOW
+        :param block_size: receive buffer size (default=FTP_BLOCK_SIZE, 128 KiB)
+        :returns: hex digest if ``verify`` is set, else None
         """
         if localfile is None:
             localfile = os.path.basename(remotefile)
         if self.logger:
             self.logger.info('ska_ftp: get {} as {}'.format(remotefile, localfile))
-        with contextlib.closing(open(localfile, 'wb')) as fh:
-            self.retrbinary('RETR ' + remotefile, fh.write)
+        resume, resume_check = _default_resume(self, resume, resume_check)
+        hasher = None if verify is None else _verify.new_hasher(verify)
+        with self._limited(rate_limit, priority):
+            if resume:
+                hasher = self._get_resume(remotefile, localfile, callback, resume_check, hasher,
+                                          block_size)
+            else:
+                with contextlib.closing(open(localfile, 'wb')) as fh:
+                    total = None if callback is None else self._size(remotefile)
+                    self._retrieve(remotefile, fh, callback, total, hasher=hasher,
+                                   block_size=block_size)
+            if hasher is not None:
+                _verify_local(self, remotefile, localfile, verify, hasher)
+                return hasher.hexdigest()
+
+    def _get_resume(self, remotefile, localfile, callback, resume_check, hasher,
+                    block_size=None):
+        """Download to ``<localfile>.part``, continuing an existing partial file,
+        then rename to ``localfile``.
+
+        :returns: ``hasher`` updated with the whole file
+        """
+        partfile = str(localfile) + '.part'
+        total = self._size(remotefile)
+        offset = os.path.getsize(partfile) if os.path.exists(partfile) else 0
+        if total is not None and offset > total:
+            offset = 0
+        with open(partfile, 'r+b' if offset else 'wb') as fh:
+            tail = b''
+            if offset and resume_check:
+                n_check = min(resume_check, offset)
+                fh.seek(offset - n_check)
+                tail = fh.read(n_check)
+            fh.seek(offset)
+            fh.truncate()
+            if offset and self.logger:
+                self.logger.info('ska_ftp: resume get of {} at {}'.format(remotefile, offset))
+            resume_hasher = hasher
+            if hasher is not None and offset:
+                resume_hasher = _verify.hash_file(partfile, hasher.copy(), offset)
+            try:
+                self._retrieve(remotefile, fh, callback, total, offset, tail, resume_hasher,
+                               block_size)
+            except _TailMismatch:
+                if self.logger:
+                    self.logger.info('ska_ftp: {} does not match {}, restarting get'
+                                     .format(partfile, remotefile))
+                fh.seek(0)
+                fh.truncate()
+                self._retrieve(remotefile, fh, callback, total, hasher=hasher,
+                               block_size=block_size)
+            else:
+                hasher = resume_hasher
+        os.replace(partfile, localfile)
+        return hasher
+
+    def open_stream(self, remotefile, mode='rb', block_size=None):
+        """Open ``remotefile`` as a buffered binary file-like object.
+
+        Data are streamed over the FTP data connection without a local copy.
+        The returned reader supports ``read()``, ``readinto()`` (a buffer larger
+        than ``block_size`` is filled directly from the socket), iteration and
+        ``chunks(size)``.  The control connection is busy until the stream is
+        closed, so use it in a ``with`` block::
+
+          with ftp.open_stream('data.fits.gz') as fh:
+              for chunk in fh.chunks():
+                  process(chunk)
+
+        :param remotefile: file name on remote host
+        :param mode: 'rb' or 'wb'
+        :param block_size: buffer size (default=65536)
+        :returns: ska_ftp.stream.RemoteReader ('rb') or io.BufferedWriter ('wb')
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: open_stream {} {}'.format(remotefile, mode))
+        return _stream.open_ftp(self, remotefile, mode, block_size)
+
+    def _retrieve(self, remotefile, fh, callback=None, total=None, offset=0, tail=b'',
+                  hasher=None, block_size=None):
+        """Download ``remotefile`` starting at ``offset`` into open file ``fh``.
+
+        This sends the same commands as ``retrbinary()``, but the data are
+        received with ``recv_into()`` into one reused ``block_size`` buffer.
+
+        If ``tail`` is given then the download starts ``len(tail)`` bytes before
+        ``offset`` and those bytes must match ``tail``, otherwise the transfer is
+        aborted with _TailMismatch.
+        """
+        if block_size is None:
+            block_size = FTP_BLOCK_SIZE
+        transferred = offset
+        check = tail
+        buf = bytearray(block_size)
+        view = memoryview(buf)
+
+        rest = offset - len(tail) if offset else None
+        self.voidcmd('TYPE I')
+        conn = self.transfercmd('RETR ' + remotefile, rest)
+        try:
+            with conn:
+                while True:
+                    n_bytes = conn.recv_into(buf)
+                    if not n_bytes:
+                        break
+                    block = view[:n_bytes]
+                    if check:
+                        n_check = min(len(check), n_bytes)
+                        if block[:n_check] != check[:n_check]:
+                            raise _TailMismatch()
+                        check = check[n_check:]
+                        block = block[n_check:]
+                        if not block:
+                            continue
+                    fh.write(block)
+                    if hasher is not None:
+                        hasher.update(block)
+                    transferred += len(block)
+                    if self._limiter is not None:
+                        self._limiter(len(block))
+                    if callback is not None:
+                        callback(transferred, total)
+        except Exception:
+            # Data connection was closed early, consume the server's reply
+            self._drain_reply()
+            raise
+        self.voidresp()
+
+    def _remote_hash(self, path, algorithm):
+        """Digest of remote ``path`` from the server (HASH or XMD5-style commands)
+        or a ``<path>.<algorithm>`` sidecar file, or None if neither is available
+        """
+        name = _verify.FTP_HASH_NAMES.get(algorithm)
+        if name is not None:
+            try:
+                self.sendcmd('OPTS HASH ' + name)
+                # 213 <algorithm> <start>-<end> <hex digest> <path>
+                return bytes.fromhex(self.sendcmd('HASH ' + path).split()[3])
+            except (ftplib.error_perm, ValueError, IndexError):
+                pass
+            try:
+                return bytes.fromhex(self.sendcmd('X' + name.replace('-', '') + ' ' + path)
+                                     .split()[-1])
+            except (ftplib.error_perm, ValueError, IndexError):
+                pass
+        lines = []
+        try:
+            self.retrbinary('RETR ' + path + '.' + algorithm, lines.append)
+            return _verify.parse_sidecar(b''.join(lines).decode('ascii'))
+        except (ftplib.error_perm, ValueError, IndexError):
+            return None
+
+    def _size(self, remotefile):
+        """Size of ``remotefile`` in bytes, or None if SIZE is not supported.
+        """
+        try:
+            self.voidcmd('TYPE I')
+            return self.size(remotefile)
+        except ftplib.error_perm:
+            return None
+
+    def _cwd(self):
+        """Current remote working directory
+        """
+        return self.pwd()
+
+    def _clone(self, cwd=None):
+        """Return a new logged-in FTP connection to the same server.
+
+        :param cwd: initial working directory for the new connection (default=None)
+        """
+        clone = FTP(self.host, user=self.user, passwd=self._passwd, port=self.port,
+                    logger=self.logger, metrics=self.metrics, retry=self.retry,
+                    compress=self.compress)
+        # Clones count against the same session limit
+        clone._bucket = self._bucket
+        if cwd is not None:
+            clone.cwd(cwd)
+        if self._cache is not None:
+            # Share the cache so that changes made by the clone invalidate it
+            clone._cache = self._cache
+            if clone._cwd_path is None:
+                clone._cwd_path = clone.pwd()
+        return clone
+
+    def sync_dir(self, remote, local, direction='down', delete=False, checksum=False,
+                 workers=4):
+        """Incrementally mirror directory ``remote`` to ``local`` (direction='down')
+        or ``local`` to ``remote`` (direction='up').
+
+        Only new or changed files are transferred.
+        See ``ska_ftp.sync.sync_dir()`` for details.
+
+        :param remote: remote directory
+        :param local: local directory
+        :param direction: 'down' (remote to local) or 'up' (local to remote)
+        :param delete: delete files and directories that are not in the source
+        :param checksum: compare files by MD5 instead of modification time
+        :param workers: number of concurrent connections
+        :returns: ska_ftp.sync.SyncSummary
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: sync_dir {} {} {}'.format(remote, local, direction))
+        return _sync_dir(self, remote, local, direction=direction, delete=delete,
+                         checksum=checksum, workers=workers)
+
+    def walk(self, top, workers=4, onerror=None):
+        """Generate ``(dirpath, dirnames, filenames)`` for each directory under ``top``,
+        like ``os.walk()``.
+
+        Sibling directories are listed concurrently using up to ``workers``
+        additional FTP connections.  See ``ska_ftp.walk.walk()`` for details.
+
+        :param top: remote directory
+        :param workers: maximum number of concurrent directory listings
+        :param onerror: function called with the exception if a listing fails
+            (default=None, errors are ignored)
+        :returns: generator of (dirpath, dirnames, filenames)
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: walk {}'.format(top))
+        return _walk.walk(self, top, workers=workers, onerror=onerror)
+
+    def glob(self, pattern, workers=4, onerror=None):
+        """Generate remote paths matching ``pattern``, e.g. ``'data/*/2026*/*.fits.gz'``.
+
+        A ``**`` component matches any number of directories.  See
+        ``ska_ftp.walk.glob()`` for details.
+
+        :param pattern: remote path pattern
+        :param workers: maximum number of concurrent directory listings
+        :param onerror: function called with the exception if a listing fails
+            (default=None, errors are ignored)
+        :returns: generator of matching paths
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: glob {}'.format(pattern))
+        return _walk.glob(self, pattern, workers=workers, onerror=onerror)
+
+    def scan(self, root, index, skip_unchanged_dirs=False, checksum=None, workers=4):
+        """Scan the remote tree ``root`` and return the files added, modified or
+        deleted since the previous scan recorded in ``index``.
+
+        See ``ska_ftp.manifest.scan()`` for details.
+
+        :param root: remote directory (preferably an absolute path)
+        :param index: ska_ftp.manifest.ManifestIndex or SQLite file name
+        :param skip_unchanged_dirs: do not list directories with an unchanged mtime
+        :param checksum: hash algorithm to store checksums of new and modified files
+            (default=None)
+        :param workers: maximum number of concurrent directory listings
+        :returns: ska_ftp.manifest.ScanResult
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: scan {}'.format(root))
+        from . import manifest as _manifest
+
+        return _manifest.scan(self, root, index, skip_unchanged_dirs=skip_unchanged_dirs,
+                              checksum=checksum, workers=workers)
+
+    @instrument('mkdir')
+    @retrying
+    def mkdir(self, remotedir):
+        """Make remote directory
+
+        :param remotedir: dir name on remote FTP host
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: mkdir {}'.format(remotedir))
+        self.mkd(remotedir)
+        self._invalidate(remotedir)
+
+    @instrument('rename')
+    @retrying
+    def rename(self, oldpath, newpath):
+        """Rename remote ``oldpath`` to ``newpath``
+
+        :param oldpath: old path on remote
+        :param newpath: new path on remote
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: rename {} {}'.format(oldpath, newpath))
+        resp = ftplib.FTP.rename(self, oldpath, newpath)
+        self._invalidate(oldpath, newpath)
+        return resp
+
+    @instrument('delete')
+    @retrying
+    def delete(self, path):
+        """Delete ``path`` file
+
+        :param path: path on remote to delete
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: delete {}'.format(path))
+        resp = ftplib.FTP.delete(self, path)
+        self._invalidate(path)
+        return resp
+
+    @instrument('rmdir')
+    @retrying
+    def rmdir(self, path):
+        """Delete ``path`` directory
+
+        :param path: path on remote to delete
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: rmdir {}'.format(path))
+        self.rmd(path)
+        self._invalidate(path)
+
+    @instrument('delete_many')
+    def delete_many(self, paths, workers=4):
+        """Delete many files using up to ``workers`` FTP connections.
+
+        A failure for one file does not stop the others.
+
+        :param paths: list of paths on remote to delete
+        :param workers: number of concurrent connections
+        :returns: ska_ftp.parallel.Report with one result per path
+        """
+        paths = list(paths)
+        if self.logger:
+            self.logger.info('ska_ftp: delete_many {} paths'.format(len(paths)))
+        try:
+            return fan_out(self, lambda ftp, path: ftplib.FTP.delete(ftp, path), paths,
+                            workers)
+        finally:
+            self._invalidate(*paths)
+
+    @instrument('rename_many')
+    def rename_many(self, pairs, workers=4):
+        """Rename many remote paths using up to ``workers`` FTP connections.
+
+        A failure for one rename does not stop the others.
+
+        :param pairs: list of (oldpath, newpath) tuples
+        :param workers: number of concurrent connections
+        :returns: ska_ftp.parallel.Report with one result per pair
+        """
+        pairs = [tuple(pair) for pair in pairs]
+        if self.logger:
+            self.logger.info('ska_ftp: rename_many {} paths'.format(len(pairs)))
+        try:
+            return fan_out(self, lambda ftp, pair: ftplib.FTP.rename(ftp, *pair), pairs,
+                            workers)
+        finally:
+            self._invalidate(*[path for pair in pairs for path in pair])
+
+    @instrument('stat_many')
+    def stat_many(self, paths, workers=4):
+        """Get attributes of many remote paths using up to ``workers`` FTP connections.
+
+        This uses MLST if the server supports it, otherwise SIZE and MDTM for
+        files and the listing of the parent directory for directories.
+
+        :param paths: list of paths on remote
+        :param workers: number of concurrent connections
+        :returns: ska_ftp.parallel.Report with a ska_ftp.listing.RemoteEntry value
+            for each path that exists
+        """
+        paths = list(paths)
+        if self.logger:
+            self.logger.info('ska_ftp: stat_many {} paths'.format(len(paths)))
+        listings = _ParentListings()
+        return fan_out(self, lambda ftp, path: ftp._stat_entry(path, listings), paths,
+                       workers)
+
+    def _stat_entry(self, path, listings=None):
+        """RemoteEntry for ``path`` from MLST, or from SIZE and MDTM
+
+        :param listings: _ParentListings shared by the calls of one ``stat_many()``
+        """
+        if self._mlst_supported is not False:
+            try:
+                resp = self.sendcmd('MLST ' + path)
+            except ftplib.error_perm as err:
+                # 500/502 means MLST is not implemented, anything else is a real error
+                if not str(err).startswith(('500', '502')):
+                    raise
+                self._mlst_supported = False
+            else:
+                self._mlst_supported = True
+                # 250-Listing <path>\r\n <facts> <path>\r\n250 End
+                line = [line for line in resp.splitlines() if line.startswith(' ')][0]
+                facts, _, name = line.strip().partition(' ')
+                facts = dict(fact.split('=', 1) for fact in facts.split(';') if '=' in fact)
+                facts = {key.lower(): value for key, value in facts.items()}
+                if facts.get('type', '').lower() in ('cdir', 'pdir'):
+                    facts['type'] = 'dir'
+                return from_mlsd(posixpath.basename(name.rstrip('/')) or name, facts)
+
+        self.voidcmd('TYPE I')
+        try:
+            facts = {'type': 'file', 'size': str(self.size(path))}
+        except ftplib.error_perm as err:
+            # SIZE only works for files
+            entry = self._dir_entry(path, listings or _ParentListings())
+            if entry is None:
+                raise err
+            return entry
+        try:
+            facts['modify'] = self.sendcmd('MDTM ' + path).split()[1]
+        except ftplib.error_perm:
+            pass
+        return from_mlsd(posixpath.basename(path), facts)
+
+    def _dir_entry(self, path, listings):
+        """RemoteEntry for directory ``path`` without MLST, or None if it is not one.
+
+        The entry comes from the listing of the parent directory, so that its
+        mtime matches the one ``ls_entries()`` gives there.  Each parent is
+        listed once per ``listings``.
+        """
+        path = path.rstrip('/') or path
+        parent, name = posixpath.split(path)
+        if name in ('', '.', '..'):
+            # No parent listing to look in, e.g. '/'
+            return from_mlsd(path, {'type': 'dir'}) if self._is_dir(path) else None
+        entry = listings.get(self, parent).get(name)
+        return entry if entry is not None and entry.is_dir else None
+
+    def _is_dir(self, path):
+        """True if remote ``path`` is a directory
+        """
+        if self._mlst_supported is not False:
+            try:
+                return self._stat_entry(path).is_dir
+            except ftplib.error_perm:
+                if self._mlst_supported:
+                    return False
+        cwd = self.pwd()
+        try:
+            self.cwd(path)
+        except ftplib.error_perm:
+            return False
+        self.cwd(cwd)
+        return True
+
+    @instrument('makedirs')
+    def makedirs(self, path, exist_ok=False):
+        """Make remote directory ``path`` and any missing parent directories, like
+        ``os.makedirs()``.
+
+        The full path is tried first, so parents are only checked if they are
+        missing.
+
+        :param path: directory path on remote
+        :param exist_ok: do not raise an error if ``path`` is already a directory
+        :raises FileExistsError: if ``path`` is a directory and ``exist_ok`` is False
+        """
+        if self.logger:
+            self.logger.info('ska_ftp: makedirs {}'.format(path))
+        try:
+            self._makedirs(path.rstrip('/') or path, exist_ok)
+        finally:
+            self._invalidate(*_split_prefixes(path))
+
+    def _makedirs(self, path, exist_ok):
+        try:
+            self.mkd(path)
+        except ftplib.error_perm:
+            if self._is_dir(path):
+                if exist_ok:
+                    return
+                raise FileExistsError(errno.EEXIST, 'File exists', path)
+            parent = posixpath.dirname(path)
+            if not parent or parent == path:
+                raise
+            self._makedirs(parent, exist_ok=True)
+            self.mkd(path)
+
+    def _remote_md5(self, path):
+        """MD5 digest of remote ``path`` using the XMD5 command
+        """
+        resp = self.sendcmd('XMD5 ' + path)
+        return bytes.fromhex(resp.split()[-1])
+
+    def _set_mtime(self, path, mtime):
+        """Set modification time of remote ``path`` with MFMT if the server supports it
+        """
+        try:
+            self.sendcmd('MFMT {} {}'.format(time.strftime('%Y%m%d%H%M%S', time.gmtime(mtime)),
+                                             path))
+        except ftplib.error_perm:
+            pass
+        self._invalidate(path)
+
+    def put_many(self, pairs, workers=4, callback=None, progress=None, priority=None,
+                 **kwargs):
+        """Put many files concurrently, using ``workers`` FTP control connections.
+
+        Each element of ``pairs`` is either ``localfile`` or a tuple
+        ``(localfile, remotefile)``.  A failure for one file does not stop the
+        other transfers, instead each outcome is recorded in the returned report.
+
+        :param pairs: list of localfile or (localfile, remotefile)
+        :param workers: number of concurrent connections
+        :param callback: optional per-file callback that accepts bytes transferred so far
+            and total bytes
+        :param progress: optional aggregate callback that accepts total bytes transferred,
+            number of files completed and total number of files
+        :param priority: priority class (ska_ftp.throttle.HIGH, NORMAL or LOW) for all
+            files, or a function of each element of ``pairs`` that returns its class.
+            Higher priority files are started first and go first when sharing a rate
+            limit (default=NORMAL).
+        :param **kwargs: additional keyword args for ``put()``
+        :returns: ska_ftp.parallel.Report
+        """
+        return _transfer_many(self, 'put', pairs, workers, callback, progress, kwargs,
+                              priority)
+
+    def get_many(self, pairs, workers=4, callback=None, progress=None, priority=None,
+                 **kwargs):
+        """Get many files concurrently, using ``workers`` FTP control connections.
+
+        Each element of ``pairs`` is either ``remotefile`` or a tuple
+        ``(remotefile, localfile)``.  A failure for one file does not stop the
+        other transfers, instead each outcome is recorded in the returned report.
+
+        :param pairs: list of remotefile or (remotefile, localfile)
+        :param workers: number of concurrent connections
+        :param callback: optional per-file callback that accepts bytes transferred so far
+            and total bytes
+        :param progress: optional aggregate callback that accepts total bytes transferred,
+            number of files completed and total number of files
+        :param priority: priority class (ska_ftp.throttle.HIGH, NORMAL or LOW) for all
+            files, or a function of each element of ``pairs`` that returns its class.
+            Higher priority files are started first and go first when sharing a rate
+            limit (default=NORMAL).
+        :param **kwargs: additional keyword args for ``get()``
+        :returns: ska_ftp.parallel.Report
+        """
+        return _transfer_many(self, 'get', pairs, workers, callback, progress, kwargs,
+                              priority)
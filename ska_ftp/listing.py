@@ -0,0 +1,177 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Structured remote directory listings.
+
+``RemoteEntry`` objects are built directly from paramiko ``SFTPAttributes``,
+from FTP ``MLSD`` facts, or (for FTP servers without MLSD) by parsing the text
+output of ``LIST`` in either Unix ``ls -l`` or DOS/IIS format.
+"""
+
+import re
+import stat
+import time
+import calendar
+
+__all__ = ['RemoteEntry', 'from_sftp_attr', 'from_mlsd', 'parse_list_line', 'to_array']
+
+MONTHS = {name: ii for ii, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+# drwxr-xr-x  2 user group  4096 Jan  1 12:34 name  (or "Jan  1  2020")
+UNIX_RE = re.compile(r'^([\-bcdlps])([\-rwxsStT]{9})[.+@]?\s+\d+\s+(?:\S+\s+){1,2}?'
+                     r'(\d+)\s+(\w{3})\s+(\d{1,2})\s+(\d{1,2}:\d{2}|\d{4})\s(.*)$')
+# 01-31-20  01:23PM       <DIR>          name   or   ...  1234 name
+DOS_RE = re.compile(r'^(\d{2})-(\d{2})-(\d{2,4})\s+(\d{1,2}):(\d{2})([AP]M)\s+'
+                    r'(<DIR>|\d+)\s+(.*)$', re.IGNORECASE)
+
+TYPE_BITS = {'-': stat.S_IFREG, 'd': stat.S_IFDIR, 'l': stat.S_IFLNK, 'b': stat.S_IFBLK,
+             'c': stat.S_IFCHR, 'p': stat.S_IFIFO, 's': stat.S_IFSOCK}
+
+
+class RemoteEntry(object):
+    """One entry in a remote directory listing.
+
+    :ivar name: file name
+    :ivar size: size in bytes (None if unknown)
+    :ivar mtime: modification time as Unix seconds (None if unknown)
+    :ivar mode: Unix mode bits including file type (None if unknown)
+    :ivar is_dir: True for a directory
+    """
+    __slots__ = ('name', 'size', 'mtime', 'mode', 'is_dir')
+
+    def __init__(self, name, size=None, mtime=None, mode=None, is_dir=False):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.mode = mode
+        self.is_dir = is_dir
+
+    def __eq__(self, other):
+        if not isinstance(other, RemoteEntry):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr) for attr in self.__slots__)
+
+    def __repr__(self):
+        return '<RemoteEntry {}{} size={} mtime={}>'.format(
+            self.name, '/' if self.is_dir else '', self.size, self.mtime)
+
+
+def from_sftp_attr(attr):
+    """Make a RemoteEntry from a paramiko SFTPAttributes object.
+    """
+    mode = attr.st_mode
+    return RemoteEntry(attr.filename, attr.st_size, attr.st_mtime, mode,
+                       mode is not None and stat.S_ISDIR(mode))
+
+
+def _parse_mlsd_time(value):
+    # YYYYMMDDHHMMSS[.sss] in UTC
+    mtime = calendar.timegm(time.strptime(value[:14], '%Y%m%d%H%M%S'))
+    if len(value) > 15 and value[14] == '.':
+        mtime += float('0' + value[14:])
+    return mtime
+
+
+def from_mlsd(name, facts):
+    """Make a RemoteEntry from an (name, facts) item of ``ftplib.FTP.mlsd()``.
+
+    Returns None for the ``cdir`` and ``pdir`` (``.`` and ``..``) entries.
+    """
+    ftype = facts.get('type', '').lower()
+    if ftype in ('cdir', 'pdir'):
+        return None
+    size = facts.get('size', facts.get('sizd'))
+    mtime = facts.get('modify')
+    mode = facts.get('unix.mode')
+    is_dir = ftype == 'dir'
+    if mode is not None:
+        mode = int(mode, 8) | (stat.S_IFDIR if is_dir else stat.S_IFREG)
+    return RemoteEntry(name,
+                       None if size is None else int(size),
+                       None if mtime is None else _parse_mlsd_time(mtime),
+                       mode, is_dir)
+
+
+def _perm_bits(perms):
+    """Mode bits for a 9 character ``rwxr-xr-x`` style permission string"""
+    mode = 0
+    for ii, char in enumerate(perms):
+        if char in 'rwxst':
+            mode |= 1 << (8 - ii)
+        if char in 'sS':
+            mode |= stat.S_ISUID if ii == 2 else stat.S_ISGID
+        elif char in 'tT':
+            mode |= stat.S_ISVTX
+    return mode
+
+
+def parse_list_line(line, now=None):
+    """Parse one line of FTP ``LIST`` output into a RemoteEntry.
+
+    Both Unix ``ls -l`` style and DOS/IIS style lines are supported.  Times
+    are interpreted as UTC.  Lines that cannot be parsed (e.g. ``total 123``)
+    give None.  For symbolic links the `` -> target`` part is removed from the
+    name.
+
+    :param line: line of LIST output
+    :param now: current time (Unix sec) used to infer the year of recent
+        entries (default=time.time())
+    :returns: RemoteEntry or None
+    """
+    match = UNIX_RE.match(line)
+    if match:
+        ftype, perms, size, month, day, time_or_year, name = match.groups()
+        month = MONTHS.get(month.lower())
+        if month is None:
+            return None
+        if ':' in time_or_year:
+            hour, minute = (int(x) for x in time_or_year.split(':'))
+            now = time.time() if now is None else now
+            year = time.gmtime(now).tm_year
+            mtime = calendar.timegm((year, month, int(day), hour, minute, 0))
+            # ls shows HH:MM for entries in the last six months, so a date in
+            # the future must be from last year.
+            if mtime > now + 86400:
+                mtime = calendar.timegm((year - 1, month, int(day), hour, minute, 0))
+        else:
+            mtime = calendar.timegm((int(time_or_year), month, int(day), 0, 0, 0))
+        if ftype == 'l' and ' -> ' in name:
+            name = name.split(' -> ', 1)[0]
+        mode = TYPE_BITS.get(ftype, 0) | _perm_bits(perms)
+        return RemoteEntry(name, int(size), mtime, mode, ftype == 'd')
+
+    match = DOS_RE.match(line)
+    if match:
+        month, day, year, hour, minute, ampm, size, name = match.groups()
+        year = int(year)
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+        hour = int(hour) % 12 + (12 if ampm.upper() == 'PM' else 0)
+        mtime = calendar.timegm((year, int(month), int(day), hour, int(minute), 0))
+        is_dir = size.upper() == '<DIR>'
+        return RemoteEntry(name, None if is_dir else int(size), mtime, None, is_dir)
+
+    return None
+
+
+def to_array(entries):
+    """Convert a list of RemoteEntry to a NumPy structured array.
+
+    This is a compact representation for very large directories.  Unknown
+    size, mtime or mode values are -1.  Requires numpy.
+
+    :param entries: list of RemoteEntry
+    :returns: numpy structured array with columns name, size, mtime, mode, is_dir
+    """
+    import numpy as np
+
+    names = [entry.name for entry in entries]
+    max_len = max((len(name) for name in names), default=1)
+    out = np.zeros(len(entries), dtype=[('name', 'U{}'.format(max_len)), ('size', 'i8'),
+                                        ('mtime', 'f8'), ('mode', 'i8'), ('is_dir', '?')])
+    out['name'] = names
+    for col in ('size', 'mtime', 'mode'):
+        out[col] = [-1 if getattr(entry, col) is None else getattr(entry, col)
+                    for entry in entries]
+    out['is_dir'] = [entry.is_dir for entry in entries]
+    return out
@@ -0,0 +1,256 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Persistent SQLite index of remote directory trees for change detection.
+
+``scan()`` lists a remote tree, compares it to the entries stored in a
+``ManifestIndex`` from the previous scan, updates the index and returns the
+files that were added, modified or deleted::
+
+  index = ska_ftp.manifest.ManifestIndex('archive.db')
+  changes = lucky.scan('/data/archive', index, skip_unchanged_dirs=True)
+  for path in changes.added:
+      ...
+
+Directories are listed level by level, with the directories of each level
+listed concurrently.  With ``skip_unchanged_dirs=True`` a directory whose
+modification time is the same as at the last scan is not listed again (its
+subdirectories are still checked with ``stat_many()``), so a scan costs about
+one request per directory plus one listing per changed directory.
+"""
+
+import sqlite3
+import posixpath
+
+from .parallel import fan_out
+
+__all__ = ['ManifestIndex', 'ScanResult', 'scan']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    host TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    checksum TEXT,
+    is_dir INTEGER NOT NULL,
+    PRIMARY KEY (host, path)
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (host, parent);
+"""
+
+
+class ManifestIndex(object):
+    """SQLite index of remote files and directories keyed by host and path.
+
+    Each entry stores size, modification time, checksum (if computed) and
+    whether it is a directory.  Use the same remote root for repeated scans,
+    preferably an absolute path, since paths are stored as given.
+
+    :param filename: SQLite database file name (':memory:' for a temporary index)
+    """
+    def __init__(self, filename):
+        self.filename = str(filename)
+        self._db = sqlite3.connect(self.filename)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+
+    def get(self, host, path):
+        """Stored entry for ``path`` on ``host``.
+
+        :returns: dict with size, mtime, checksum and is_dir, or None
+        """
+        row = self._db.execute('SELECT size, mtime, checksum, is_dir FROM entries '
+                               'WHERE host = ? AND path = ?', (host, path)).fetchone()
+        return None if row is None else dict(row)
+
+    def files(self, host, root):
+        """Stored (path, size, mtime, checksum) for every file below ``root``
+        """
+        cursor = self._db.execute('SELECT path, size, mtime, checksum FROM entries '
+                                  'WHERE host = ? AND is_dir = 0 AND path >= ? AND path < ? '
+                                  'ORDER BY path', (host,) + _subtree_range(root))
+        return [tuple(row) for row in cursor]
+
+    def _children(self, host, parent):
+        cursor = self._db.execute('SELECT path, size, mtime, checksum, is_dir FROM entries '
+                                  'WHERE host = ? AND parent = ?', (host, parent))
+        return {row['path']: row for row in cursor}
+
+    def _put(self, host, path, size, mtime, is_dir, checksum=None):
+        self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (host, path, posixpath.dirname(path), size, mtime, checksum,
+                          int(is_dir)))
+
+    def _set_checksum(self, host, path, checksum):
+        self._db.execute('UPDATE entries SET checksum = ? WHERE host = ? AND path = ?',
+                         (checksum, host, path))
+
+    def _delete(self, host, path):
+        """Delete ``path`` and anything below it, returning the deleted file paths
+        """
+        deleted = [row[0] for row in self._db.execute(
+            'SELECT path FROM entries WHERE host = ? AND is_dir = 0 '
+            'AND (path = ? OR (path >= ? AND path < ?))',
+            (host, path) + _subtree_range(path))]
+        self._db.execute('DELETE FROM entries WHERE host = ? '
+                         'AND (path = ? OR (path >= ? AND path < ?))',
+                         (host, path) + _subtree_range(path))
+        return deleted
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _subtree_range(path):
+    """Range of path strings below directory ``path`` ('0' sorts right after '/')"""
+    prefix = path.rstrip('/') + '/'
+    return prefix, prefix[:-1] + '0'
+
+
+class ScanResult(object):
+    """Changes found by ``scan()``.
+
+    :ivar added: list of paths of new files
+    :ivar modified: list of paths of files whose size or modification time changed
+        (with a checksum, only files whose checksum also changed)
+    :ivar deleted: list of paths of files that were removed
+    :ivar listed_dirs: number of directories that were listed
+    :ivar skipped_dirs: number of unchanged directories that were not listed
+    """
+    def __init__(self):
+        self.added = []
+        self.modified = []
+        self.deleted = []
+        self.listed_dirs = 0
+        self.skipped_dirs = 0
+
+    @property
+    def changed(self):
+        """True if any file was added, modified or deleted"""
+        return bool(self.added or self.modified or self.deleted)
+
+    def __repr__(self):
+        return ('<ScanResult added={} modified={} deleted={} listed_dirs={} '
+                'skipped_dirs={}>'.format(len(self.added), len(self.modified),
+                                          len(self.deleted), self.listed_dirs,
+                                          self.skipped_dirs))
+
+
+def _scan(session, root, index, skip_unchanged_dirs, checksum, workers):
+    host = session.host
+    result = ScanResult()
+    modified_checksums = {}
+
+    root_stat = session.stat_many([root])[0]
+    if not root_stat.ok:
+        raise root_stat.error
+    level = [(root, root_stat.value.mtime)]
+
+    while level:
+        to_list = []
+        unchanged = []
+        for path, mtime in level:
+            old = index.get(host, path)
+            if (skip_unchanged_dirs and old is not None and old['is_dir']
+                    and mtime is not None and old['mtime'] == mtime):
+                unchanged.append(path)
+            else:
+                if old is not None and not old['is_dir']:
+                    result.deleted.extend(index._delete(host, path))
+                to_list.append(path)
+            index._put(host, path, None, mtime, True)
+
+        next_level = []
+
+        # Unchanged directories have the same entries, but their subdirectories
+        # may have changed
+        result.skipped_dirs += len(unchanged)
+        subdirs = [path for parent in unchanged
+                   for path, row in index._children(host, parent).items() if row['is_dir']]
+        if subdirs:
+            for path, stat_result in zip(subdirs, session.stat_many(subdirs)):
+                if stat_result.ok and stat_result.value.is_dir:
+                    next_level.append((path, stat_result.value.mtime))
+                else:
+                    result.deleted.extend(index._delete(host, path))
+
+        report = fan_out(session, lambda worker, path: worker.ls_entries(path, refresh=True),
+                         to_list, workers)
+        for dirpath, list_result in zip(to_list, report):
+            if not list_result.ok:
+                raise list_result.error
+            result.listed_dirs += 1
+            old_children = index._children(host, dirpath)
+            for entry in list_result.value:
+                path = posixpath.join(dirpath, entry.name)
+                old = old_children.pop(path, None)
+                if entry.is_dir:
+                    next_level.append((path, entry.mtime))
+                    continue
+                if old is not None and old['is_dir']:
+                    result.deleted.extend(index._delete(host, path))
+                    old = None
+                if old is None:
+                    result.added.append(path)
+                    index._put(host, path, entry.size, entry.mtime, False)
+                elif old['size'] != entry.size or old['mtime'] != entry.mtime:
+                    result.modified.append(path)
+                    modified_checksums[path] = old['checksum']
+                    index._put(host, path, entry.size, entry.mtime, False)
+            for path in old_children:
+                result.deleted.extend(index._delete(host, path))
+        level = next_level
+
+    if checksum is not None:
+        for path in result.added + result.modified:
+            digest = session._remote_hash(path, checksum)
+            index._set_checksum(host, path, None if digest is None else digest.hex())
+            if (path in modified_checksums and digest is not None
+                    and modified_checksums[path] == digest.hex()):
+                # Touched but not changed
+                result.modified.remove(path)
+
+    for paths in (result.added, result.modified, result.deleted):
+        paths.sort()
+    return result
+
+
+def scan(session, root, index, skip_unchanged_dirs=False, checksum=None, workers=4):
+    """Scan remote tree ``root`` and return the files changed since the last scan.
+
+    The index is updated in a single transaction, so a scan that fails (e.g.
+    lost connection) leaves the index unchanged and the next scan reports the
+    same changes.  On the first scan every file is reported as added.
+
+    With ``skip_unchanged_dirs=True`` directories whose modification time has
+    not changed are not listed.  Adding, removing or renaming a file changes the
+    directory time on POSIX servers, but rewriting a file in place does not, so
+    such modifications are only seen when the directory is listed.
+
+    :param session: ska_ftp.SFTP or ska_ftp.FTP object
+    :param root: remote directory
+    :param index: ManifestIndex or SQLite file name
+    :param skip_unchanged_dirs: do not list directories with an unchanged mtime
+    :param checksum: hash algorithm (e.g. 'md5') to store a checksum for new and
+        modified files, which needs server support as for ``verify`` in ``get()``
+        (default=None)
+    :param workers: maximum number of concurrent directory listings
+    :returns: ScanResult
+    """
+    root = root.rstrip('/') or '/'
+    own_index = not isinstance(index, ManifestIndex)
+    if own_index:
+        index = ManifestIndex(index)
+    try:
+        with index._db:
+            return _scan(session, root, index, skip_unchanged_dirs, checksum, workers)
+    finally:
+        if own_index:
+            index.close()
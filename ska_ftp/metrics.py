@@ -0,0 +1,230 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Per-operation metrics for SFTP and FTP sessions.
+
+Pass a sink as ``metrics=`` to ``SFTP``, ``FTP`` (or ``SessionPool.session()``)
+and every instrumented operation (connect, login, cd, ls*, stat, put, get,
+mkdir, rename, delete, rmdir) records a ``Metric`` with its latency, bytes
+moved and error.  A sink is any object with a ``record(metric)`` method that
+is safe to call from several threads::
+
+  agg = ska_ftp.metrics.Aggregator()
+  lucky = ska_ftp.SFTP('lucky', metrics=agg)
+  ...
+  for (host, op), stats in agg.summary().items():
+      print(host, op, stats['p95'])
+
+Without a sink an instrumented call costs one attribute lookup.
+"""
+
+import json
+import time
+import functools
+import threading
+from collections import deque
+
+__all__ = ['Metric', 'Aggregator', 'JSONLinesSink', 'MultiSink', 'timed', 'instrument']
+
+
+class Metric(object):
+    """Measurement of one operation.
+
+    :ivar host: server host name
+    :ivar protocol: 'sftp' or 'ftp'
+    :ivar op: operation name, e.g. 'put'
+    :ivar start: start time (Unix sec)
+    :ivar elapsed: wall clock time (sec)
+    :ivar nbytes: bytes transferred (0 for non-transfer operations)
+    :ivar error: exception class name if the operation failed, else None
+    :ivar retries: number of retries within the operation
+    """
+    __slots__ = ('host', 'protocol', 'op', 'start', 'elapsed', 'nbytes', 'error', 'retries')
+
+    def __init__(self, host, protocol, op, start, elapsed, nbytes=0, error=None, retries=0):
+        self.host = host
+        self.protocol = protocol
+        self.op = op
+        self.start = start
+        self.elapsed = elapsed
+        self.nbytes = nbytes
+        self.error = error
+        self.retries = retries
+
+    @property
+    def throughput(self):
+        """Bytes per second (None for an operation that moved no bytes)"""
+        if not self.nbytes or self.elapsed <= 0:
+            return None
+        return self.nbytes / self.elapsed
+
+    def as_dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    def __repr__(self):
+        return '<Metric {} {} {} {:.4f}s {} bytes{}>'.format(
+            self.protocol, self.host, self.op, self.elapsed, self.nbytes,
+            '' if self.error is None else ' error=' + self.error)
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    index = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[int(index)]
+
+
+class _Stats(object):
+    __slots__ = ('count', 'errors', 'retries', 'nbytes', 'elapsed', 'samples')
+
+    def __init__(self, max_samples):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.nbytes = 0
+        self.elapsed = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+
+class Aggregator(object):
+    """In-memory metrics sink with latency percentiles per (host, op).
+
+    Counts, bytes and total time cover every operation.  Percentiles are
+    computed from the most recent ``max_samples`` latencies for each key.
+
+    :param max_samples: number of latencies kept per (host, op)
+    """
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, metric):
+        key = (metric.host, metric.op)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats(self.max_samples)
+            stats.count += 1
+            stats.errors += metric.error is not None
+            stats.retries += metric.retries
+            stats.nbytes += metric.nbytes
+            stats.elapsed += metric.elapsed
+            stats.samples.append(metric.elapsed)
+
+    def summary(self):
+        """Summary statistics for each (host, op).
+
+        :returns: dict of (host, op) => dict with count, errors, retries, bytes,
+            mean, p50, p95, p99 (sec) and throughput (bytes/sec or None)
+        """
+        out = {}
+        with self._lock:
+            for key, stats in self._stats.items():
+                samples = sorted(stats.samples)
+                out[key] = {'count': stats.count,
+                            'errors': stats.errors,
+                            'retries': stats.retries,
+                            'bytes': stats.nbytes,
+                            'mean': stats.elapsed / stats.count,
+                            'p50': _percentile(samples, 50),
+                            'p95': _percentile(samples, 95),
+                            'p99': _percentile(samples, 99),
+                            'throughput': (stats.nbytes / stats.elapsed
+                                           if stats.nbytes and stats.elapsed > 0 else None)}
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class JSONLinesSink(object):
+    """Metrics sink that appends one JSON object per operation to ``filename``.
+
+    :param filename: output file name
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._fh = open(filename, 'a')
+        self._lock = threading.Lock()
+
+    def record(self, metric):
+        line = json.dumps(metric.as_dict())
+        with self._lock:
+            self._fh.write(line + '\n')
+            self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+class MultiSink(object):
+    """Metrics sink that passes each metric on to all of ``sinks``.
+    """
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def record(self, metric):
+        for sink in self.sinks:
+            sink.record(metric)
+
+
+def timed(sink, host, protocol, op, func, args=(), kwargs=None, nbytes=None, retries=None):
+    """Return ``func(*args, **kwargs)``, recording a Metric to ``sink``.
+
+    :param sink: metrics sink (None to just call ``func``)
+    :param host: server host name
+    :param protocol: 'sftp' or 'ftp'
+    :param op: operation name
+    :param func: function to call
+    :param args: positional args for ``func``
+    :param kwargs: keyword args for ``func``
+    :param nbytes: optional function ``nbytes(args, kwargs)`` giving the bytes
+        moved by a successful call
+    :param retries: optional function ``retries()`` giving the number of retries
+    """
+    kwargs = kwargs or {}
+    if sink is None:
+        return func(*args, **kwargs)
+    start = time.time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        return func(*args, **kwargs)
+    except Exception as err:
+        error = type(err).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        n_bytes = 0
+        if nbytes is not None and error is None:
+            try:
+                n_bytes = nbytes(args, kwargs)
+            except Exception:
+                pass
+        n_retries = 0 if retries is None else retries()
+        sink.record(Metric(host, protocol, op, start, elapsed, n_bytes, error, n_retries))
+
+
+def instrument(op, nbytes=None):
+    """Decorator that records a Metric for each call of a session method.
+
+    The session must have ``metrics`` (sink or None), ``host`` and ``protocol``
+    attributes.  Retries are taken from ``session._retries`` (see
+    ``ska_ftp.retry.retrying``).
+
+    :param op: operation name
+    :param nbytes: optional function ``nbytes(args, kwargs)`` giving the bytes
+        moved by a successful call (``args`` excludes ``self``)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            sink = self.metrics
+            if sink is None:
+                return func(self, *args, **kwargs)
+            return timed(sink, self.host, self.protocol, op, func, (self,) + args, kwargs,
+                         None if nbytes is None else lambda a, k: nbytes(a[1:], k),
+                         lambda: vars(self).pop('_retries', 0))
+        return wrapper
+    return decorator
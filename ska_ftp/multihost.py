@@ -0,0 +1,223 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Publish the same files to several hosts at once.
+
+``publish()`` connects to every host concurrently and uploads the files to all
+of them in parallel.  Each local file is read only once: the blocks are handed
+to one writer thread per host through a small bounded queue, so memory use is
+``queue_size * block_size`` per host and the total time is close to that of
+the slowest host.  Each file is written to a temporary name in ``remote_dir``
+and renamed into place when complete, so readers on the server never see a
+partial file.  A failure on one host does not stop the others.
+
+The same is available from the command line::
+
+  python -m ska_ftp.multihost --host mirror1 --host mirror2 --remote-dir /pub data/*.fits
+"""
+
+import os
+import sys
+import queue
+import argparse
+import threading
+import posixpath
+
+from .ftp import SFTP, FTP, parse_netrc, _temp_name
+from .parallel import Result, Report
+
+__all__ = ['publish']
+
+PROTOCOLS = {'sftp': SFTP, 'ftp': FTP}
+
+_EOF = object()
+
+
+class _Abort(object):
+    def __init__(self, error):
+        self.error = error
+
+
+def _split_port(host, kwargs):
+    """Split ``'host:port'`` into host name and kwargs including the port"""
+    hostname, sep, port = host.rpartition(':')
+    if sep and port.isdigit():
+        return hostname, dict(kwargs, port=int(port))
+    return host, kwargs
+
+
+class _HostWriter(object):
+    """Thread that connects to one host and writes the files fed to its queue
+    """
+    def __init__(self, cls, host, remote_dir, names, block_size, queue_size, kwargs):
+        self.cls = cls
+        self.host = host
+        self.hostname, self.kwargs = _split_port(host, kwargs)
+        self.remote_dir = remote_dir
+        self.names = names
+        self.block_size = block_size
+        self.queue = queue.Queue(queue_size)
+        self.failed = threading.Event()
+        self.result = Result(host)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def feed(self, item):
+        """Put ``item`` on the queue unless (or until) this host has failed
+        """
+        while not self.failed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def run(self):
+        session = None
+        try:
+            session = self.cls(self.hostname, **self.kwargs)
+            session.makedirs(self.remote_dir, exist_ok=True)
+            self.result.value = []
+            for name in self.names:
+                self.result.value.append(self._write(session, name))
+        except Exception as err:
+            self.result.error = err
+            self.failed.set()
+        finally:
+            if session is not None:
+                try:
+                    session.close()
+                except Exception:
+                    pass
+
+    def _write(self, session, name):
+        remotefile = posixpath.join(self.remote_dir, name)
+        tmpfile = _temp_name(remotefile)
+        dirname = posixpath.dirname(remotefile)
+        if dirname != self.remote_dir.rstrip('/'):
+            session.makedirs(dirname, exist_ok=True)
+        try:
+            with session.open_stream(tmpfile, 'wb', block_size=self.block_size) as fw:
+                while True:
+                    data = self.queue.get()
+                    if data is _EOF:
+                        break
+                    if isinstance(data, _Abort):
+                        raise data.error
+                    fw.write(data)
+            session._replace(tmpfile, remotefile)
+        except BaseException:
+            try:
+                session.delete(tmpfile)
+            except Exception:
+                pass
+            raise
+        return remotefile
+
+
+def publish(files, hosts, remote_dir, protocol='sftp', netrcfile=None, block_size=2 ** 20,
+            queue_size=8, logger=None, **kwargs):
+    """Upload ``files`` to directory ``remote_dir`` on each of ``hosts`` concurrently.
+
+    Each element of ``files`` is either ``localfile`` (uploaded with the same
+    base name) or a tuple ``(localfile, remotefile)`` with ``remotefile``
+    relative to ``remote_dir``.  User names and passwords come from the netrc
+    file.  ``remote_dir`` and any subdirectories are created if needed.
+
+    Each local file is read once and streamed to all hosts.  On each host a
+    file is written to a temporary name and renamed into place when complete
+    (atomically where the server supports it).  A host that fails (e.g. cannot
+    connect) stops there and is reported as failed, the others carry on.
+
+    Example::
+
+      report = ska_ftp.publish(['a.fits', 'b.fits'], ['mirror1', 'mirror2'], '/pub/data')
+      for result in report.failed:
+          print(result.item, result.error)
+
+    :param files: list of localfile or (localfile, remotefile)
+    :param hosts: list of host names, optionally as 'host:port'
+    :param remote_dir: remote directory
+    :param protocol: 'sftp' or 'ftp'
+    :param netrcfile: netrc file name (default=~/.netrc)
+    :param block_size: bytes per block read from the local files
+    :param queue_size: maximum number of blocks buffered for each host
+    :param logger: logger object passed to each session
+    :param **kwargs: additional keyword args for the SFTP or FTP class (e.g. port)
+    :returns: Report with one Result per host, with value the list of remote paths
+    """
+    try:
+        cls = PROTOCOLS[protocol]
+    except KeyError:
+        raise ValueError("protocol must be one of {}".format(sorted(PROTOCOLS)))
+
+    pairs = [item if isinstance(item, (tuple, list)) else (item, os.path.basename(item))
+             for item in files]
+    for localfile, _ in pairs:
+        # Fail now for a missing file, not after connecting to every host
+        os.stat(localfile)
+
+    auths = parse_netrc(netrcfile)
+    writers = []
+    for host in hosts:
+        host_kwargs = dict(kwargs, netrcfile=netrcfile, logger=logger)
+        hostname, _ = _split_port(host, kwargs)
+        if hostname in auths:
+            host_kwargs.setdefault('user', auths[hostname]['login'])
+            host_kwargs.setdefault('passwd', auths[hostname]['password'])
+        writers.append(_HostWriter(cls, host, remote_dir, [name for _, name in pairs],
+                                   block_size, queue_size, host_kwargs))
+
+    if logger:
+        logger.info('ska_ftp: publish {} files to {} hosts'.format(len(pairs), len(hosts)))
+
+    try:
+        for localfile, _ in pairs:
+            with open(localfile, 'rb') as fh:
+                while True:
+                    data = fh.read(block_size)
+                    if not data:
+                        break
+                    for writer in writers:
+                        writer.feed(data)
+            for writer in writers:
+                writer.feed(_EOF)
+    except BaseException as err:
+        for writer in writers:
+            writer.feed(_Abort(err))
+        raise
+    finally:
+        for writer in writers:
+            writer.thread.join()
+
+    return Report(writer.result for writer in writers)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Upload files to a directory on several hosts concurrently')
+    parser.add_argument('files', nargs='+', help='Local files')
+    parser.add_argument('--host', dest='hosts', action='append', required=True,
+                        help='Destination host or host:port (repeat for each host)')
+    parser.add_argument('--remote-dir', required=True, help='Remote directory')
+    parser.add_argument('--protocol', default='sftp', choices=sorted(PROTOCOLS),
+                        help='Protocol (default=sftp)')
+    parser.add_argument('--port', type=int, help='Port on each host (default=protocol default)')
+    parser.add_argument('--netrc', help='Netrc file with credentials (default=~/.netrc)')
+    return parser
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    kwargs = {} if opt.port is None else {'port': opt.port}
+    report = publish(opt.files, opt.hosts, opt.remote_dir, protocol=opt.protocol,
+                     netrcfile=opt.netrc, **kwargs)
+    for result in report:
+        if result.ok:
+            print('{}: published {} files'.format(result.item, len(result.value)))
+        else:
+            print('{}: FAILED {}'.format(result.item, result.error))
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
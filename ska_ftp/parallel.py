@@ -0,0 +1,160 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Run many remote operations concurrently and collect a per-item report.
+"""
+
+import time
+import queue
+import threading
+
+__all__ = ['Result', 'Report', 'run_parallel', 'fan_out']
+
+
+class Result(object):
+    """Outcome of one item in a multi-item operation.
+
+    :param item: the input item (e.g. a (localfile, remotefile) pair)
+    :param value: return value of the operation (None if it failed)
+    :param error: exception raised by the operation (None if it succeeded)
+    :param elapsed: wall clock time for the operation (sec)
+    """
+    __slots__ = ('item', 'value', 'error', 'elapsed')
+
+    def __init__(self, item, value=None, error=None, elapsed=0.0):
+        self.item = item
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else 'error={!r}'.format(self.error)
+        return '<Result {!r} {}>'.format(self.item, status)
+
+
+class Report(list):
+    """List of ``Result`` objects in the same order as the input items.
+    """
+    @property
+    def ok(self):
+        """True if every item succeeded"""
+        return all(result.ok for result in self)
+
+    @property
+    def succeeded(self):
+        """List of results that succeeded"""
+        return [result for result in self if result.ok]
+
+    @property
+    def failed(self):
+        """List of results that failed"""
+        return [result for result in self if not result.ok]
+
+    def raise_errors(self):
+        """Raise the first error in the report, if any.
+        """
+        for result in self:
+            if not result.ok:
+                raise result.error
+
+    def __repr__(self):
+        return '<Report {} ok, {} failed>'.format(len(self.succeeded), len(self.failed))
+
+
+def run_parallel(func, items, workers=4, setup=None, teardown=None):
+    """Call ``func(state, item)`` for each of ``items`` using ``workers`` threads.
+
+    Each worker thread calls ``setup()`` once to get its own ``state`` (e.g. a
+    session or channel) and ``teardown(state)`` when there is no more work.
+    Exceptions raised by ``func`` are recorded in the report and do not stop
+    the other items.  If ``setup`` fails for a worker then that worker exits and
+    the remaining workers carry on; if every worker fails then all remaining
+    items are reported with the setup exception.
+
+    :param func: function ``func(state, item)`` that does the work for one item
+    :param items: iterable of items
+    :param workers: number of worker threads
+    :param setup: function returning per-worker state (default=None)
+    :param teardown: function called with per-worker state at the end (default=None)
+    :returns: Report
+    """
+    items = list(items)
+    results = [None] * len(items)
+    work = queue.Queue()
+    for index, item in enumerate(items):
+        work.put((index, item))
+
+    setup_errors = []
+
+    def worker():
+        try:
+            state = setup() if setup else None
+        except Exception as err:
+            setup_errors.append(err)
+            return
+        try:
+            while True:
+                try:
+                    index, item = work.get_nowait()
+                except queue.Empty:
+                    break
+                t0 = time.monotonic()
+                try:
+                    value = func(state, item)
+                except Exception as err:
+                    results[index] = Result(item, error=err, elapsed=time.monotonic() - t0)
+                else:
+                    results[index] = Result(item, value=value, elapsed=time.monotonic() - t0)
+        finally:
+            if teardown:
+                try:
+                    teardown(state)
+                except Exception:
+                    pass
+
+    workers = max(1, min(workers, len(items)))
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Any items left over because all workers failed setup
+    for index, item in enumerate(items):
+        if results[index] is None:
+            error = setup_errors[0] if setup_errors else RuntimeError('item not processed')
+            results[index] = Result(item, error=error)
+
+    return Report(results)
+
+
+def fan_out(session, func, items, workers):
+    """Call ``func(worker_session, item)`` for each of ``items`` using ``workers`` threads.
+
+    The first worker uses ``session`` itself and the others use clones from
+    ``session._clone()`` (new channel for SFTP, new connection for FTP).  The
+    working directory is captured up front since ``session`` is not thread-safe.
+
+    :param session: ska_ftp.SFTP or ska_ftp.FTP object
+    :param func: function ``func(worker_session, item)`` that does the work for one item
+    :param items: iterable of items
+    :param workers: number of worker threads
+    :returns: Report
+    """
+    cwd = session._cwd()
+    lock = threading.Lock()
+    status = {'first': True}
+
+    def setup():
+        with lock:
+            first, status['first'] = status['first'], False
+        return session if first else session._clone(cwd)
+
+    def teardown(worker_session):
+        if worker_session is not session:
+            worker_session.close()
+
+    return run_parallel(func, items, workers=workers, setup=setup, teardown=teardown)
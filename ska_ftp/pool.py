@@ -0,0 +1,217 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Pool of authenticated SFTP and FTP sessions that can be reused between
+operations instead of paying for a full connect and login each time.
+"""
+
+import time
+import threading
+import contextlib
+
+from .ftp import SFTP, FTP, parse_netrc
+
+__all__ = ['SessionPool']
+
+PROTOCOLS = {'sftp': (SFTP, 22),
+             'ftp': (FTP, 21)}
+
+
+class _Entry(object):
+    __slots__ = ('session', 'home', 'last_used')
+
+    def __init__(self, session, home):
+        self.session = session
+        self.home = home
+        self.last_used = time.monotonic()
+
+
+class SessionPool(object):
+    """Pool of authenticated SFTP and FTP sessions keyed by (host, port, user).
+
+    Sessions are handed out with the ``session()`` context manager and returned
+    to the pool on exit.  Before an idle session is handed out again it is
+    checked with ``is_alive()`` and silently replaced if the server dropped it.
+    Sessions that have been idle for longer than ``idle_timeout`` are closed.
+
+    Example::
+
+      pool = ska_ftp.SessionPool(max_per_host=4)
+      for filename in filenames:
+          with pool.session('lucky.cfa.harvard.edu') as lucky:
+              lucky.put(filename, '/home/user/' + filename)
+      pool.close()
+
+    :param max_per_host: maximum number of open sessions (idle or in use) per host
+    :param idle_timeout: close sessions that are idle longer than this (sec)
+    :param acquire_timeout: max time to wait for a free session slot (sec, default=no limit)
+    :param netrcfile: netrc file name (default=~/.netrc)
+    :param logger: logger object passed to each session
+    """
+    def __init__(self, max_per_host=4, idle_timeout=300.0, acquire_timeout=None,
+                 netrcfile=None, logger=None):
+        if max_per_host < 1:
+            raise ValueError('max_per_host must be at least 1')
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.netrcfile = netrcfile
+        self.logger = logger
+
+        self._auths = None
+        self._idle = {}  # key => list of _Entry (most recently used last)
+        self._count = {}  # host => number of open sessions
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _credentials(self, host, user, passwd):
+        # Parse netrc once per pool instead of once per session
+        if user is None or passwd is None:
+            if self._auths is None:
+                self._auths = parse_netrc(self.netrcfile)
+            if host in self._auths:
+                if user is None:
+                    user = self._auths[host]['login']
+                if passwd is None:
+                    passwd = self._auths[host]['password']
+        return user, passwd
+
+    def _close_session(self, host, session):
+        try:
+            session.close()
+        except Exception:
+            pass
+        self._count[host] -= 1
+        self._cond.notify()
+
+    def _prune(self, now):
+        # Caller must hold self._cond
+        for key, entries in self._idle.items():
+            while entries and now - entries[0].last_used > self.idle_timeout:
+                entry = entries.pop(0)
+                self._close_session(key[1], entry.session)
+
+    def prune(self):
+        """Close all sessions that have been idle longer than ``idle_timeout``.
+        """
+        with self._cond:
+            self._prune(time.monotonic())
+
+    def _acquire(self, key):
+        protocol, host = key[0], key[1]
+        deadline = (None if self.acquire_timeout is None
+                    else time.monotonic() + self.acquire_timeout)
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('SessionPool is closed')
+                self._prune(time.monotonic())
+                entries = self._idle.get(key)
+                if entries:
+                    return entries.pop()
+                if self._count.get(host, 0) < self.max_per_host:
+                    # Reserve a slot, then connect outside the lock
+                    self._count[host] = self._count.get(host, 0) + 1
+                    return None
+                # At cap for this host.  If another key for the same host has an
+                # idle session then close it to make room.
+                for other_key, other_entries in self._idle.items():
+                    if other_key[1] == host and other_entries:
+                        entry = other_entries.pop(0)
+                        self._close_session(host, entry.session)
+                        break
+                else:
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        raise TimeoutError('timed out waiting for a {} session to {}'
+                                           .format(protocol, host))
+                    self._cond.wait(timeout)
+
+    def _release(self, key, session, home, discard):
+        with self._cond:
+            if discard or self._closed:
+                self._close_session(key[1], session)
+            else:
+                entry = _Entry(session, home)
+                self._idle.setdefault(key, []).append(entry)
+                self._cond.notify()
+
+    @contextlib.contextmanager
+    def session(self, host, user=None, passwd=None, port=None, protocol='sftp', **kwargs):
+        """Context manager that provides an authenticated session for ``host``.
+
+        An idle pooled session is reused if one is available and still alive,
+        otherwise a new one is created (subject to ``max_per_host``).  If the
+        body of the ``with`` block raises an exception the session is closed
+        instead of being returned to the pool.  Each session starts in the login
+        directory: a ``cd()`` in the ``with`` block is undone when the session
+        is returned.
+
+        :param host: host name
+        :param user: user name (default=netrc value)
+        :param passwd: password (default=netrc value)
+        :param port: port on host (default=22 for sftp, 21 for ftp)
+        :param protocol: 'sftp' or 'ftp'
+        :param **kwargs: additional keyword args for the SFTP or FTP class
+        :returns: SFTP or FTP object
+        """
+        try:
+            cls, default_port = PROTOCOLS[protocol]
+        except KeyError:
+            raise ValueError("protocol must be one of {}".format(sorted(PROTOCOLS)))
+        if port is None:
+            port = default_port
+        user, passwd = self._credentials(host, user, passwd)
+        key = (protocol, host, port, user)
+
+        session = None
+        while session is None:
+            entry = self._acquire(key)
+            if entry is None:
+                try:
+                    session = cls(host, user=user, passwd=passwd, port=port,
+                                  netrcfile=self.netrcfile, logger=self.logger, **kwargs)
+                    home = session._cwd()
+                except Exception:
+                    if session is not None:
+                        session.close()
+                    with self._cond:
+                        self._count[host] -= 1
+                        self._cond.notify()
+                    raise
+            elif entry.session.is_alive():
+                session = entry.session
+                home = entry.home
+            else:
+                if self.logger:
+                    self.logger.info('ska_ftp: discard dead {} session to {}'
+                                     .format(protocol, host))
+                with self._cond:
+                    self._close_session(host, entry.session)
+
+        discard = True
+        try:
+            yield session
+            # The next borrower starts in the login directory
+            if session._cwd() != home:
+                session.cd(home)
+            discard = False
+        finally:
+            self._release(key, session, home, discard)
+
+    def close(self):
+        """Close all idle sessions and refuse further requests.
+
+        Sessions that are currently checked out are closed when released.
+        """
+        with self._cond:
+            self._closed = True
+            for key, entries in self._idle.items():
+                for entry in entries:
+                    self._close_session(key[1], entry.session)
+            self._idle.clear()
@@ -0,0 +1,109 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Retry with exponential backoff and transparent reconnection for SFTP and FTP
+sessions.
+"""
+
+import time
+import random
+import ftplib
+import functools
+
+__all__ = ['RetryPolicy', 'retrying']
+
+
+class RetryPolicy(object):
+    """Policy for retrying failed operations.
+
+    An operation that raises one of ``retry_on`` is retried after a delay of
+    ``backoff * 2 ** (attempt - 1)`` seconds (at most ``max_backoff``), reduced
+    by a random fraction of up to ``jitter`` so that many clients do not retry
+    in lockstep.  Before each retry a session that is no longer alive is
+    reconnected with the stored host and credentials and returned to the
+    directory set by ``cd()``.
+
+    An ``OSError`` with an errno (e.g. no such file, permission denied) from a
+    session that is still alive is a real failure and is not retried.
+
+    :param max_attempts: maximum number of attempts including the first
+    :param backoff: delay before the first retry (sec)
+    :param max_backoff: maximum delay between attempts (sec)
+    :param jitter: maximum random fraction removed from each delay (0 to 1)
+    :param retry_on: tuple of retryable exception classes (default=OSError,
+        EOFError, ftplib.error_temp and paramiko.SSHException)
+    :param resume: transfers use ``resume=True`` by default so that a retry
+        continues from the interrupted offset
+    """
+    def __init__(self, max_attempts=3, backoff=1.0, max_backoff=60.0, jitter=0.5,
+                 retry_on=None, resume=True):
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+        if retry_on is None:
+            retry_on = (OSError, EOFError, ftplib.error_temp)
+            try:
+                import paramiko
+            except ImportError:
+                pass
+            else:
+                retry_on += (paramiko.SSHException,)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = tuple(retry_on)
+        self.resume = resume
+
+    def delay(self, attempt):
+        """Delay (sec) after failed attempt number ``attempt`` (starting at 1)
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    def is_retryable(self, err, session):
+        """True if ``err`` raised by an operation on ``session`` should be retried
+        """
+        if not isinstance(err, self.retry_on):
+            return False
+        if isinstance(err, OSError) and err.errno is not None and session.is_alive():
+            return False
+        return True
+
+
+def retrying(func):
+    """Decorator that retries a session method according to ``session.retry``.
+
+    Only the outermost retrying call on a session retries, so an operation
+    that calls other retrying methods is redone as a whole.  The number of
+    retries of the last call is left in ``session._retries`` for metrics.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        policy = self.retry
+        if policy is None or self._retrying:
+            return func(self, *args, **kwargs)
+
+        self._retrying = True
+        try:
+            attempt = 1
+            while True:
+                try:
+                    if attempt > 1 and not self.is_alive():
+                        self._reconnect()
+                    out = func(self, *args, **kwargs)
+                except Exception as err:
+                    if attempt >= policy.max_attempts or not policy.is_retryable(err, self):
+                        self._retries = attempt - 1
+                        raise
+                    delay = policy.delay(attempt)
+                    if self.logger:
+                        self.logger.info('ska_ftp: {} failed ({!r}), retry {}/{} in {:.1f} s'
+                                         .format(func.__name__, err, attempt,
+                                                 policy.max_attempts - 1, delay))
+                    time.sleep(delay)
+                    attempt += 1
+                else:
+                    self._retries = attempt - 1
+                    return out
+        finally:
+            self._retrying = False
+    return wrapper
@@ -0,0 +1,147 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Low-level pipelined reads and requests for paramiko SFTP.
+
+``paramiko.SFTPFile.prefetch()`` issues read requests from a background thread,
+and when ``max_concurrent_requests`` is set that thread can still be sending
+while the reading thread falls back to synchronous reads, which corrupts the
+channel.  ``read_blocks()`` instead keeps a bounded window of outstanding read
+requests entirely in the calling thread.  ``request_many()`` does the same
+for metadata requests such as remove, rename, stat and mkdir.
+"""
+
+import time
+from collections import deque
+
+__all__ = ['read_blocks', 'request_many']
+
+
+class _Responses(object):
+    """Collector for asynchronous SFTP responses, keyed by request number.
+
+    paramiko dispatches responses to ``fileobj._async_response()`` for the
+    ``fileobj`` given in ``SFTPClient._async_request()``.
+    """
+    def __init__(self):
+        self.responses = {}
+
+    def _async_response(self, t, msg, num):
+        self.responses[num] = (t, msg)
+
+
+def read_blocks(fr, offset, length, block_size, max_requests):
+    """Read ``length`` bytes of SFTP file ``fr`` starting at ``offset``.
+
+    Up to ``max_requests`` read requests of ``block_size`` bytes are kept
+    outstanding at once.  Blocks are yielded in order.  If the server returns a
+    short read the remainder is requested synchronously.  Iteration stops early
+    if the file ends before ``offset + length``.
+
+    :param fr: paramiko.SFTPFile opened for reading
+    :param offset: start offset (bytes)
+    :param length: number of bytes to read
+    :param block_size: bytes per read request
+    :param max_requests: maximum number of outstanding read requests
+    :returns: generator of (offset, bytes)
+    """
+    from paramiko.sftp import CMD_READ, CMD_STATUS, CMD_DATA, SFTPError, int64
+
+    sftp = fr.sftp
+    collector = _Responses()
+    pending = deque()
+    pos = offset
+    end = offset + length
+    max_requests = max(1, max_requests)
+
+    def get_response(num):
+        while num not in collector.responses:
+            sftp._read_response()
+        t, msg = collector.responses.pop(num)
+        if t == CMD_STATUS:
+            sftp._convert_status(msg)  # raises EOFError or IOError
+        if t != CMD_DATA:
+            raise SFTPError('Expected data')
+        return msg.get_string()
+
+    try:
+        while pending or pos < end:
+            while pos < end and len(pending) < max_requests:
+                size = min(block_size, end - pos)
+                num = sftp._async_request(collector, CMD_READ, fr.handle,
+                                          int64(pos), int(size))
+                pending.append((num, pos, size))
+                pos += size
+
+            num, block_offset, size = pending.popleft()
+            try:
+                data = get_response(num)
+            except EOFError:
+                return
+            # Short read, get the rest of this block synchronously
+            while len(data) < size:
+                num = sftp._async_request(collector, CMD_READ, fr.handle,
+                                          int64(block_offset + len(data)),
+                                          int(size - len(data)))
+                try:
+                    more = get_response(num)
+                except EOFError:
+                    more = b''
+                if not more:
+                    yield block_offset, data
+                    return
+                data += more
+            yield block_offset, data
+    finally:
+        # Consume responses for requests that are still in flight so that they
+        # do not get delivered to a later reader.
+        for num, _, _ in pending:
+            try:
+                while num not in collector.responses:
+                    sftp._read_response()
+            except Exception:
+                break
+
+
+def request_many(sftp, requests, max_requests=64):
+    """Send SFTP ``requests`` with up to ``max_requests`` outstanding at once.
+
+    Each request is a tuple ``(cmd, arg1, ...)`` as for the paramiko
+    ``SFTPClient._request()`` method, e.g. ``(CMD_REMOVE, path)``.  The
+    responses are yielded in request order.  Use ``sftp._convert_status(msg)``
+    to raise IOError for a failed status response.
+
+    :param sftp: paramiko.SFTPClient
+    :param requests: iterable of request tuples
+    :param max_requests: maximum number of outstanding requests
+    :returns: generator of (response type, paramiko Message, elapsed sec)
+    """
+    collector = _Responses()
+    pending = deque()
+    requests = iter(requests)
+    max_requests = max(1, max_requests)
+    more = True
+
+    try:
+        while more or pending:
+            while more and len(pending) < max_requests:
+                try:
+                    request = next(requests)
+                except StopIteration:
+                    more = False
+                    break
+                num = sftp._async_request(collector, *request)
+                pending.append((num, time.monotonic()))
+
+            if pending:
+                num, t0 = pending.popleft()
+                while num not in collector.responses:
+                    sftp._read_response()
+                t, msg = collector.responses.pop(num)
+                yield t, msg, time.monotonic() - t0
+    finally:
+        for num, _ in pending:
+            try:
+                while num not in collector.responses:
+                    sftp._read_response()
+            except Exception:
+                break
@@ -0,0 +1,197 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Buffered file-like access to remote files without a local copy.
+
+``open_stream()`` on ``SFTP`` and ``FTP`` returns a ``RemoteReader`` (an
+``io.BufferedReader``) or an ``io.BufferedWriter`` on top of one of the raw
+streams below.  Reads into a caller-supplied buffer that is larger than the
+stream buffer go straight to the raw stream, so for FTP the data are received
+directly into that buffer with ``socket.recv_into()``.
+"""
+
+import io
+import ftplib
+
+__all__ = ['RemoteReader']
+
+
+class RemoteReader(io.BufferedReader):
+    """Buffered reader for a remote file.
+
+    In addition to the usual file methods (``read()``, ``readinto()``,
+    iteration over lines, ...) this provides ``chunks()`` for block-wise
+    processing.
+    """
+    def chunks(self, size=2 ** 20):
+        """Generate the rest of the file as blocks of ``size`` bytes (the last
+        block may be shorter).
+
+        :param size: block size (bytes)
+        :returns: generator of bytes
+        """
+        while True:
+            data = self.read(size)
+            if not data:
+                return
+            yield data
+
+
+class _SFTPRawReader(io.RawIOBase):
+    """Raw reader for a paramiko SFTPFile with pipelined read requests
+    """
+    def __init__(self, fr, file_size, block_size, max_requests):
+        from .sftp_io import read_blocks
+
+        self._fr = fr
+        self._blocks = read_blocks(fr, 0, file_size, block_size, max_requests)
+        self._data = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        if not self._data:
+            try:
+                _, data = next(self._blocks)
+            except StopIteration:
+                return 0
+            self._data = memoryview(data)
+        buf = memoryview(buf).cast('B')
+        n_bytes = min(len(buf), len(self._data))
+        buf[:n_bytes] = self._data[:n_bytes]
+        self._data = self._data[n_bytes:]
+        return n_bytes
+
+    def close(self):
+        if not self.closed:
+            try:
+                # Drain outstanding read requests before closing the handle
+                self._blocks.close()
+                self._fr.close()
+            finally:
+                super().close()
+
+
+class _SFTPRawWriter(io.RawIOBase):
+    """Raw writer for a paramiko SFTPFile with pipelined write requests
+    """
+    def __init__(self, session, fr, remotefile):
+        self._session = session
+        self._fr = fr
+        self._remotefile = remotefile
+
+    def writable(self):
+        return True
+
+    def write(self, buf):
+        self._fr.write(bytes(buf))
+        return len(buf)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._fr.close()
+                self._session._invalidate(self._remotefile)
+            finally:
+                super().close()
+
+
+class _FTPRawReader(io.RawIOBase):
+    """Raw reader for an FTP RETR data connection
+    """
+    def __init__(self, session, conn):
+        self._session = session
+        self._conn = conn
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n_bytes = self._conn.recv_into(buf)
+        if n_bytes == 0:
+            self._eof = True
+        return n_bytes
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._conn.close()
+                if self._eof:
+                    self._session.voidresp()
+                else:
+                    # Data connection was closed early, consume the server's reply
+                    try:
+                        self._session.voidresp()
+                    except ftplib.all_errors:
+                        pass
+            finally:
+                super().close()
+
+
+class _FTPRawWriter(io.RawIOBase):
+    """Raw writer for an FTP STOR data connection
+    """
+    def __init__(self, session, conn, remotefile):
+        self._session = session
+        self._conn = conn
+        self._remotefile = remotefile
+
+    def writable(self):
+        return True
+
+    def write(self, buf):
+        self._conn.sendall(buf)
+        return len(buf)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._conn.close()
+                self._session.voidresp()
+                self._session._invalidate(self._remotefile)
+            finally:
+                super().close()
+
+
+def _check_mode(mode):
+    if mode not in ('rb', 'wb'):
+        raise ValueError("mode must be 'rb' or 'wb'")
+
+
+def open_sftp(session, remotefile, mode, block_size, max_requests):
+    """Open ``remotefile`` on SFTP ``session``, see ``SFTP.open_stream()``
+    """
+    from .ftp import sftp_tuning
+
+    _check_mode(mode)
+    fr = session.ftp.open(remotefile, mode)
+    try:
+        if mode == 'rb':
+            file_size = fr.stat().st_size
+            block_size, max_requests = sftp_tuning(file_size, block_size, max_requests)
+            raw = _SFTPRawReader(fr, file_size, block_size, max_requests)
+            return RemoteReader(raw, buffer_size=block_size)
+        block_size, _ = sftp_tuning(2 ** 20, block_size)
+        fr.MAX_REQUEST_SIZE = block_size
+        fr.set_pipelined(True)
+        return io.BufferedWriter(_SFTPRawWriter(session, fr, remotefile),
+                                 buffer_size=block_size)
+    except BaseException:
+        fr.close()
+        raise
+
+
+def open_ftp(session, remotefile, mode, block_size):
+    """Open ``remotefile`` on FTP ``session``, see ``FTP.open_stream()``
+    """
+    _check_mode(mode)
+    if block_size is None:
+        block_size = 65536
+    session.voidcmd('TYPE I')
+    if mode == 'rb':
+        conn = session.transfercmd('RETR ' + remotefile)
+        return RemoteReader(_FTPRawReader(session, conn), buffer_size=block_size)
+    conn = session.transfercmd('STOR ' + remotefile)
+    return io.BufferedWriter(_FTPRawWriter(session, conn, remotefile),
+                             buffer_size=block_size)
@@ -0,0 +1,187 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Incremental mirroring of a directory tree between the local host and an SFTP or
+FTP server.
+"""
+
+import os
+import posixpath
+
+from .walk import _walk_entries, _relpath, _raise
+
+__all__ = ['SyncSummary', 'sync_dir']
+
+
+class SyncSummary(object):
+    """Summary of the changes made by ``sync_dir()``.
+
+    :ivar transferred: list of relative paths of files that were transferred
+    :ivar deleted: list of relative paths of files and directories that were deleted
+    :ivar created_dirs: list of relative paths of directories that were created
+    :ivar unchanged: number of files that were already up to date
+    :ivar report: ska_ftp.parallel.Report for the transfers (includes failures)
+    """
+    def __init__(self):
+        self.transferred = []
+        self.deleted = []
+        self.created_dirs = []
+        self.unchanged = 0
+        self.report = None
+
+    @property
+    def failed(self):
+        """List of failed transfer results"""
+        return self.report.failed if self.report is not None else []
+
+    def __repr__(self):
+        return ('<SyncSummary transferred={} deleted={} created_dirs={} unchanged={} '
+                'failed={}>'.format(len(self.transferred), len(self.deleted),
+                                    len(self.created_dirs), self.unchanged,
+                                    len(self.failed)))
+
+
+def _walk_local(root):
+    """Return dict of relpath => (size, mtime) for files and a set of relpath dirs.
+    """
+    files = {}
+    dirs = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        reldir = os.path.relpath(dirpath, root)
+        reldir = '' if reldir == '.' else reldir.replace(os.sep, '/')
+        for dirname in dirnames:
+            dirs.add(posixpath.join(reldir, dirname))
+        for filename in filenames:
+            st = os.stat(os.path.join(dirpath, filename))
+            files[posixpath.join(reldir, filename)] = (st.st_size, int(st.st_mtime))
+    return files, dirs
+
+
+def _walk_remote(session, root, workers):
+    """Return dict of relpath => (size, mtime) for files and a set of relpath dirs.
+    """
+    files = {}
+    dirs = set()
+    for dirpath, dir_entries, file_entries in _walk_entries(session, root, workers,
+                                                            onerror=_raise):
+        reldir = _relpath(dirpath, root)
+        for entry in dir_entries:
+            dirs.add(posixpath.join(reldir, entry.name))
+        for entry in file_entries:
+            mtime = None if entry.mtime is None else int(entry.mtime)
+            files[posixpath.join(reldir, entry.name)] = (entry.size, mtime)
+    return files, dirs
+
+
+def _local_md5(path):
+    import hashlib
+
+    md5 = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(2 ** 20), b''):
+            md5.update(block)
+    return md5.digest()
+
+
+def sync_dir(session, remote, local, direction='down', delete=False, checksum=False,
+             workers=4):
+    """Make ``local`` a mirror of ``remote`` (direction='down') or vice versa ('up').
+
+    Both trees are listed recursively (remote directories concurrently, see
+    ``ska_ftp.walk.walk()``) and a file is transferred if it is missing
+    from the destination, if the size differs, or if the source is newer than
+    the destination.  After a transfer the destination modification time is set
+    to match the source (for FTP uploads this requires server support for MFMT).
+    With ``checksum=True`` files of the same size are instead compared by MD5,
+    which requires server support (SFTP ``check-file`` or FTP ``XMD5``).
+
+    Transfers run concurrently via ``put_many()`` / ``get_many()``.
+
+    :param session: ska_ftp.SFTP or ska_ftp.FTP object
+    :param remote: remote directory
+    :param local: local directory
+    :param direction: 'down' (remote to local) or 'up' (local to remote)
+    :param delete: delete files and directories that are not in the source
+    :param checksum: compare files by MD5 instead of modification time
+    :param workers: number of concurrent transfers
+    :returns: SyncSummary
+    """
+    if direction not in ('down', 'up'):
+        raise ValueError("direction must be 'down' or 'up'")
+    local = str(local)
+
+    summary = SyncSummary()
+    remote_files, remote_dirs = _walk_remote(session, remote, workers)
+    if direction == 'down':
+        os.makedirs(local, exist_ok=True)
+        local_files, local_dirs = _walk_local(local)
+        src_files, src_dirs = remote_files, remote_dirs
+        dst_files, dst_dirs = local_files, local_dirs
+    else:
+        local_files, local_dirs = _walk_local(local)
+        src_files, src_dirs = local_files, local_dirs
+        dst_files, dst_dirs = remote_files, remote_dirs
+
+    def local_path(relpath):
+        return os.path.join(local, *relpath.split('/'))
+
+    def remote_path(relpath):
+        return posixpath.join(remote, relpath)
+
+    def changed(relpath):
+        if relpath not in dst_files:
+            return True
+        src_size, src_mtime = src_files[relpath]
+        dst_size, dst_mtime = dst_files[relpath]
+        if src_size != dst_size:
+            return True
+        if checksum:
+            return _local_md5(local_path(relpath)) != session._remote_md5(remote_path(relpath))
+        if src_mtime is None or dst_mtime is None:
+            return True
+        return src_mtime > dst_mtime
+
+    # Directories first, parents before children
+    for reldir in sorted(src_dirs - dst_dirs, key=lambda x: x.count('/')):
+        if direction == 'down':
+            os.makedirs(local_path(reldir), exist_ok=True)
+        else:
+            session.mkdir(remote_path(reldir))
+        summary.created_dirs.append(reldir)
+
+    relpaths = sorted(relpath for relpath in src_files if changed(relpath))
+    summary.unchanged = len(src_files) - len(relpaths)
+    if direction == 'down':
+        pairs = [(remote_path(relpath), local_path(relpath)) for relpath in relpaths]
+        summary.report = session.get_many(pairs, workers=workers)
+    else:
+        pairs = [(local_path(relpath), remote_path(relpath)) for relpath in relpaths]
+        summary.report = session.put_many(pairs, workers=workers)
+
+    for relpath, result in zip(relpaths, summary.report):
+        if not result.ok:
+            continue
+        summary.transferred.append(relpath)
+        mtime = src_files[relpath][1]
+        if mtime is None:
+            continue
+        if direction == 'down':
+            os.utime(local_path(relpath), (mtime, mtime))
+        else:
+            session._set_mtime(remote_path(relpath), mtime)
+
+    if delete:
+        for relpath in sorted(set(dst_files) - set(src_files)):
+            if direction == 'down':
+                os.remove(local_path(relpath))
+            else:
+                session.delete(remote_path(relpath))
+            summary.deleted.append(relpath)
+        # Children before parents
+        for reldir in sorted(dst_dirs - src_dirs, key=lambda x: -x.count('/')):
+            if direction == 'down':
+                os.rmdir(local_path(reldir))
+            else:
+                session.rmdir(remote_path(reldir))
+            summary.deleted.append(reldir)
+
+    return summary
@@ -5,3 +5,41 @@ import ska_ftp
 @pytest.fixture()
 def parsed_netrc():
     return ska_ftp.parse_netrc()
+
+
+@pytest.fixture()
+def sftp_server(tmp_path):
+    """Local paramiko SFTP server serving ``tmp_path / 'remote'`` as ``/``"""
+    pytest.importorskip('paramiko')
+    from .servers import SFTPServer
+
+    root = tmp_path / 'remote'
+    root.mkdir()
+    with SFTPServer(root) as server:
+        yield server
+
+
+@pytest.fixture()
+def ftp_server(tmp_path):
+    """Local pyftpdlib FTP server serving ``tmp_path / 'remote'`` as ``/``"""
+    pytest.importorskip('pyftpdlib')
+    from .servers import FTPServer
+
+    root = tmp_path / 'remote'
+    root.mkdir()
+    with FTPServer(root) as server:
+        yield server
+
+
+@pytest.fixture()
+def get_session(request):
+    """Factory for an SFTP or FTP session to the local test server of ``protocol``.
+
+    Use with ``@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])``.
+    """
+    def get_session(protocol, **kwargs):
+        server = request.getfixturevalue(protocol + '_server')
+        cls = ska_ftp.SFTP if protocol == 'sftp' else ska_ftp.FTP
+        return cls(server.host, server.user, server.passwd, port=server.port, **kwargs)
+
+    return get_session
@@ -0,0 +1,391 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Local stand-in SFTP and FTP servers on loopback for offline tests and benchmarks.
+
+The SFTP server is a paramiko-based SSH server with an SFTP subsystem that maps
+the remote ``/`` to a local root directory.  The FTP server uses pyftpdlib.
+Both run in daemon threads and accept a single user/passwd.
+"""
+
+import os
+import zlib
+import shlex
+import socket
+import logging
+import threading
+import subprocess
+
+USER = 'ska_user'
+PASSWD = 'ska_passwd'
+
+_HOST_KEY = None
+
+
+def _host_key():
+    import paramiko
+
+    global _HOST_KEY
+    if _HOST_KEY is None:
+        _HOST_KEY = paramiko.RSAKey.generate(2048)
+    return _HOST_KEY
+
+
+def _run_command(channel, args):
+    """Run ``args`` with stdin, stdout and stderr connected to ``channel``"""
+    proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+
+    def feed_stdin():
+        try:
+            for data in iter(lambda: channel.recv(65536), b''):
+                proc.stdin.write(data)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def send_stderr():
+        for data in iter(lambda: proc.stderr.read1(65536), b''):
+            channel.sendall_stderr(data)
+
+    threads = [threading.Thread(target=func, daemon=True) for func in (feed_stdin, send_stderr)]
+    for thread in threads:
+        thread.start()
+    for data in iter(lambda: proc.stdout.read1(65536), b''):
+        channel.sendall(data)
+    threads[1].join()
+    channel.send_exit_status(proc.wait())
+    channel.close()
+
+
+def _make_sftp_classes():
+    import paramiko
+
+    def set_file_attr(filename, attr):
+        # paramiko.SFTPServer.set_file_attr() truncates to zero before setting
+        # the size, unlike a real server.
+        if attr._flags & attr.FLAG_SIZE:
+            os.truncate(filename, attr.st_size)
+            attr._flags &= ~attr.FLAG_SIZE
+        paramiko.SFTPServer.set_file_attr(filename, attr)
+
+    class StubServer(paramiko.ServerInterface):
+        root = None
+        exec_tar = False
+
+        def check_auth_password(self, username, password):
+            if username == USER and password == PASSWD:
+                return paramiko.AUTH_SUCCESSFUL
+            return paramiko.AUTH_FAILED
+
+        def get_allowed_auths(self, username):
+            return 'password'
+
+        def check_channel_request(self, kind, chanid):
+            return paramiko.OPEN_SUCCEEDED
+
+        def check_channel_exec_request(self, channel, command):
+            # Only tar, with each -C directory mapped under root
+            args = shlex.split(command.decode('utf-8'))
+            if not self.exec_tar or args[0] != 'tar':
+                return False
+            for ii in range(1, len(args)):
+                if args[ii - 1] == '-C':
+                    args[ii] = self.root + args[ii]
+            threading.Thread(target=_run_command, args=(channel, args), daemon=True).start()
+            return True
+
+    class StubSFTPHandle(paramiko.SFTPHandle):
+        def stat(self):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+
+        def chattr(self, attr):
+            try:
+                set_file_attr(self.filename, attr)
+                return paramiko.SFTP_OK
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+
+    class StubSFTPServer(paramiko.SFTPServerInterface):
+        root = None
+
+        def _realpath(self, path):
+            return self.root + self.canonicalize(path)
+
+        def list_folder(self, path):
+            path = self._realpath(path)
+            try:
+                out = []
+                for fname in os.listdir(path):
+                    attr = paramiko.SFTPAttributes.from_stat(
+                        os.lstat(os.path.join(path, fname)))
+                    attr.filename = fname
+                    out.append(attr)
+                return out
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+
+        def stat(self, path):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.stat(self._realpath(path)))
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+
+        def lstat(self, path):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.lstat(self._realpath(path)))
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+
+        def open(self, path, flags, attr):
+            path = self._realpath(path)
+            try:
+                binary_flag = getattr(os, 'O_BINARY', 0)
+                flags |= binary_flag
+                mode = getattr(attr, 'st_mode', None)
+                fd = os.open(path, flags, mode if mode is not None else 0o666)
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            if (flags & os.O_CREAT) and (attr is not None):
+                attr._flags &= ~attr.FLAG_PERMISSIONS
+                set_file_attr(path, attr)
+            if flags & os.O_WRONLY:
+                fstr = 'ab' if flags & os.O_APPEND else 'wb'
+            elif flags & os.O_RDWR:
+                fstr = 'a+b' if flags & os.O_APPEND else 'r+b'
+            else:
+                fstr = 'rb'
+            try:
+                fh = os.fdopen(fd, fstr)
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            handle = StubSFTPHandle(flags)
+            handle.filename = path
+            handle.readfile = fh
+            handle.writefile = fh
+            return handle
+
+        def remove(self, path):
+            try:
+                os.remove(self._realpath(path))
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            return paramiko.SFTP_OK
+
+        def rename(self, oldpath, newpath):
+            oldpath = self._realpath(oldpath)
+            newpath = self._realpath(newpath)
+            if os.path.exists(newpath):
+                return paramiko.SFTP_FAILURE
+            try:
+                os.rename(oldpath, newpath)
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            return paramiko.SFTP_OK
+
+        def posix_rename(self, oldpath, newpath):
+            try:
+                os.rename(self._realpath(oldpath), self._realpath(newpath))
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            return paramiko.SFTP_OK
+
+        def mkdir(self, path, attr):
+            path = self._realpath(path)
+            try:
+                os.mkdir(path)
+                if attr is not None:
+                    set_file_attr(path, attr)
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            return paramiko.SFTP_OK
+
+        def rmdir(self, path):
+            try:
+                os.rmdir(self._realpath(path))
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            return paramiko.SFTP_OK
+
+        def chattr(self, path, attr):
+            try:
+                set_file_attr(self._realpath(path), attr)
+            except OSError as err:
+                return paramiko.SFTPServer.convert_errno(err.errno)
+            return paramiko.SFTP_OK
+
+    return StubServer, StubSFTPServer
+
+
+class SFTPServer(object):
+    """Local paramiko SFTP server serving ``root`` on 127.0.0.1.
+
+    Each accepted connection gets its own ``paramiko.Transport`` so that many
+    clients (and many channels per client) can be served concurrently.
+
+    :param root: local directory that is served as remote ``/``
+    :param compress: allow zlib compression of the SSH transport
+    :param exec_tar: allow exec requests that run ``tar``, with ``-C`` directories
+        mapped under ``root``
+    """
+    def __init__(self, root, compress=False, exec_tar=False):
+        import paramiko
+
+        self.compress = compress
+        self.root = os.path.realpath(str(root))
+        self.host = '127.0.0.1'
+        self.user = USER
+        self.passwd = PASSWD
+        self._paramiko = paramiko
+        server_cls, sftp_cls = _make_sftp_classes()
+        self._server_cls = type('RootedStubServer', (server_cls,),
+                                {'root': self.root, 'exec_tar': exec_tar})
+        self._sftp_cls = type('RootedSFTPServer', (sftp_cls,), {'root': self.root})
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, 0))
+        self._sock.listen(64)
+        self.port = self._sock.getsockname()[1]
+        self._transports = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        paramiko = self._paramiko
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(_host_key())
+            transport.use_compression(self.compress)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, self._sftp_cls)
+            transport.start_server(server=self._server_cls())
+            self._transports.append(transport)
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        for transport in self._transports:
+            transport.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def _make_mode_z_handler(base):
+    """Subclass of pyftpdlib handler ``base`` that supports ``MODE Z``"""
+    from pyftpdlib.handlers import DTPHandler
+
+    class ZlibProducer(object):
+        def __init__(self, producer):
+            self.producer = producer
+            self.compressor = zlib.compressobj()
+
+        def more(self):
+            while self.compressor is not None:
+                data = self.producer.more()
+                if not data:
+                    data = self.compressor.flush()
+                    self.compressor = None
+                    return data
+                data = self.compressor.compress(data)
+                if data:
+                    return data
+            return b''
+
+    class ZlibDTPHandler(DTPHandler):
+        def use_sendfile(self):
+            return False
+
+        def push(self, data):
+            if self.cmd_channel.mode_z:
+                data = zlib.compress(data)
+            DTPHandler.push(self, data)
+
+        def push_with_producer(self, producer):
+            if self.cmd_channel.mode_z:
+                producer = ZlibProducer(producer)
+            DTPHandler.push_with_producer(self, producer)
+
+        def enable_receiving(self, type, cmd):
+            DTPHandler.enable_receiving(self, type, cmd)
+            if self.cmd_channel.mode_z:
+                self._data_wrapper = zlib.decompressobj().decompress
+
+    def ftp_MODE(self, line):
+        if line.upper() == 'Z':
+            self.mode_z = True
+            self.respond('200 Transfer mode set to: Z')
+        else:
+            self.mode_z = False
+            base.ftp_MODE(self, line)
+
+    return type('ModeZFTPHandler', (base,),
+                {'dtp_handler': ZlibDTPHandler, 'mode_z': False, 'ftp_MODE': ftp_MODE})
+
+
+class FTPServer(object):
+    """Local pyftpdlib FTP server serving ``root`` on 127.0.0.1.
+
+    :param root: local directory that is served as remote ``/``
+    :param compress: support ``MODE Z`` (zlib compressed data connections)
+    :param mlst: support MLST and MLSD (False is like e.g. vsftpd)
+    """
+    def __init__(self, root, compress=False, mlst=True):
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.handlers import FTPHandler
+        from pyftpdlib.servers import ThreadedFTPServer
+        from pyftpdlib.ioloop import IOLoop
+
+        logger = logging.getLogger('pyftpdlib')
+        logger.setLevel(logging.WARNING)
+        if not logger.handlers:
+            # Otherwise serve_forever() installs a stderr handler at INFO level
+            logger.addHandler(logging.NullHandler())
+        self.root = os.path.realpath(str(root))
+        self.host = '127.0.0.1'
+        self.user = USER
+        self.passwd = PASSWD
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USER, PASSWD, self.root, perm='elradfmwMT')
+        if compress:
+            FTPHandler = _make_mode_z_handler(FTPHandler)
+        attrs = {'authorizer': authorizer}
+        if not mlst:
+            attrs['proto_cmds'] = {cmd: info for cmd, info in FTPHandler.proto_cmds.items()
+                                   if cmd not in ('MLST', 'MLSD')}
+        handler = type('StubFTPHandler', (FTPHandler,), attrs)
+        # Own IOLoop so that several servers can run in one process
+        self._server = ThreadedFTPServer((self.host, 0), handler, ioloop=IOLoop())
+        self.port = self._server.address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'timeout': 0.1, 'handle_exit': False},
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.close_all()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,45 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import asyncio
+
+import pytest
+
+from ska_ftp.aio import AsyncSFTP, AsyncFTP
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_async_session(protocol, tmp_path, request):
+    server = request.getfixturevalue(protocol + '_server')
+    cls = AsyncSFTP if protocol == 'sftp' else AsyncFTP
+    remote = tmp_path / 'remote'
+    files = []
+    for ii in range(20):
+        path = tmp_path / 'file{:02d}.dat'.format(ii)
+        path.write_bytes(os.urandom(1000 + ii))
+        files.append(path)
+
+    async def main():
+        async with cls(server.host, server.user, server.passwd, port=server.port,
+                       max_per_host=3) as session:
+            await session.mkdir('/sub')
+            await session.cd('/sub')
+            report = await session.put_many([str(path) for path in files])
+            assert report.ok
+            assert sorted(await session.ls()) == [path.name for path in files]
+
+            results = await asyncio.gather(
+                *(session.get(path.name, str(tmp_path / ('copy_' + path.name)))
+                  for path in files))
+            assert len(results) == len(files)
+
+            await session.rename('file00.dat', '/moved.dat')
+            await session.delete('file01.dat')
+            assert len(await session.ls_full('/sub')) == len(files) - 2
+            # 20 concurrent transfers ran on at most max_per_host threads
+            assert len(session._executor._threads) <= 3
+
+    asyncio.run(main())
+    for path in files:
+        assert (tmp_path / ('copy_' + path.name)).read_bytes() == path.read_bytes()
+    assert (remote / 'moved.dat').read_bytes() == files[0].read_bytes()
+    assert not (remote / 'sub' / 'file01.dat').exists()
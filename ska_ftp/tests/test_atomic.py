@@ -0,0 +1,96 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+
+import pytest
+
+import ska_ftp
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_put_atomic(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote'
+    data = os.urandom(2 ** 20 + 5)
+    local = tmp_path / 'local.dat'
+    local.write_bytes(data)
+    (remote / 'data.dat').write_bytes(b'old')
+
+    # The target keeps its old contents until the upload is complete
+    seen = []
+
+    def callback(*args):
+        seen.append((remote / 'data.dat').read_bytes())
+
+    session.put(str(local), '/data.dat', callback=callback, atomic=True)
+    assert (remote / 'data.dat').read_bytes() == data
+    assert seen and set(seen) == {b'old'}
+    assert os.listdir(str(remote)) == ['data.dat']
+
+    # Concurrent uploads
+    names = ['file{}.dat'.format(ii) for ii in range(8)]
+    for name in names:
+        (tmp_path / name).write_bytes(name.encode('ascii'))
+    report = session.put_many([(str(tmp_path / name), '/' + name) for name in names],
+                              workers=4, atomic=True)
+    assert report.ok
+    assert sorted(os.listdir(str(remote))) == sorted(names + ['data.dat'])
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_put_atomic_cleanup(protocol, tmp_path, get_session, monkeypatch):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote'
+    local = tmp_path / 'local.dat'
+    local.write_bytes(b'new data')
+    (remote / 'data.dat').write_bytes(b'old')
+
+    # Checksum mismatch before the rename
+    monkeypatch.setattr(session, '_remote_hash', lambda path, algorithm: b'bad')
+    with pytest.raises(ska_ftp.verify.ChecksumError):
+        session.put(str(local), '/data.dat', verify='md5', atomic=True)
+    assert (remote / 'data.dat').read_bytes() == b'old'
+    assert os.listdir(str(remote)) == ['data.dat']
+
+    # Missing local file
+    with pytest.raises(IOError):
+        session.put(str(tmp_path / 'missing.dat'), '/data.dat', atomic=True)
+    assert os.listdir(str(remote)) == ['data.dat']
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_put_atomic_resume(protocol, tmp_path, get_session, monkeypatch):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote'
+    local = tmp_path / 'local.dat'
+    local.write_bytes(b'new data')
+    (remote / 'data.dat').write_bytes(b'old')
+    (remote / 'data.dat.part').write_bytes(b'new ')
+
+    # The .part file is the temporary name and is not renamed on a mismatch
+    monkeypatch.setattr(session, '_remote_hash', lambda path, algorithm: b'bad')
+    with pytest.raises(ska_ftp.verify.ChecksumError):
+        session.put(str(local), '/data.dat', verify='md5', atomic=True, resume=True)
+    assert (remote / 'data.dat').read_bytes() == b'old'
+    assert os.listdir(str(remote)) == ['data.dat']
+
+    monkeypatch.undo()
+    session.put(str(local), '/data.dat', atomic=True, resume=True)
+    assert (remote / 'data.dat').read_bytes() == b'new data'
+    assert os.listdir(str(remote)) == ['data.dat']
+    session.close()
+
+
+def test_put_atomic_segments(tmp_path, sftp_server):
+    session = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                           port=sftp_server.port)
+    remote = tmp_path / 'remote'
+    data = os.urandom(3 * 2 ** 20)
+    (tmp_path / 'local.dat').write_bytes(data)
+    (remote / 'data.dat').write_bytes(b'old')
+
+    session.put(str(tmp_path / 'local.dat'), '/data.dat', segments=3, atomic=True)
+    assert (remote / 'data.dat').read_bytes() == data
+    assert os.listdir(str(remote)) == ['data.dat']
+    session.close()
@@ -0,0 +1,82 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import pytest
+
+import ska_ftp
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_delete_rename_many(protocol, tmp_path, get_session):
+    session = get_session(protocol, cache_ttl=60)
+    remote = tmp_path / 'remote'
+    (remote / 'sub').mkdir()
+    for ii in range(200):
+        (remote / 'sub' / 'file{:03d}.dat'.format(ii)).write_bytes(b'x')
+    assert len(session.ls('/sub')) == 200
+
+    pairs = [('/sub/file{:03d}.dat'.format(ii), '/sub/new{:03d}.dat'.format(ii))
+             for ii in range(100)]
+    report = session.rename_many(pairs + [('/sub/missing', '/sub/other')])
+    assert len(report) == 101
+    assert len(report.succeeded) == 100
+    assert report.failed[0].item == ('/sub/missing', '/sub/other')
+    assert sorted(session.ls('/sub'))[:3] == ['file100.dat', 'file101.dat', 'file102.dat']
+
+    # Paths relative to the working directory
+    session.cd('/sub')
+    paths = sorted(session.ls('.')) + ['missing.dat']
+    report = session.delete_many(paths)
+    assert [result.item for result in report] == paths
+    assert len(report.succeeded) == 200
+    assert isinstance(report[-1].error, Exception)
+    assert session.ls('/sub') == []
+    assert list((remote / 'sub').iterdir()) == []
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_stat_many(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote'
+    (remote / 'sub').mkdir()
+    (remote / 'a.dat').write_bytes(b'x' * 10)
+    (remote / 'b.dat').write_bytes(b'x' * 20)
+
+    report = session.stat_many(['/a.dat', '/b.dat', '/sub', '/missing'])
+    assert [result.ok for result in report] == [True, True, True, False]
+    assert [report[0].value.name, report[0].value.size] == ['a.dat', 10]
+    assert report[1].value.size == 20
+    assert report[1].value.mtime == pytest.approx((remote / 'b.dat').stat().st_mtime, abs=1)
+    assert not report[1].value.is_dir
+    assert report[2].value.is_dir
+
+    if protocol == 'ftp':
+        # Fall back to SIZE and MDTM without MLST
+        session._mlst_supported = False
+        report = session.stat_many(['/b.dat', '/missing'], workers=1)
+        assert report[0].value.size == 20
+        assert report[0].value.mtime == pytest.approx((remote / 'b.dat').stat().st_mtime, abs=1)
+        assert not report[1].ok
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_makedirs(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote'
+
+    session.makedirs('/a/b/c/d')
+    assert (remote / 'a' / 'b' / 'c' / 'd').is_dir()
+    session.makedirs('/a/b/e/', exist_ok=True)
+    assert (remote / 'a' / 'b' / 'e').is_dir()
+    session.makedirs('/a/b/c', exist_ok=True)
+    with pytest.raises(FileExistsError):
+        session.makedirs('/a/b/c')
+
+    session.cd('/a')
+    session.makedirs('x/y')
+    assert (remote / 'a' / 'x' / 'y').is_dir()
+
+    (remote / 'file.dat').write_bytes(b'x')
+    with pytest.raises((IOError, ska_ftp.ftp.ftplib.error_perm)):
+        session.makedirs('/file.dat/sub', exist_ok=True)
+    session.close()
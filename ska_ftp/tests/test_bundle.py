@@ -0,0 +1,73 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+
+import pytest
+
+import ska_ftp
+
+
+@pytest.fixture()
+def tar_server(tmp_path):
+    """SFTP server that also runs tar over exec channels"""
+    pytest.importorskip('paramiko')
+    from .servers import SFTPServer
+
+    root = tmp_path / 'remote'
+    root.mkdir()
+    with SFTPServer(root, exec_tar=True) as server:
+        yield server
+
+
+def make_files(path, n_files):
+    path.mkdir()
+    files = {}
+    for ii in range(n_files):
+        name = 'file{:03d}.dat'.format(ii)
+        files[name] = os.urandom(ii * 100)
+        (path / name).write_bytes(files[name])
+    return files
+
+
+@pytest.mark.parametrize('compress', [None, 'gz'])
+@pytest.mark.parametrize('exec_tar', [True, False])
+def test_bundle(exec_tar, compress, tmp_path, request):
+    server = request.getfixturevalue('tar_server' if exec_tar else 'sftp_server')
+    session = ska_ftp.SFTP(server.host, server.user, server.passwd, port=server.port)
+    remote = tmp_path / 'remote'
+    files = make_files(tmp_path / 'local', 20)
+    (remote / 'pub').mkdir()
+
+    session.cd('/pub')
+    (remote / 'pub' / 'in').mkdir()
+    out = session.put_bundle([str(tmp_path / 'local' / name) for name in files], 'in',
+                             compress=compress)
+    assert session._exec_tar is exec_tar
+    assert out == ['in/' + name for name in files]
+    for name, data in files.items():
+        assert (remote / 'pub' / 'in' / name).read_bytes() == data
+
+    (tmp_path / 'out').mkdir()
+    out = session.get_bundle(['in/' + name for name in files], str(tmp_path / 'out'),
+                             compress=compress)
+    assert out == [str(tmp_path / 'out' / name) for name in files]
+    for name, data in files.items():
+        assert (tmp_path / 'out' / name).read_bytes() == data
+    session.close()
+
+
+def test_bundle_errors(tmp_path, tar_server):
+    session = ska_ftp.SFTP(tar_server.host, tar_server.user, tar_server.passwd,
+                           port=tar_server.port)
+    (tmp_path / 'remote' / 'a.dat').write_bytes(b'a')
+    (tmp_path / 'out').mkdir()
+
+    with pytest.raises(ValueError):
+        session.get_bundle(['/a.dat', '/sub/a.dat'], str(tmp_path / 'out'))
+    with pytest.raises(ValueError):
+        session.get_bundle(['/a.dat'], str(tmp_path / 'out'), compress='zip')
+
+    # tar on the server fails for the missing file
+    with pytest.raises(IOError, match='missing.dat'):
+        session.get_bundle(['/a.dat', '/missing.dat'], str(tmp_path / 'out'))
+    assert (tmp_path / 'out' / 'a.dat').read_bytes() == b'a'
+    session.close()
@@ -0,0 +1,83 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import time
+import socket
+
+import pytest
+
+import ska_ftp
+from ska_ftp.cache import ListingCache
+
+
+def test_listing_cache_ttl_and_lru():
+    cache = ListingCache(ttl=0.2, maxsize=2)
+    cache.set(('ls', '/a'), ['x'])
+    cache.set(('ls', '/b'), ['y'])
+    assert cache.get(('ls', '/a')) == ['x']
+    # /b is now least recently used and gets evicted
+    cache.set(('ls', '/c'), ['z'])
+    assert cache.get(('ls', '/b')) is None
+    assert len(cache) == 2
+    time.sleep(0.3)
+    assert cache.get(('ls', '/a')) is None
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_listing_cache_invalidate():
+    cache = ListingCache()
+    for key in [('ls', '/data'), ('stat', '/data'), ('ls', '/data/sub'),
+                ('stat', '/data/sub/x'), ('stat', '/data/other'), ('ls', '/data2')]:
+        cache.set(key, 1)
+    cache.invalidate('/data/sub')
+    assert sorted(cache._data) == [('ls', '/data2'), ('stat', '/data'),
+                                   ('stat', '/data/other')]
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_cached_ls(protocol, tmp_path, request):
+    server = request.getfixturevalue(protocol + '_server')
+    cls = ska_ftp.SFTP if protocol == 'sftp' else ska_ftp.FTP
+    session = cls(server.host, server.user, server.passwd, port=server.port, cache_ttl=60)
+    remote = tmp_path / 'remote'
+    (remote / 'a.dat').write_bytes(b'a')
+    local = tmp_path / 'b.dat'
+    local.write_bytes(b'b')
+
+    assert sorted(session.ls('/')) == ['a.dat']
+    # A change by another client is not seen until refresh
+    (remote / 'c.dat').write_bytes(b'c')
+    assert sorted(session.ls('/')) == ['a.dat']
+    assert session._cache.hits == 1
+    assert sorted(session.ls('/', refresh=True)) == ['a.dat', 'c.dat']
+
+    # Changes through the wrapper invalidate the listing
+    session.put(str(local), '/b.dat')
+    assert sorted(session.ls('/')) == ['a.dat', 'b.dat', 'c.dat']
+    session.delete('/a.dat')
+    session.mkdir('/sub')
+    assert sorted(session.ls('/')) == ['b.dat', 'c.dat', 'sub']
+    session.cd('/sub')
+    session.rename('/b.dat', 'b.dat')
+    assert [entry.name for entry in session.ls_entries()] == ['b.dat']
+    assert sorted(session.ls('/')) == ['c.dat', 'sub']
+    session.close()
+
+
+def test_cached_ftp_cwd(tmp_path, ftp_server):
+    # ftplib's cwd() is public, it must keep cache keys and reconnects right
+    session = ska_ftp.FTP(ftp_server.host, ftp_server.user, ftp_server.passwd,
+                          port=ftp_server.port, cache_ttl=60,
+                          retry=ska_ftp.retry.RetryPolicy(backoff=0.01))
+    remote = tmp_path / 'remote'
+    for name in ('a', 'b'):
+        (remote / name).mkdir()
+        (remote / name / (name + '.dat')).write_bytes(b'x')
+
+    session.cd('/a')
+    assert session.ls() == ['a.dat']
+    session.cwd('/b')
+    assert session.ls() == ['b.dat']
+
+    session.sock.shutdown(socket.SHUT_RDWR)
+    assert session.ls(refresh=True) == ['b.dat']
+    session.close()
@@ -0,0 +1,71 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import zlib
+import socket
+import threading
+
+import pytest
+
+import ska_ftp
+from ska_ftp.compress import ZlibSocket
+
+DATA = b'2024:001:00:00:00.000 AOPCADMD NPNT 1.234e+00\n' * 50000
+
+
+def test_zlib_socket():
+    left, right = socket.socketpair()
+    received = []
+    reader = threading.Thread(target=lambda: received.append(
+        b''.join(iter(lambda: right.recv(65536), b''))))
+    reader.start()
+    with ZlibSocket(left) as conn:
+        for ii in range(0, len(DATA), 10000):
+            conn.sendall(DATA[ii:ii + 10000])
+    reader.join()
+    right.close()
+    assert len(received[0]) < len(DATA) / 10
+    assert zlib.decompress(received[0]) == DATA
+
+    left, right = socket.socketpair()
+    left.sendall(zlib.compress(DATA))
+    left.close()
+    conn = ZlibSocket(right)
+    buf = bytearray(1000)
+    assert conn.recv_into(buf) == 1000
+    assert buf == DATA[:1000]
+    lines = list(conn.makefile('r', encoding='ascii'))
+    conn.close()
+    assert ''.join(lines).encode() == DATA[1000:]
+
+
+@pytest.mark.parametrize('server_compress', [True, False])
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_compress(protocol, server_compress, tmp_path):
+    pytest.importorskip('paramiko' if protocol == 'sftp' else 'pyftpdlib')
+    from .servers import SFTPServer, FTPServer
+
+    server_cls, cls = ((SFTPServer, ska_ftp.SFTP) if protocol == 'sftp'
+                       else (FTPServer, ska_ftp.FTP))
+    remote = tmp_path / 'remote'
+    remote.mkdir()
+    local = tmp_path / 'local.dat'
+    local.write_bytes(DATA + os.urandom(100000))
+    with server_cls(remote, compress=server_compress) as server:
+        session = cls(server.host, server.user, server.passwd, port=server.port,
+                      compress=True)
+        if protocol == 'ftp':
+            # Falls back to uncompressed transfers if the server refuses MODE Z
+            assert session._mode_z is server_compress
+        else:
+            transport = session.ftp.get_channel().get_transport()
+            assert (transport.local_compression != 'none') is server_compress
+
+        session.put(str(local), '/data.dat')
+        assert (remote / 'data.dat').read_bytes() == local.read_bytes()
+        session.get('/data.dat', str(tmp_path / 'out.dat'), resume=True)
+        assert (tmp_path / 'out.dat').read_bytes() == local.read_bytes()
+        assert session.ls('/') == ['data.dat']
+        assert session.ls_entries('/')[0].size == local.stat().st_size
+        with session.open_stream('/data.dat') as fh:
+            assert fh.read(len(DATA)) == DATA
+        session.close()
@@ -0,0 +1,47 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import hashlib
+
+import pytest
+
+import ska_ftp
+
+
+@pytest.mark.parametrize('verify', [None, 'md5'])
+@pytest.mark.parametrize('block_size', [None, 1000, 2 ** 20])
+def test_ftp_block_size(block_size, verify, tmp_path, ftp_server):
+    session = ska_ftp.FTP(ftp_server.host, ftp_server.user, ftp_server.passwd,
+                          port=ftp_server.port)
+    remote = tmp_path / 'remote'
+    data = os.urandom(300007)
+    (tmp_path / 'local.dat').write_bytes(data)
+
+    # Upload uses sendfile() without verify, else the reused buffer
+    calls = []
+    digest = session.put(str(tmp_path / 'local.dat'), '/data.dat', verify=verify,
+                         block_size=block_size,
+                         callback=lambda size, total: calls.append((size, total)))
+    assert (remote / 'data.dat').read_bytes() == data
+    assert calls[-1] == (len(data), len(data))
+    if block_size is not None:
+        assert len(calls) == -(-len(data) // block_size)
+    if verify:
+        assert digest == hashlib.md5(data).hexdigest()
+
+    calls = []
+    digest = session.get('/data.dat', str(tmp_path / 'out.dat'), verify=verify,
+                         block_size=block_size,
+                         callback=lambda size, total: calls.append((size, total)))
+    assert (tmp_path / 'out.dat').read_bytes() == data
+    assert calls[-1] == (len(data), len(data))
+    assert all(size2 - size1 <= (block_size or ska_ftp.ftp.FTP_BLOCK_SIZE)
+               for (size1, _), (size2, _) in zip(calls, calls[1:]))
+    if verify:
+        assert digest == hashlib.md5(data).hexdigest()
+
+    # Resumed download with the tail check spanning several receive buffers
+    (tmp_path / 'out.dat').write_bytes(data[:100000])
+    session.get('/data.dat', str(tmp_path / 'out.dat'), resume=True, resume_check=5000,
+                block_size=block_size)
+    assert (tmp_path / 'out.dat').read_bytes() == data
+    session.close()
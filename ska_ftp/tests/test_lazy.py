@@ -0,0 +1,65 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import sys
+import socket
+import subprocess
+
+import pytest
+
+import ska_ftp
+
+
+def run_python(code):
+    """Output of ``code`` run by a fresh interpreter that imports this ska_ftp"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(ska_ftp.__file__)))
+    path = [root] + [p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path))
+    return subprocess.check_output([sys.executable, '-c', code], text=True, cwd=root, env=env)
+
+
+def test_lazy_import():
+    code = ('import sys, ska_ftp; '
+            'print(sorted(set(sys.modules) & {"ftplib", "paramiko", "sqlite3", "ska_helpers", '
+            '"ska_ftp.ftp"}))')
+    out = run_python(code)
+    assert out.strip() == '[]'
+
+    assert ska_ftp.SFTP is ska_ftp.ftp.SFTP
+    assert ska_ftp.publish is ska_ftp.multihost.publish
+    assert ska_ftp.verify.ChecksumError
+    assert 'SFTP' in dir(ska_ftp)
+    with pytest.raises(AttributeError):
+        ska_ftp.missing
+
+
+def test_lazy_submodules():
+    # Submodules not imported by ska_ftp.ftp are reachable as attributes
+    code = ('import ska_ftp; '
+            'print(ska_ftp.manifest.ManifestIndex.__name__, ska_ftp.aio.AsyncSFTP.__name__, '
+            'ska_ftp.bundle.put_bundle.__name__, ska_ftp.transfer_queue.run_worker.__name__)')
+    out = run_python(code)
+    assert out.split() == ['ManifestIndex', 'AsyncSFTP', 'put_bundle', 'run_worker']
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_lazy_session(protocol, tmp_path, request):
+    server = request.getfixturevalue(protocol + '_server')
+    cls = ska_ftp.SFTP if protocol == 'sftp' else ska_ftp.FTP
+    (tmp_path / 'remote' / 'a.dat').write_bytes(b'a')
+
+    # No connection is made until the first operation
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    session = cls('127.0.0.1', 'user', 'passwd', port=port, lazy=True)
+    with pytest.raises(Exception, match='refused'):
+        session.ls()
+    session.close()
+
+    session = cls(server.host, server.user, server.passwd, port=server.port, lazy=True,
+                  cache_ttl=10)
+    assert session.ls() == ['a.dat']
+    session.cd('/')
+    assert session.ls() == ['a.dat']
+    session.close()
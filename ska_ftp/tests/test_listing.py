@@ -0,0 +1,64 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import calendar
+import stat
+
+import pytest
+
+import ska_ftp
+from ska_ftp.listing import RemoteEntry, parse_list_line, from_mlsd
+
+NOW = calendar.timegm((2026, 10, 17, 0, 0, 0))
+
+
+@pytest.mark.parametrize('line,entry', [
+    ('drwxr-xr-x  2 user group  4096 Jan  1 12:34 my dir',
+     RemoteEntry('my dir', 4096, calendar.timegm((2026, 1, 1, 12, 34, 0)),
+                 stat.S_IFDIR | 0o755, True)),
+    ('-rw-r--r--    1 1000     1000       123456 Mar 05  2020 file.fits.gz',
+     RemoteEntry('file.fits.gz', 123456, calendar.timegm((2020, 3, 5, 0, 0, 0)),
+                 stat.S_IFREG | 0o644, False)),
+    # Recent month later than now is from last year
+    ('-rw-r--r-- 1 ftp 55 Dec 31 23:59 no_group.txt',
+     RemoteEntry('no_group.txt', 55, calendar.timegm((2025, 12, 31, 23, 59, 0)),
+                 stat.S_IFREG | 0o644, False)),
+    ('lrwxrwxrwx 1 root root 7 Feb 10 09:00 bin -> usr/bin',
+     RemoteEntry('bin', 7, calendar.timegm((2026, 2, 10, 9, 0, 0)),
+                 stat.S_IFLNK | 0o777, False)),
+    ('01-31-20  01:23PM       <DIR>          Some Dir',
+     RemoteEntry('Some Dir', None, calendar.timegm((2020, 1, 31, 13, 23, 0)), None, True)),
+    ('10-05-2021  09:15AM             1234 a b.txt',
+     RemoteEntry('a b.txt', 1234, calendar.timegm((2021, 10, 5, 9, 15, 0)), None, False)),
+    ('total 12', None),
+])
+def test_parse_list_line(line, entry):
+    assert parse_list_line(line, now=NOW) == entry
+
+
+def test_from_mlsd():
+    assert from_mlsd('.', {'type': 'cdir'}) is None
+    entry = from_mlsd('x.dat', {'type': 'file', 'size': '10', 'modify': '20200102030405.5',
+                                'unix.mode': '0644'})
+    assert entry == RemoteEntry('x.dat', 10, calendar.timegm((2020, 1, 2, 3, 4, 5)) + 0.5,
+                                stat.S_IFREG | 0o644, False)
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('mlsd', [True, False])
+def test_ls_entries(protocol, mlsd, tmp_path, request):
+    if protocol == 'sftp' and not mlsd:
+        pytest.skip('LIST fallback is FTP only')
+    server = request.getfixturevalue(protocol + '_server')
+    cls = ska_ftp.SFTP if protocol == 'sftp' else ska_ftp.FTP
+    session = cls(server.host, server.user, server.passwd, port=server.port)
+    if not mlsd:
+        session._mlsd_supported = False
+    remote = tmp_path / 'remote'
+    (remote / 'sub').mkdir()
+    (remote / 'data.dat').write_bytes(b'x' * 123)
+
+    entries = sorted(session.ls_entries('/'), key=lambda entry: entry.name)
+    assert [(entry.name, entry.is_dir) for entry in entries] == [('data.dat', False),
+                                                                 ('sub', True)]
+    assert entries[0].size == 123
+    assert abs(entries[0].mtime - (remote / 'data.dat').stat().st_mtime) < 120
+    session.close()
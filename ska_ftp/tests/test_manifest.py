@@ -0,0 +1,154 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import hashlib
+import shutil
+
+import pytest
+
+import ska_ftp
+from ska_ftp.manifest import ManifestIndex
+from ska_ftp.tests.servers import FTPServer
+
+
+def make_tree(root):
+    for obs in ('obs1', 'obs2'):
+        for day in ('2026001', '2026002'):
+            path = root / 'data' / obs / day
+            path.mkdir(parents=True)
+            (path / 'evt.fits').write_bytes(b'x')
+    (root / 'data' / 'README').write_bytes(b'z')
+
+
+def set_mtime(path, mtime):
+    os.utime(str(path), (mtime, mtime))
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_scan(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    data = tmp_path / 'remote' / 'data'
+    make_tree(tmp_path / 'remote')
+    index = ManifestIndex(str(tmp_path / 'index.db'))
+
+    changes = session.scan('/data', index)
+    assert changes.added == ['/data/README'] + [
+        '/data/{}/{}/evt.fits'.format(obs, day)
+        for obs in ('obs1', 'obs2') for day in ('2026001', '2026002')]
+    assert changes.modified == changes.deleted == []
+    assert changes.listed_dirs == 7
+    assert not session.scan('/data', index).changed
+
+    (data / 'obs1' / '2026003').mkdir()
+    (data / 'obs1' / '2026003' / 'evt.fits').write_bytes(b'new')
+    (data / 'obs2' / '2026001' / 'evt.fits').write_bytes(b'longer')
+    (data / 'README').unlink()
+    shutil.rmtree(str(data / 'obs2' / '2026002'))
+    changes = session.scan('/data', index)
+    assert changes.added == ['/data/obs1/2026003/evt.fits']
+    assert changes.modified == ['/data/obs2/2026001/evt.fits']
+    assert changes.deleted == ['/data/README', '/data/obs2/2026002/evt.fits']
+    assert index.get(session.host, '/data/obs2/2026002') is None
+    assert index.get(session.host, '/data/obs1/2026003/evt.fits')['size'] == 3
+    assert len(index.files(session.host, '/data')) == 4
+
+    # Index opened by file name
+    index.close()
+    assert not session.scan('/data', str(tmp_path / 'index.db')).changed
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_scan_skip_unchanged_dirs(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    data = tmp_path / 'remote' / 'data'
+    make_tree(tmp_path / 'remote')
+    for path in data.glob('**/*'):
+        if path.is_dir():
+            set_mtime(path, 1.7e9)
+    set_mtime(data, 1.7e9)
+
+    with ManifestIndex(':memory:') as index:
+        assert session.scan('/data', index, skip_unchanged_dirs=True).listed_dirs == 7
+
+        changes = session.scan('/data', index, skip_unchanged_dirs=True)
+        assert not changes.changed
+        assert (changes.listed_dirs, changes.skipped_dirs) == (0, 7)
+
+        # A new file changes the directory mtime, only that directory is listed
+        (data / 'obs2' / '2026002' / 'new.fits').write_bytes(b'y')
+        changes = session.scan('/data', index, skip_unchanged_dirs=True)
+        assert changes.added == ['/data/obs2/2026002/new.fits']
+        assert (changes.listed_dirs, changes.skipped_dirs) == (1, 6)
+
+        # Deleting an unchanged subdirectory is still seen from the stat
+        shutil.rmtree(str(data / 'obs1' / '2026001'))
+        set_mtime(data / 'obs1', 1.7e9)
+        changes = session.scan('/data', index, skip_unchanged_dirs=True)
+        assert changes.deleted == ['/data/obs1/2026001/evt.fits']
+    session.close()
+
+
+def test_scan_without_mlst(tmp_path, monkeypatch):
+    # Like vsftpd: directories cannot be stat'ed with SIZE / MDTM
+    data = tmp_path / 'remote' / 'data'
+    make_tree(tmp_path / 'remote')
+    for path in [data] + list(data.glob('**/*')):
+        if path.is_dir():
+            set_mtime(path, 1.7e9)
+
+    with FTPServer(tmp_path / 'remote', mlst=False) as server:
+        session = ska_ftp.FTP(server.host, server.user, server.passwd, port=server.port)
+        report = session.stat_many(['/data', '/data/obs1', '/data/README', '/missing'],
+                                   workers=1)
+        assert [result.ok for result in report] == [True, True, True, False]
+        assert report[0].value.is_dir and report[1].value.is_dir
+        assert not report[2].value.is_dir
+        assert session._mlst_supported is False
+
+        with ManifestIndex(':memory:') as index:
+            changes = session.scan('/data', index, skip_unchanged_dirs=True)
+            assert len(changes.added) == 5
+            assert changes.listed_dirs == 7
+
+            changes = session.scan('/data', index, skip_unchanged_dirs=True)
+            assert not changes.changed
+            assert (changes.listed_dirs, changes.skipped_dirs) == (0, 7)
+
+            (data / 'obs2' / '2026002' / 'new.fits').write_bytes(b'y')
+            changes = session.scan('/data', index, skip_unchanged_dirs=True)
+            assert changes.added == ['/data/obs2/2026002/new.fits']
+            assert (changes.listed_dirs, changes.skipped_dirs) == (1, 6)
+
+        # The parent of many subdirectories is listed once
+        listed = []
+        list_entries = ska_ftp.FTP._list_entries
+        monkeypatch.setattr(ska_ftp.FTP, '_list_entries',
+                            lambda self, dirname: listed.append(dirname)
+                            or list_entries(self, dirname))
+        report = session.stat_many(['/data/obs1/2026001', '/data/obs1/2026002',
+                                    '/data/obs2/2026001', '/data/obs2/2026002'], workers=3)
+        assert all(result.value.is_dir for result in report)
+        assert sorted(listed) == ['/data/obs1', '/data/obs2']
+        session.close()
+
+
+def test_scan_checksum(tmp_path, sftp_server):
+    session = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                           port=sftp_server.port)
+    data = tmp_path / 'remote' / 'data'
+    data.mkdir(parents=True)
+    # paramiko's server check-file needs at least 256 bytes
+    (data / 'a.dat').write_bytes(b'a' * 1000)
+
+    with ManifestIndex(':memory:') as index:
+        session.scan('/data', index, checksum='md5')
+        stored = index.get(session.host, '/data/a.dat')['checksum']
+        assert stored == hashlib.md5(b'a' * 1000).hexdigest()
+
+        # Touched without changing the content
+        set_mtime(data / 'a.dat', 1.6e9)
+        assert not session.scan('/data', index, checksum='md5').changed
+
+        (data / 'a.dat').write_bytes(b'b' * 1000)
+        assert session.scan('/data', index, checksum='md5').modified == ['/data/a.dat']
+    session.close()
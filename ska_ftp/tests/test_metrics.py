@@ -0,0 +1,54 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import json
+
+import pytest
+
+import ska_ftp
+from ska_ftp.metrics import Aggregator, JSONLinesSink, Metric, MultiSink
+
+
+def test_aggregator_percentiles():
+    agg = Aggregator()
+    for ii in range(1, 101):
+        agg.record(Metric('host', 'sftp', 'get', 0.0, ii / 100, nbytes=1000))
+    agg.record(Metric('host', 'sftp', 'get', 0.0, 0.5, error='IOError'))
+    stats = agg.summary()['host', 'get']
+    assert stats['count'] == 101
+    assert stats['errors'] == 1
+    assert stats['bytes'] == 100000
+    assert stats['p50'] == 0.5
+    assert stats['p95'] == 0.95
+    assert stats['p99'] == 0.99
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_session_metrics(protocol, tmp_path, request):
+    server = request.getfixturevalue(protocol + '_server')
+    cls = ska_ftp.SFTP if protocol == 'sftp' else ska_ftp.FTP
+    agg = Aggregator()
+    jsonl = tmp_path / 'metrics.jsonl'
+    sink = JSONLinesSink(str(jsonl))
+    session = cls(server.host, server.user, server.passwd, port=server.port,
+                  metrics=MultiSink(agg, sink))
+    local = tmp_path / 'data.dat'
+    local.write_bytes(b'x' * 5000)
+
+    session.put(str(local), '/data.dat')
+    session.get('/data.dat', str(tmp_path / 'copy.dat'))
+    session.ls('/')
+    with pytest.raises(Exception):
+        session.delete('/missing.dat')
+    session.close()
+    sink.close()
+
+    summary = agg.summary()
+    for op in ('connect', 'login', 'put', 'get', 'ls', 'delete'):
+        assert summary[server.host, op]['count'] >= 1
+    assert summary[server.host, 'put']['bytes'] == 5000
+    assert summary[server.host, 'get']['bytes'] == 5000
+    assert summary[server.host, 'delete']['errors'] == 1
+
+    records = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert records[0]['op'] == 'connect'
+    assert records[0]['protocol'] == protocol
+    assert any(rec['op'] == 'get' and rec['nbytes'] == 5000 for rec in records)
@@ -0,0 +1,80 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import socket
+import contextlib
+
+import pytest
+
+import ska_ftp
+from ska_ftp import multihost
+
+
+def write_netrc(path, server):
+    path.write_text('machine {} login {} password {}\n'
+                    .format(server.host, server.user, server.passwd))
+    return str(path)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_publish(protocol, tmp_path):
+    pytest.importorskip('paramiko' if protocol == 'sftp' else 'pyftpdlib')
+    from .servers import SFTPServer, FTPServer
+    server_cls = SFTPServer if protocol == 'sftp' else FTPServer
+
+    data = {'a.dat': os.urandom(3 * 2 ** 20 + 17), 'b.dat': b'', 'c.dat': b'small'}
+    local = tmp_path / 'local'
+    local.mkdir()
+    for name, contents in data.items():
+        (local / name).write_bytes(contents)
+    files = [str(local / 'a.dat'), str(local / 'b.dat'), (str(local / 'c.dat'), 'sub/c2.dat')]
+
+    with contextlib.ExitStack() as stack:
+        servers = []
+        for ii in range(3):
+            root = tmp_path / 'remote{}'.format(ii)
+            root.mkdir()
+            servers.append(stack.enter_context(server_cls(root)))
+        # Existing file is replaced
+        (tmp_path / 'remote0' / 'pub').mkdir()
+        (tmp_path / 'remote0' / 'pub' / 'a.dat').write_bytes(b'old')
+        netrcfile = write_netrc(tmp_path / 'netrc', servers[0])
+
+        hosts = ['{}:{}'.format(server.host, server.port) for server in servers]
+        # Nothing listening on this port
+        hosts.insert(1, '127.0.0.1:{}'.format(free_port()))
+        report = ska_ftp.publish(files, hosts, '/pub', protocol=protocol, netrcfile=netrcfile,
+                                 block_size=2 ** 18, queue_size=2)
+
+    assert [result.item for result in report] == hosts
+    assert [result.ok for result in report] == [True, False, True, True]
+    for ii in range(3):
+        pub = tmp_path / 'remote{}'.format(ii) / 'pub'
+        assert sorted(os.listdir(str(pub))) == ['a.dat', 'b.dat', 'sub']
+        assert (pub / 'a.dat').read_bytes() == data['a.dat']
+        assert (pub / 'b.dat').read_bytes() == b''
+        assert os.listdir(str(pub / 'sub')) == ['c2.dat']
+        assert (pub / 'sub' / 'c2.dat').read_bytes() == b'small'
+    assert report[0].value == ['/pub/a.dat', '/pub/b.dat', '/pub/sub/c2.dat']
+
+
+def test_publish_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ska_ftp.publish([str(tmp_path / 'missing.dat')], ['127.0.0.1'], '/pub')
+
+
+def test_publish_cli(tmp_path, ftp_server, capsys):
+    (tmp_path / 'local.dat').write_bytes(b'data')
+    netrcfile = write_netrc(tmp_path / 'netrc', ftp_server)
+    host = '{}:{}'.format(ftp_server.host, ftp_server.port)
+
+    status = multihost.main([str(tmp_path / 'local.dat'), '--host', host, '--remote-dir', '/pub',
+                             '--protocol', 'ftp', '--netrc', netrcfile])
+    assert status == 0
+    assert capsys.readouterr().out == '{}: published 1 files\n'.format(host)
+    assert (tmp_path / 'remote' / 'pub' / 'local.dat').read_bytes() == b'data'
@@ -0,0 +1,106 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+
+import pytest
+
+import ska_ftp
+
+
+def make_files(tmp_path, n_files=10):
+    local = tmp_path / 'local'
+    local.mkdir()
+    files = []
+    for ii in range(n_files):
+        path = local / 'file{}.dat'.format(ii)
+        path.write_bytes(bytes([ii]) * (1000 + ii))
+        files.append(path)
+    return files
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_put_get_many(protocol, tmp_path, request):
+    server = request.getfixturevalue(protocol + '_server')
+    cls = ska_ftp.SFTP if protocol == 'sftp' else ska_ftp.FTP
+    session = cls(server.host, server.user, server.passwd, port=server.port)
+    files = make_files(tmp_path)
+
+    progress = []
+    pairs = [(path, '/' + path.name) for path in files]
+    pairs.append((tmp_path / 'does-not-exist', '/does-not-exist'))
+    report = session.put_many(pairs, workers=3,
+                              progress=lambda *args: progress.append(args))
+    assert not report.ok
+    assert [result.item for result in report] == pairs
+    assert len(report.failed) == 1
+    assert report.failed[0].item[0].name == 'does-not-exist'
+    assert sorted(session.ls('/')) == sorted(path.name for path in files)
+    assert progress[-1] == (sum(path.stat().st_size for path in files), 10, 11)
+
+    out = tmp_path / 'out'
+    out.mkdir()
+    report = session.get_many([('/' + path.name, out / path.name) for path in files],
+                              workers=3)
+    assert report.ok
+    for path in files:
+        assert (out / path.name).read_bytes() == path.read_bytes()
+
+    # Original session is still usable
+    assert session.is_alive()
+    session.close()
+
+
+@pytest.mark.parametrize('block_size,max_requests', [(None, None), (4096, 1), (65536, 8)])
+def test_sftp_get_put_tuning(block_size, max_requests, sftp_server, tmp_path):
+    sftp = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                        port=sftp_server.port, window_size=4 * 2 ** 20)
+    local = tmp_path / 'local.dat'
+    data = os.urandom(3 * 2 ** 20 + 123)
+    local.write_bytes(data)
+    calls = []
+    sftp.put(local, '/remote.dat', block_size=block_size,
+             callback=lambda size, total: calls.append((size, total)))
+    assert calls[-1] == (len(data), len(data))
+    sftp.get('/remote.dat', tmp_path / 'out.dat', block_size=block_size,
+             max_requests=max_requests)
+    assert (tmp_path / 'out.dat').read_bytes() == data
+    sftp.close()
+
+
+def test_sftp_tuning():
+    assert ska_ftp.sftp_tuning(1000) == (32768, 1)
+    assert ska_ftp.sftp_tuning(10 * 2 ** 20) == (65536, 64)
+    assert ska_ftp.sftp_tuning(2 ** 30) == (65536, 256)
+    assert ska_ftp.sftp_tuning(2 ** 30, 4096, 8) == (4096, 8)
+
+
+@pytest.mark.parametrize('segments', [2, 5])
+def test_sftp_segmented(segments, sftp_server, tmp_path):
+    sftp = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                        port=sftp_server.port)
+    local = tmp_path / 'local.dat'
+    data = os.urandom(7 * 2 ** 20 + 12345)
+    local.write_bytes(data)
+
+    calls = []
+    sftp.put(local, '/remote.dat', segments=segments,
+             callback=lambda size, total: calls.append((size, total)))
+    assert calls[-1] == (len(data), len(data))
+    assert (tmp_path / 'remote' / 'remote.dat').read_bytes() == data
+
+    out = tmp_path / 'out.dat'
+    sftp.get('/remote.dat', out, segments=segments)
+    assert out.read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ['local.dat', 'out.dat', 'remote']
+
+    # Failure leaves no partial local file
+    with pytest.raises(IOError):
+        sftp.get('/does-not-exist', tmp_path / 'missing.dat', segments=segments)
+    assert sorted(os.listdir(tmp_path)) == ['local.dat', 'out.dat', 'remote']
+    sftp.close()
+
+
+def test_split_ranges():
+    from ska_ftp.ftp import _split_ranges
+    assert _split_ranges(10, 4) == [(0, 10)]
+    assert _split_ranges(10, 4, min_length=2) == [(0, 3), (3, 3), (6, 2), (8, 2)]
+    assert _split_ranges(0, 4) == [(0, 0)]
@@ -0,0 +1,144 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import threading
+
+import pytest
+
+import ska_ftp
+from ska_ftp import pool as ska_pool
+
+
+class FakeSession(object):
+    created = []
+
+    def __init__(self, host, user=None, passwd=None, port=None, netrcfile=None,
+                 logger=None):
+        self.host = host
+        self.user = user
+        self.port = port
+        self.alive = True
+        self.closed = False
+        self.cwd = None
+        FakeSession.created.append(self)
+
+    def _cwd(self):
+        return self.cwd
+
+    def cd(self, dirname):
+        self.cwd = dirname
+
+    def is_alive(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture()
+def fake_pool(monkeypatch):
+    FakeSession.created = []
+    monkeypatch.setattr(ska_pool, 'PROTOCOLS', {'sftp': (FakeSession, 22)})
+    return ska_ftp.SessionPool(max_per_host=2, idle_timeout=300)
+
+
+def test_pool_reuse(fake_pool):
+    with fake_pool.session('host', user='user', passwd='passwd') as s1:
+        pass
+    with fake_pool.session('host', user='user', passwd='passwd') as s2:
+        pass
+    assert s1 is s2
+    assert len(FakeSession.created) == 1
+
+    # Different user is a different key
+    with fake_pool.session('host', user='other', passwd='passwd') as s3:
+        pass
+    assert s3 is not s1
+
+
+def test_pool_dead_session_replaced(fake_pool):
+    with fake_pool.session('host', user='user', passwd='passwd') as s1:
+        pass
+    s1.alive = False
+    with fake_pool.session('host', user='user', passwd='passwd') as s2:
+        pass
+    assert s2 is not s1
+    assert s1.closed
+
+
+def test_pool_idle_timeout(fake_pool):
+    fake_pool.idle_timeout = 0
+    with fake_pool.session('host', user='user', passwd='passwd') as s1:
+        pass
+    fake_pool.prune()
+    assert s1.closed
+
+
+def test_pool_error_discards_session(fake_pool):
+    with pytest.raises(ZeroDivisionError):
+        with fake_pool.session('host', user='user', passwd='passwd') as s1:
+            1 / 0
+    assert s1.closed
+
+
+def test_pool_max_per_host(fake_pool):
+    fake_pool.acquire_timeout = 0.1
+    with fake_pool.session('host', user='user', passwd='passwd'):
+        with fake_pool.session('host', user='user', passwd='passwd'):
+            with pytest.raises(TimeoutError):
+                with fake_pool.session('host', user='user', passwd='passwd'):
+                    pass
+
+    # Waiting thread gets the session when it is released
+    fake_pool.acquire_timeout = None
+    got = []
+    with fake_pool.session('host', user='user', passwd='passwd'):
+        with fake_pool.session('host', user='user', passwd='passwd') as s2:
+            def worker():
+                with fake_pool.session('host', user='user', passwd='passwd') as s3:
+                    got.append(s3)
+            thread = threading.Thread(target=worker)
+            thread.start()
+        thread.join()
+    assert got == [s2]
+    assert len(FakeSession.created) == 2
+
+    fake_pool.close()
+    assert all(session.closed for session in FakeSession.created)
+
+
+def test_pool_closes_connections(sftp_server):
+    pool = ska_ftp.SessionPool(max_per_host=2, idle_timeout=300)
+    kwargs = dict(user=sftp_server.user, passwd=sftp_server.passwd, port=sftp_server.port)
+    with pool.session(sftp_server.host, **kwargs) as s1:
+        with pool.session(sftp_server.host, **kwargs) as s2:
+            transports = [session.ftp.get_channel().get_transport() for session in (s1, s2)]
+
+    # A clone closes only its channel
+    clone = s1._clone()
+    clone.close()
+    assert transports[0].is_active()
+
+    pool.idle_timeout = 0
+    pool.prune()
+    assert not any(transport.is_active() for transport in transports)
+
+    pool.idle_timeout = 300
+    with pool.session(sftp_server.host, **kwargs) as s3:
+        transport = s3.ftp.get_channel().get_transport()
+    pool.close()
+    assert not transport.is_active()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_pool_restores_directory(protocol, tmp_path, request):
+    server = request.getfixturevalue(protocol + '_server')
+    (tmp_path / 'remote' / 'a').mkdir()
+    (tmp_path / 'remote' / 'a' / 'x.dat').write_bytes(b'x')
+    (tmp_path / 'remote' / 'b.dat').write_bytes(b'b')
+    kwargs = dict(user=server.user, passwd=server.passwd, port=server.port, protocol=protocol)
+    with ska_ftp.SessionPool(max_per_host=1) as pool:
+        with pool.session(server.host, **kwargs) as s1:
+            s1.cd('/a')
+            assert s1.ls() == ['x.dat']
+        with pool.session(server.host, **kwargs) as s2:
+            assert s2 is s1
+            assert sorted(s2.ls()) == ['a', 'b.dat']
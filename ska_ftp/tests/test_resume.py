@@ -0,0 +1,107 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+
+import pytest
+
+import ska_ftp
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('corrupt', [False, True])
+def test_resume_put(protocol, corrupt, tmp_path, get_session):
+    session = get_session(protocol)
+    data = os.urandom(300000)
+    local = tmp_path / 'local.dat'
+    local.write_bytes(data)
+    remote = tmp_path / 'remote'
+
+    # Interrupted upload left a partial file
+    partial = bytearray(data[:100000])
+    if corrupt:
+        partial[-10] ^= 0xff
+    (remote / 'data.dat.part').write_bytes(partial)
+
+    calls = []
+    session.put(str(local), '/data.dat', resume=True, resume_check=1000,
+                callback=lambda size, total: calls.append((size, total)))
+    assert (remote / 'data.dat').read_bytes() == data
+    assert not (remote / 'data.dat.part').exists()
+    assert calls[-1] == (len(data), len(data))
+    if not corrupt:
+        # Only the remainder was sent
+        assert calls[0][0] > 100000
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('direction', ['get', 'put'])
+def test_resume_stale_part(protocol, direction, tmp_path, get_session):
+    # Resume implied by a retry policy checks the tail of an old .part file
+    session = get_session(protocol, retry=ska_ftp.retry.RetryPolicy(backoff=0.01))
+    data = os.urandom(300000)
+    stale = os.urandom(100000)
+    if direction == 'put':
+        (tmp_path / 'local.dat').write_bytes(data)
+        (tmp_path / 'remote' / 'data.dat.part').write_bytes(stale)
+        session.put(str(tmp_path / 'local.dat'), '/data.dat')
+        assert (tmp_path / 'remote' / 'data.dat').read_bytes() == data
+    else:
+        (tmp_path / 'remote' / 'data.dat').write_bytes(data)
+        (tmp_path / 'local.dat.part').write_bytes(stale)
+        session.get('/data.dat', str(tmp_path / 'local.dat'))
+        assert (tmp_path / 'local.dat').read_bytes() == data
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_resume_put_checked_before_rename(protocol, tmp_path, get_session, monkeypatch):
+    session = get_session(protocol)
+    data = os.urandom(300000)
+    local = tmp_path / 'local.dat'
+    local.write_bytes(data)
+    remote = tmp_path / 'remote'
+    (remote / 'data.dat.part').write_bytes(data[:100000])
+
+    # The checksum is compared on the partial file, which is then removed so
+    # that the next attempt does not resume from bad data
+    hashed = []
+
+    def remote_hash(path, algorithm):
+        hashed.append(path)
+        return b'bad'
+
+    monkeypatch.setattr(session, '_remote_hash', remote_hash)
+    with pytest.raises(ska_ftp.verify.ChecksumError):
+        session.put(str(local), '/data.dat', resume=True, verify='md5')
+    assert hashed == ['/data.dat.part']
+    assert os.listdir(str(remote)) == []
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('corrupt', [False, True])
+def test_resume_get(protocol, corrupt, tmp_path, get_session):
+    session = get_session(protocol)
+    data = os.urandom(300000)
+    (tmp_path / 'remote' / 'data.dat').write_bytes(data)
+    local = tmp_path / 'local.dat'
+
+    partial = bytearray(data[:100000])
+    if corrupt:
+        partial[-10] ^= 0xff
+    (tmp_path / 'local.dat.part').write_bytes(partial)
+
+    calls = []
+    session.get('/data.dat', str(local), resume=True, resume_check=1000,
+                callback=lambda size, total: calls.append((size, total)))
+    assert local.read_bytes() == data
+    assert not (tmp_path / 'local.dat.part').exists()
+    assert calls[-1] == (len(data), len(data))
+    if not corrupt:
+        assert calls[0][0] > 100000
+
+    # Resume with no partial file is a normal transfer
+    local.unlink()
+    session.get('/data.dat', str(local), resume=True)
+    assert local.read_bytes() == data
+    session.close()
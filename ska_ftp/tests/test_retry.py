@@ -0,0 +1,91 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import socket
+
+import pytest
+
+import ska_ftp
+from ska_ftp.retry import RetryPolicy
+
+
+def drop_connection(session):
+    if isinstance(session, ska_ftp.SFTP):
+        session.ftp.get_channel().get_transport().close()
+    else:
+        session.sock.shutdown(socket.SHUT_RDWR)
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(backoff=1.0, max_backoff=5.0, jitter=0.5)
+    for attempt, base in [(1, 1.0), (2, 2.0), (3, 4.0), (10, 5.0)]:
+        delay = policy.delay(attempt)
+        assert base * 0.5 <= delay <= base
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_reconnect(protocol, tmp_path, get_session):
+    session = get_session(protocol, retry=RetryPolicy(backoff=0.01))
+    remote = tmp_path / 'remote'
+    (remote / 'sub').mkdir()
+    (remote / 'sub' / 'a.dat').write_bytes(b'a')
+    session.cd('/sub')
+
+    drop_connection(session)
+    assert session.ls() == ['a.dat']
+
+    # Real failures are not retried
+    with pytest.raises(Exception):
+        session.delete('missing.dat')
+    assert session._retries == 0
+
+    # Without a policy the error propagates
+    session.retry = None
+    drop_connection(session)
+    with pytest.raises(Exception):
+        session.ls()
+    session.close()
+
+
+def test_reconnect_clone(tmp_path, ftp_server):
+    # Connections used by the *_many() methods return to their own directory
+    session = ska_ftp.FTP(ftp_server.host, ftp_server.user, ftp_server.passwd,
+                          port=ftp_server.port, retry=RetryPolicy(backoff=0.01))
+    remote = tmp_path / 'remote'
+    (remote / 'sub').mkdir()
+    (remote / 'sub' / 'a.dat').write_bytes(b'a')
+    session.cd('/sub')
+
+    clone = session._clone(session._cwd())
+    drop_connection(clone)
+    assert clone.ls() == ['a.dat']
+    clone.close()
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('direction', ['get', 'put'])
+def test_retry_resumes_transfer(protocol, direction, tmp_path, get_session):
+    session = get_session(protocol, retry=RetryPolicy(backoff=0.01))
+    data = os.urandom(500000)
+    if direction == 'get':
+        (tmp_path / 'remote' / 'data.dat').write_bytes(data)
+        args = ('/data.dat', str(tmp_path / 'data.dat'))
+    else:
+        (tmp_path / 'data.dat').write_bytes(data)
+        args = (str(tmp_path / 'data.dat'), '/data.dat')
+
+    calls = []
+
+    def callback(size, total):
+        calls.append(size)
+        if len(calls) == 3:
+            raise ConnectionResetError('simulated drop')
+
+    getattr(session, direction)(*args, callback=callback)
+    assert (tmp_path / 'remote' / 'data.dat').read_bytes() == data
+    assert (tmp_path / 'data.dat').read_bytes() == data
+    assert session._retries == 1
+    # The retry continued from the interrupted offset
+    restart = calls[3]
+    assert restart > calls[0]
+    session.close()
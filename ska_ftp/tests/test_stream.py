@@ -0,0 +1,44 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import gzip
+
+import pytest
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_open_stream_read(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    data = os.urandom(300000)
+    (tmp_path / 'remote' / 'data.dat').write_bytes(data)
+    lines = b'line 1\nline 2\nline 3\n'
+    (tmp_path / 'remote' / 'lines.txt.gz').write_bytes(gzip.compress(lines))
+
+    with session.open_stream('/data.dat') as fh:
+        assert fh.read(10) == data[:10]
+        buf = bytearray(200000)
+        assert fh.readinto(buf) == len(buf)
+        assert buf == data[10:200010]
+        assert b''.join(fh.chunks(30000)) == data[200010:]
+
+    with session.open_stream('/lines.txt.gz') as fh:
+        assert list(gzip.GzipFile(fileobj=fh)) == lines.splitlines(keepends=True)
+
+    # Stopping early leaves the session usable
+    with session.open_stream('/data.dat') as fh:
+        fh.read(100)
+    assert 'data.dat' in session.ls('/')
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_open_stream_write(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    data = os.urandom(300000)
+    with session.open_stream('/out.dat', 'wb') as fh:
+        for ii in range(0, len(data), 7000):
+            fh.write(data[ii:ii + 7000])
+    assert (tmp_path / 'remote' / 'out.dat').read_bytes() == data
+
+    with pytest.raises(ValueError):
+        session.open_stream('/out.dat', 'r')
+    session.close()
@@ -0,0 +1,75 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+
+import pytest
+
+import ska_ftp
+
+
+def make_tree(root):
+    for relpath in ['a.dat', 'sub/b.dat', 'sub/deeper/c.dat']:
+        path = root / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(1000))
+
+
+def tree_contents(root):
+    out = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            out[os.path.relpath(path, root)] = open(path, 'rb').read()
+    return out
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('direction', ['down', 'up'])
+def test_sync_dir(protocol, direction, tmp_path, get_session):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote' / 'tree'
+    remote.mkdir()
+    local = tmp_path / 'local'
+    local.mkdir()
+    src, dst = (remote, local) if direction == 'down' else (local, remote)
+    make_tree(src)
+
+    summary = session.sync_dir('/tree', local, direction=direction)
+    assert sorted(summary.transferred) == ['a.dat', 'sub/b.dat', 'sub/deeper/c.dat']
+    assert sorted(summary.created_dirs) == ['sub', 'sub/deeper']
+    assert tree_contents(dst) == tree_contents(src)
+
+    # Nothing to do the second time
+    summary = session.sync_dir('/tree', local, direction=direction)
+    assert summary.transferred == []
+    assert summary.unchanged == 3
+
+    # Change one file, add one, remove one
+    (src / 'a.dat').write_bytes(b'changed')
+    (src / 'new.dat').write_bytes(b'new')
+    (src / 'sub' / 'deeper' / 'c.dat').unlink()
+    (src / 'sub' / 'deeper').rmdir()
+    summary = session.sync_dir('/tree', local, direction=direction, delete=True)
+    assert sorted(summary.transferred) == ['a.dat', 'new.dat']
+    assert sorted(summary.deleted) == ['sub/deeper', 'sub/deeper/c.dat']
+    assert summary.unchanged == 1
+    assert tree_contents(dst) == tree_contents(src)
+    assert not (dst / 'sub' / 'deeper').exists()
+    session.close()
+
+
+def test_sync_dir_checksum(sftp_server, tmp_path):
+    session = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                           port=sftp_server.port)
+    remote = tmp_path / 'remote'
+    local = tmp_path / 'local'
+    make_tree(remote)
+    session.sync_dir('/', local)
+
+    # Same size and older mtime but different content is detected by checksum
+    path = local / 'a.dat'
+    path.write_bytes(os.urandom(1000))
+    os.utime(path, (0, 0))
+    summary = session.sync_dir('/', local, direction='up', checksum=True)
+    assert summary.transferred == ['a.dat']
+    assert tree_contents(remote) == tree_contents(local)
+    session.close()
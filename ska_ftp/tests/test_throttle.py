@@ -0,0 +1,112 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import time
+import threading
+
+import pytest
+
+import ska_ftp
+from ska_ftp import throttle
+
+
+def test_token_bucket_rate():
+    bucket = throttle.TokenBucket(2e6)
+    t0 = time.monotonic()
+    for _ in range(20):
+        bucket.consume(50000)
+    # 1 MB at 2 MB/s, less the initial burst and the last block
+    assert 0.35 < time.monotonic() - t0 < 1.0
+
+    with pytest.raises(ValueError):
+        throttle.TokenBucket(0)
+
+
+def test_token_bucket_priority():
+    bucket = throttle.TokenBucket(1e6, burst=0)
+    done = {}
+
+    def consume(name, n_blocks, priority):
+        for _ in range(n_blocks):
+            bucket.consume(20000, priority)
+        done[name] = time.monotonic()
+
+    low = threading.Thread(target=consume, args=('low', 30, throttle.LOW))
+    high = threading.Thread(target=consume, args=('high', 10, throttle.HIGH))
+    t0 = time.monotonic()
+    low.start()
+    time.sleep(0.05)
+    high.start()
+    low.join()
+    high.join()
+    # High priority blocks go first once they are waiting
+    assert done['high'] - t0 < 0.35
+    assert done['low'] - t0 > 0.55
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_transfer_rate_limit(protocol, tmp_path, get_session):
+    data = os.urandom(2 ** 20)
+    (tmp_path / 'local.dat').write_bytes(data)
+
+    session = get_session(protocol)
+    t0 = time.monotonic()
+    session.put(str(tmp_path / 'local.dat'), '/data.dat', rate_limit=2 ** 21)
+    # 1 MB at 2 MB/s less the initial burst
+    assert time.monotonic() - t0 > 0.3
+    assert (tmp_path / 'remote' / 'data.dat').read_bytes() == data
+
+    # Unlimited afterwards
+    t0 = time.monotonic()
+    session.get('/data.dat', str(tmp_path / 'out.dat'))
+    assert time.monotonic() - t0 < 0.3
+    session.close()
+
+    # Session limit
+    session = get_session(protocol, rate_limit=2 ** 21)
+    t0 = time.monotonic()
+    session.get('/data.dat', str(tmp_path / 'out.dat'))
+    assert time.monotonic() - t0 > 0.3
+    assert (tmp_path / 'out.dat').read_bytes() == data
+    session.close()
+
+
+def test_process_rate_limit(tmp_path, sftp_server):
+    session = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                           port=sftp_server.port)
+    (tmp_path / 'remote' / 'data.dat').write_bytes(os.urandom(2 ** 20))
+    throttle.set_process_limit(2 ** 21)
+    try:
+        t0 = time.monotonic()
+        session.get('/data.dat', str(tmp_path / 'out.dat'), segments=2)
+        assert time.monotonic() - t0 > 0.3
+    finally:
+        throttle.set_process_limit(None)
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_put_many_priority(protocol, tmp_path, get_session, monkeypatch):
+    session = get_session(protocol)
+    names = ['big1.dat', 'urgent1.dat', 'big2.dat', 'urgent2.dat']
+    for name in names:
+        (tmp_path / name).write_bytes(name.encode('ascii'))
+    pairs = [(str(tmp_path / name), '/' + name) for name in names]
+
+    calls = []
+    put = session.put
+
+    def recording_put(localfile, remotefile, **kwargs):
+        calls.append((remotefile, kwargs['priority']))
+        return put(localfile, remotefile, **kwargs)
+
+    monkeypatch.setattr(session, 'put', recording_put)
+
+    def priority(pair):
+        return throttle.HIGH if 'urgent' in pair[1] else throttle.LOW
+
+    report = session.put_many(pairs, workers=1, priority=priority)
+    assert report.ok
+    assert [result.item for result in report] == pairs
+    assert calls == [('/urgent1.dat', throttle.HIGH), ('/urgent2.dat', throttle.HIGH),
+                     ('/big1.dat', throttle.LOW), ('/big2.dat', throttle.LOW)]
+    session.close()
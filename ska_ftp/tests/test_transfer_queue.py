@@ -0,0 +1,134 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import subprocess
+
+import pytest
+
+from ska_ftp import transfer_queue
+from ska_ftp.transfer_queue import TransferQueue, run_worker
+
+
+def get_host(server, tmp_path):
+    netrcfile = tmp_path / 'netrc'
+    netrcfile.write_text('machine {} login {} password {}\n'
+                         .format(server.host, server.user, server.passwd))
+    os.chmod(str(netrcfile), 0o600)
+    return '{}:{}'.format(server.host, server.port), str(netrcfile)
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_transfer_queue(protocol, tmp_path, request):
+    host, netrcfile = get_host(request.getfixturevalue(protocol + '_server'), tmp_path)
+    remote = tmp_path / 'remote'
+    (tmp_path / 'local').mkdir()
+    names = ['file{}.dat'.format(ii) for ii in range(6)]
+    for name in names:
+        (tmp_path / 'local' / name).write_bytes(name.encode('ascii') * 1000)
+        (remote / ('r_' + name)).write_bytes(name.encode('ascii'))
+
+    queue = TransferQueue(tmp_path / 'queue.db')
+    ids = queue.put(host, [(str(tmp_path / 'local' / name), '/' + name) for name in names],
+                    protocol=protocol)
+    queue.get(host, [('/r_' + name, str(tmp_path / ('r_' + name))) for name in names]
+              + [('/missing.dat', str(tmp_path / 'missing.dat'))], protocol=protocol)
+    assert queue.counts()['pending'] == 13
+
+    counts = run_worker(queue, sessions_per_host=3, netrcfile=netrcfile)
+    assert counts == {'done': 12, 'failed': 1}
+    for name in names:
+        assert (remote / name).read_bytes() == name.encode('ascii') * 1000
+        assert (tmp_path / ('r_' + name)).read_bytes() == name.encode('ascii')
+    item = queue.items('done')[0]
+    assert item['id'] == ids[0] and item['size'] == 9000 and item['elapsed'] > 0
+    failed = queue.items('failed')
+    assert [item['remotefile'] for item in failed] == ['/missing.dat']
+
+    # Nothing is sent again, and failed items can be retried
+    (remote / 'missing.dat').write_bytes(b'found')
+    assert queue.retry() == 1
+    assert run_worker(queue, netrcfile=netrcfile) == {'done': 1, 'failed': 0}
+    assert queue.counts() == {'pending': 0, 'running': 0, 'done': 13, 'failed': 0}
+    queue.close()
+
+
+def test_transfer_queue_recover(tmp_path, sftp_server):
+    host, netrcfile = get_host(sftp_server, tmp_path)
+    data = os.urandom(300000)
+    (tmp_path / 'local.dat').write_bytes(data)
+    queue = TransferQueue(tmp_path / 'queue.db')
+    queue.put(host, [(str(tmp_path / 'local.dat'), '/data.dat')])
+
+    # A worker process died during the upload, leaving a partial file
+    proc = subprocess.Popen(['true'])
+    proc.wait()
+    queue._claim('sftp', host)
+    queue._db.execute('UPDATE transfers SET worker = ?', (proc.pid,))
+    (tmp_path / 'remote' / 'data.dat.part').write_bytes(data[:100000])
+
+    assert run_worker(queue, netrcfile=netrcfile) == {'done': 1, 'failed': 0}
+    assert (tmp_path / 'remote' / 'data.dat').read_bytes() == data
+    assert queue.items()[0]['attempts'] == 2
+    queue.close()
+
+
+def test_worker_identity(tmp_path, monkeypatch):
+    worker = transfer_queue._worker_id()
+    assert transfer_queue._worker_alive(worker)
+    assert worker.split(':')[1] == str(os.getpid())
+
+    proc = subprocess.Popen(['true'])
+    proc.wait()
+    assert transfer_queue._worker_id(proc.pid) in (None, ':{}:'.format(proc.pid))
+    assert not transfer_queue._worker_alive(proc.pid)
+
+    if os.path.exists('/proc/self/stat'):
+        # This pid, but reused by a different process, or from before a reboot
+        boot_id, pid, start = worker.split(':')
+        assert not transfer_queue._worker_alive(':'.join([boot_id, pid, start + '1']))
+        assert not transfer_queue._worker_alive(':'.join(['other', pid, start]))
+
+    queue = TransferQueue(tmp_path / 'queue.db')
+    ids = queue.put('lucky', ['/a.dat', '/b.dat'])
+    queue._claim('sftp', 'lucky')
+    queue._claim('sftp', 'lucky')
+    monkeypatch.setattr(transfer_queue, '_boot_id', lambda: 'rebooted')
+    assert queue.recover() == 2
+    monkeypatch.undo()
+
+    # Items of a live worker are only returned with force
+    queue._claim('sftp', 'lucky')
+    assert queue.recover() == 0
+    assert queue.retry(ids[:1]) == 0
+    assert queue.retry(ids[:1], force=True) == 1
+    queue._claim('sftp', 'lucky')
+    assert queue.retry(force=True) == 1
+    assert queue.counts()['pending'] == 2
+    queue.close()
+
+
+def test_cli(tmp_path, capsys):
+    queuefile = str(tmp_path / 'queue.db')
+    (tmp_path / 'a.dat').write_bytes(b'a')
+    transfer_queue.main(['--queue', queuefile, 'enqueue', 'put', 'lucky:2222', '/pub',
+                         str(tmp_path / 'a.dat')])
+    transfer_queue.main(['--queue', queuefile, 'enqueue', 'get', 'lucky', str(tmp_path),
+                         '/pub/b.dat', '--protocol', 'ftp'])
+    transfer_queue.main(['--queue', queuefile, 'status', '--state', 'pending'])
+    out = capsys.readouterr().out
+    assert 'pending  2' in out
+    assert '/pub/a.dat' in out and str(tmp_path / 'b.dat') in out
+
+    with TransferQueue(queuefile) as queue:
+        items = queue.items()
+        assert [item['protocol'] for item in items] == ['sftp', 'ftp']
+        queue._claim('sftp', 'lucky:2222')
+        queue._fail(items[0]['id'], 'error', 0.0)
+    transfer_queue.main(['--queue', queuefile, 'retry', str(items[0]['id'])])
+    assert 'Returned 1 items' in capsys.readouterr().out
+
+    with TransferQueue(queuefile) as queue:
+        queue._claim('sftp', 'lucky:2222')
+    transfer_queue.main(['--queue', queuefile, 'retry', str(items[0]['id'])])
+    assert 'Returned 0 items' in capsys.readouterr().out
+    transfer_queue.main(['--queue', queuefile, 'retry', '--force', str(items[0]['id'])])
+    assert 'Returned 1 items' in capsys.readouterr().out
@@ -0,0 +1,77 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+import hashlib
+
+import pytest
+
+from ska_ftp.verify import ChecksumError
+
+
+def write_sidecar(path, digest):
+    path.write_text('{}  {}\n'.format(digest, path.stem))
+
+
+def test_sftp_server_hash(tmp_path, get_session):
+    """md5 is compared to the hash from the server check-file extension"""
+    session = get_session('sftp')
+    # paramiko's server check-file does not handle files over 64 kB
+    data = os.urandom(50000)
+    local = tmp_path / 'local.dat'
+    local.write_bytes(data)
+    md5 = hashlib.md5(data).hexdigest()
+
+    assert session.put(str(local), '/data.dat', verify='md5') == md5
+    assert session.get('/data.dat', str(tmp_path / 'out.dat'), verify='md5') == md5
+    assert (tmp_path / 'out.dat').read_bytes() == data
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+@pytest.mark.parametrize('resume', [False, True])
+def test_sidecar_hash(protocol, resume, tmp_path, get_session):
+    """sha256 is not hashed by the test servers so the sidecar file is used"""
+    session = get_session(protocol)
+    data = os.urandom(300000)
+    sha256 = hashlib.sha256(data).hexdigest()
+    remote = tmp_path / 'remote'
+    (remote / 'data.dat').write_bytes(data)
+    write_sidecar(remote / 'data.dat.sha256', sha256)
+
+    out = tmp_path / 'out.dat'
+    if resume:
+        # Partial download from an earlier attempt is hashed before continuing
+        (tmp_path / 'out.dat.part').write_bytes(data[:100000])
+    assert session.get('/data.dat', str(out), resume=resume, verify='sha256') == sha256
+    assert out.read_bytes() == data
+
+    # Corrupt the remote file: the download is removed and ChecksumError raised
+    (remote / 'data.dat').write_bytes(data[:-1] + b'x')
+    with pytest.raises(ChecksumError):
+        session.get('/data.dat', str(out), verify='sha256')
+    assert not out.exists()
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_put_verify(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    data = os.urandom(200000)
+    local = tmp_path / 'local.dat'
+    local.write_bytes(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    # No remote hash: the digest is still returned
+    assert session.put(str(local), '/data.dat', verify='sha256') == sha256
+    assert session.put(str(local), '/data.dat') is None
+
+    write_sidecar(tmp_path / 'remote' / 'bad.dat.sha256', hashlib.sha256(b'x').hexdigest())
+    with pytest.raises(ChecksumError):
+        session.put(str(local), '/bad.dat', verify='sha256')
+
+    with pytest.raises(ValueError):
+        session.put(str(local), '/data.dat', verify='crc99')
+
+    report = session.put_many([(str(local), '/many.dat')], verify='sha256')
+    assert report.ok
+    assert report[0].value == sha256
+    session.close()
@@ -0,0 +1,91 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import os
+
+import pytest
+
+import ska_ftp
+
+
+def make_tree(root):
+    for obs in ('obs1', 'obs2', 'obs3'):
+        for day in ('2025365', '2026001', '2026002'):
+            path = root / 'data' / obs / day
+            path.mkdir(parents=True)
+            (path / 'evt.fits.gz').write_bytes(b'x')
+            (path / 'notes.txt').write_bytes(b'y')
+    (root / 'data' / 'README').write_bytes(b'z')
+    (root / 'data' / 'obs1' / 'deep' / 'deeper').mkdir(parents=True)
+    (root / 'data' / 'obs1' / 'deep' / 'deeper' / 'x.fits.gz').write_bytes(b'w')
+
+
+def local_walk(root):
+    out = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        reldir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        out.add((reldir, frozenset(dirnames), frozenset(filenames)))
+    return out
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_walk(protocol, workers, tmp_path, get_session):
+    session = get_session(protocol)
+    remote = tmp_path / 'remote'
+    make_tree(remote)
+
+    out = set()
+    seen = set()
+    for dirpath, dirnames, filenames in session.walk('/data', workers=workers):
+        reldir = os.path.relpath(dirpath, '/data')
+        # Parents are always yielded before their children
+        assert reldir == '.' or (os.path.dirname(reldir) or '.') in seen
+        seen.add(reldir)
+        out.add((reldir, frozenset(dirnames), frozenset(filenames)))
+    assert out == local_walk(remote / 'data')
+
+    # Pruning dirnames skips those subtrees
+    dirpaths = []
+    for dirpath, dirnames, filenames in session.walk('/data', workers=workers):
+        dirpaths.append(dirpath)
+        dirnames[:] = [name for name in dirnames if name != 'obs1']
+    assert len(dirpaths) == 9
+    assert not any('obs1' in dirpath for dirpath in dirpaths)
+
+    # Stopping early leaves the session usable
+    for _ in session.walk('/data', workers=workers):
+        break
+    assert session.ls('/') == ['data']
+    session.close()
+
+
+@pytest.mark.parametrize('protocol', ['sftp', 'ftp'])
+def test_glob(protocol, tmp_path, get_session):
+    session = get_session(protocol)
+    make_tree(tmp_path / 'remote')
+
+    assert sorted(session.glob('/data/*/2026*/*.fits.gz')) == [
+        '/data/{}/{}/evt.fits.gz'.format(obs, day)
+        for obs in ('obs1', 'obs2', 'obs3') for day in ('2026001', '2026002')]
+    assert sorted(session.glob('/data/obs2/*')) == [
+        '/data/obs2/2025365', '/data/obs2/2026001', '/data/obs2/2026002']
+    assert sorted(session.glob('/data/**/x.fits.gz')) == ['/data/obs1/deep/deeper/x.fits.gz']
+    assert len(list(session.glob('/data/**/*.fits.gz', workers=2))) == 10
+    assert list(session.glob('/data/README')) == ['/data/README']
+    assert list(session.glob('/data/missing/*')) == []
+
+    # Relative to the working directory
+    session.cd('/data')
+    assert sorted(session.glob('obs3/2025*')) == ['obs3/2025365']
+    assert sorted(session.glob('*/2025365/notes.txt')) == [
+        'obs1/2025365/notes.txt', 'obs2/2025365/notes.txt', 'obs3/2025365/notes.txt']
+    session.close()
+
+
+def test_walk_onerror(tmp_path, sftp_server):
+    session = ska_ftp.SFTP(sftp_server.host, sftp_server.user, sftp_server.passwd,
+                           port=sftp_server.port)
+    errors = []
+    assert list(session.walk('/missing', onerror=errors.append)) == []
+    assert len(errors) == 1
+    assert isinstance(errors[0], IOError)
+    session.close()
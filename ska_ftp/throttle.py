@@ -0,0 +1,99 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Bandwidth limits for transfers with token buckets.
+
+A limit can be set for a single ``get()`` or ``put()`` (``rate_limit=``), for
+a session and its clones (``rate_limit=`` of ``SFTP`` or ``FTP``) and for the
+whole process (``set_process_limit()``).  Every limit that applies is enforced
+as each block is transferred.
+
+Each transfer has a priority class (``HIGH``, ``NORMAL`` or ``LOW``).  When
+transfers wait on the same bucket a higher priority transfer is served
+first, so urgent files keep most of the bandwidth while a backfill runs.
+In ``put_many()`` and ``get_many()`` the priority also orders the queue of
+files.
+"""
+
+import time
+import threading
+
+__all__ = ['HIGH', 'NORMAL', 'LOW', 'TokenBucket', 'set_process_limit']
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+_process_bucket = None
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket that allows ``rate`` bytes per second on average.
+
+    ``consume()`` takes tokens as soon as the bucket is not in debt, so a block
+    larger than the available tokens is sent at once and the next caller waits
+    until the debt is paid off.  Callers with a higher priority class that are
+    waiting go first.
+
+    :param rate: average rate (bytes/sec)
+    :param burst: maximum tokens that accumulate while idle (default=rate / 10)
+    """
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.burst = self.rate / 10 if burst is None else float(burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._waiting = [0, 0, 0]
+        self._cond = threading.Condition()
+
+    def consume(self, nbytes, priority=NORMAL):
+        """Wait until ``nbytes`` can be sent.
+
+        :param nbytes: number of bytes
+        :param priority: priority class (HIGH, NORMAL or LOW)
+        """
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    ahead = any(self._waiting[:priority])
+                    if self._tokens >= 0 and not ahead:
+                        self._tokens -= nbytes
+                        return
+                    # Wait for the debt to be paid off, or for a notify when a
+                    # higher priority caller takes its tokens
+                    self._cond.wait(max(-self._tokens / self.rate, 0.001))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+
+def set_process_limit(rate, burst=None):
+    """Limit the total rate of all transfers in this process.
+
+    :param rate: average rate (bytes/sec), or None to remove the limit
+    :param burst: maximum tokens that accumulate while idle (default=rate / 10)
+    """
+    global _process_bucket
+    _process_bucket = None if rate is None else TokenBucket(rate, burst)
+
+
+def limiter(rate_limit, session_bucket, priority=NORMAL):
+    """Function ``consume(nbytes)`` for one transfer that applies the transfer,
+    session and process limits, or None if there is no limit.
+    """
+    buckets = [bucket for bucket in (None if rate_limit is None else TokenBucket(rate_limit),
+                                     session_bucket, _process_bucket)
+               if bucket is not None]
+    if not buckets:
+        return None
+
+    def consume(nbytes):
+        for bucket in buckets:
+            bucket.consume(nbytes, priority)
+
+    return consume
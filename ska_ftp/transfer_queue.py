@@ -0,0 +1,464 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Persistent transfer queue in a local SQLite journal, drained by a worker.
+
+Transfers are added to a ``TransferQueue`` and carried out by ``run_worker()``
+(or the ``ska_ftp_worker`` command), which uses ``sessions_per_host``
+concurrent sessions for each host.  Every state change is committed to the
+journal, so after a crash or reboot it is always known which files made it:
+each item is ``pending``, ``running``, ``done`` (with size and elapsed time)
+or ``failed`` (with the error).  On start the worker returns items left
+``running`` by a dead worker to ``pending``.  Workers are identified by boot
+id, pid and process start time, so a reused pid or a reboot is not mistaken
+for a live worker.  Transfers use ``resume=True``,
+so an interrupted file continues from its ``.part`` file instead of being
+sent again, after checking that the end of the ``.part`` file matches.
+
+The ``ska_ftp`` command enqueues transfers and shows or retries them::
+
+  ska_ftp enqueue put lucky /data/incoming *.fits
+  ska_ftp_worker --sessions-per-host 4
+  ska_ftp status --state failed
+  ska_ftp retry
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import posixpath
+import contextlib
+
+from .ftp import SFTP, FTP, RESUME_CHECK
+from .retry import RetryPolicy
+from .multihost import _split_port
+
+__all__ = ['TransferQueue', 'run_worker']
+
+PROTOCOLS = {'sftp': SFTP, 'ftp': FTP}
+
+STATES = ('pending', 'running', 'done', 'failed')
+
+DEFAULT_QUEUE = os.path.join('~', '.ska_ftp_queue.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    id INTEGER PRIMARY KEY,
+    direction TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    host TEXT NOT NULL,
+    localfile TEXT NOT NULL,
+    remotefile TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    size INTEGER,
+    elapsed REAL,
+    error TEXT,
+    enqueued REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS transfers_state ON transfers (state, protocol, host);
+"""
+
+
+def _boot_id():
+    """Id of the current boot (Linux), or '' if not available"""
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as fh:
+            return fh.read().strip()
+    except OSError:
+        return ''
+
+
+def _worker_id(pid=None):
+    """Identity of process ``pid`` (default=this process) that is not reused:
+    '<boot id>:<pid>:<start time>'.
+
+    Without /proc the boot id and start time are empty.
+
+    :returns: str, or None if the process does not exist
+    """
+    pid = os.getpid() if pid is None else pid
+    start = ''
+    if os.path.exists('/proc/self/stat'):
+        try:
+            with open('/proc/{}/stat'.format(pid)) as fh:
+                # Field 22, counted after the command name which may contain spaces
+                start = fh.read().rpartition(')')[2].split()[19]
+        except FileNotFoundError:
+            return None
+    return '{}:{}:{}'.format(_boot_id(), pid, start)
+
+
+def _worker_alive(worker):
+    """True if the process identified by ``worker`` (from ``_worker_id()``, or a
+    bare pid) may still be running
+    """
+    if worker is None:
+        return False
+    parts = str(worker).split(':')
+    boot_id, pid, start = parts if len(parts) == 3 else ('', parts[0], '')
+    pid = int(pid)
+    if boot_id and boot_id != _boot_id():
+        return False
+    if start:
+        return _worker_id(pid) == str(worker)
+    # Only the pid is known.  A process of another user cannot be checked, so
+    # assume it is alive (see retry(force=True)).
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TransferQueue(object):
+    """Queue of file transfers stored in an SQLite journal.
+
+    The queue can be shared by threads and by processes on the same machine,
+    e.g. the ``ska_ftp`` command adding transfers while a worker runs.
+
+    :param filename: SQLite database file name
+    """
+    def __init__(self, filename):
+        self.filename = str(filename)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.filename, timeout=60, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _enqueue(self, direction, host, items, protocol):
+        if protocol not in PROTOCOLS:
+            raise ValueError('protocol must be one of {}'.format(', '.join(sorted(PROTOCOLS))))
+        now = time.time()
+        ids = []
+        with self._transaction():
+            for localfile, remotefile in items:
+                cursor = self._db.execute(
+                    'INSERT INTO transfers (direction, protocol, host, localfile, '
+                    'remotefile, state, enqueued) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (direction, protocol, host, localfile, remotefile, 'pending', now))
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def put(self, host, pairs, protocol='sftp'):
+        """Add uploads to ``host``.
+
+        Each element of ``pairs`` is either ``localfile`` or a tuple
+        ``(localfile, remotefile)``.  Local file names are stored as absolute
+        paths, so use absolute remote file names too.
+
+        :param host: host name or ``host:port``
+        :param pairs: list of localfile or (localfile, remotefile)
+        :param protocol: 'sftp' (default) or 'ftp'
+        :returns: list of item ids
+        """
+        items = []
+        for pair in pairs:
+            localfile, remotefile = ((pair, None) if isinstance(pair, (str, os.PathLike))
+                                     else pair)
+            localfile = os.path.abspath(localfile)
+            items.append((localfile, remotefile or os.path.basename(localfile)))
+        return self._enqueue('put', host, items, protocol)
+
+    def get(self, host, pairs, protocol='sftp'):
+        """Add downloads from ``host``.
+
+        Each element of ``pairs`` is either ``remotefile`` or a tuple
+        ``(remotefile, localfile)``.
+
+        :param host: host name or ``host:port``
+        :param pairs: list of remotefile or (remotefile, localfile)
+        :param protocol: 'sftp' (default) or 'ftp'
+        :returns: list of item ids
+        """
+        items = []
+        for pair in pairs:
+            remotefile, localfile = ((pair, None) if isinstance(pair, (str, os.PathLike))
+                                     else pair)
+            localfile = os.path.abspath(localfile or posixpath.basename(remotefile))
+            items.append((localfile, remotefile))
+        return self._enqueue('get', host, items, protocol)
+
+    def counts(self):
+        """Number of items in each state.
+
+        :returns: dict of state: count
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT state, COUNT(*) FROM transfers GROUP BY state')
+            counts = dict(rows.fetchall())
+        return {state: counts.get(state, 0) for state in STATES}
+
+    def items(self, state=None):
+        """Items in the queue, optionally only those in ``state``.
+
+        :param state: 'pending', 'running', 'done' or 'failed' (default=all)
+        :returns: list of dict with the columns of the journal
+        """
+        query = 'SELECT * FROM transfers'
+        args = ()
+        if state is not None:
+            query += ' WHERE state = ?'
+            args = (state,)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query + ' ORDER BY id', args)]
+
+    def retry(self, ids=None, force=False):
+        """Return failed items (or the items ``ids`` that are not running) to pending.
+
+        Use ``force=True`` to also return running items, e.g. of a worker that
+        is stuck or cannot be checked because it runs on another machine.
+
+        :param ids: list of item ids (default=all failed items)
+        :param force: also return running items to pending (default=False)
+        :returns: number of items returned to pending
+        """
+        states = ('failed', 'running') if force else ('failed',)
+        with self._lock:
+            if ids is None:
+                cursor = self._db.execute(
+                    "UPDATE transfers SET state = 'pending', error = NULL, worker = NULL "
+                    "WHERE state IN ({})".format(', '.join('?' * len(states))), states)
+            else:
+                cursor = self._db.executemany(
+                    "UPDATE transfers SET state = 'pending', error = NULL, worker = NULL "
+                    "WHERE id = ? AND (state != 'running' OR ?)",
+                    [(id_, force) for id_ in ids])
+            return cursor.rowcount
+
+    def recover(self):
+        """Return items left running by workers that are no longer alive to pending.
+
+        :returns: number of items returned to pending
+        """
+        with self._transaction():
+            rows = self._db.execute("SELECT id, worker FROM transfers "
+                                    "WHERE state = 'running'").fetchall()
+            dead = [(row['id'],) for row in rows if not _worker_alive(row['worker'])]
+            self._db.executemany("UPDATE transfers SET state = 'pending', worker = NULL "
+                                 "WHERE id = ?", dead)
+        return len(dead)
+
+    def _hosts(self):
+        """(protocol, host) of pending items"""
+        with self._lock:
+            return [tuple(row) for row in self._db.execute(
+                "SELECT DISTINCT protocol, host FROM transfers WHERE state = 'pending'")]
+
+    def _claim(self, protocol, host):
+        """Mark the next pending item for ``host`` as running and return it, or None
+        """
+        with self._transaction():
+            row = self._db.execute("SELECT * FROM transfers WHERE state = 'pending' "
+                                   "AND protocol = ? AND host = ? ORDER BY id LIMIT 1",
+                                   (protocol, host)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE transfers SET state = 'running', worker = ?, "
+                                 "attempts = attempts + 1 WHERE id = ?", (_worker_id(), row['id']))
+        return None if row is None else dict(row)
+
+    def _finish(self, id_, size, elapsed):
+        with self._lock:
+            self._db.execute("UPDATE transfers SET state = 'done', size = ?, elapsed = ?, "
+                             "error = NULL, finished = ? WHERE id = ?",
+                             (size, elapsed, time.time(), id_))
+
+    def _fail(self, id_, error, elapsed):
+        with self._lock:
+            self._db.execute("UPDATE transfers SET state = 'failed', error = ?, elapsed = ?, "
+                             "finished = ? WHERE id = ?", (error, elapsed, time.time(), id_))
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _drain_host(queue, protocol, host, kwargs, counts, counts_lock, logger):
+    """Carry out pending items for one host until there are none left
+    """
+    session = None
+    try:
+        while True:
+            item = queue._claim(protocol, host)
+            if item is None:
+                break
+            t0 = time.time()
+            try:
+                if session is None:
+                    hostname, host_kwargs = _split_port(host, kwargs)
+                    session = PROTOCOLS[protocol](hostname, logger=logger, **host_kwargs)
+                if item['direction'] == 'put':
+                    session.put(item['localfile'], item['remotefile'], resume=True,
+                                resume_check=RESUME_CHECK)
+                else:
+                    session.get(item['remotefile'], item['localfile'], resume=True,
+                                resume_check=RESUME_CHECK)
+            except Exception as err:
+                queue._fail(item['id'], '{}: {}'.format(type(err).__name__, err),
+                            time.time() - t0)
+                with counts_lock:
+                    counts['failed'] += 1
+                if logger:
+                    logger.info('ska_ftp: transfer {} failed: {}'.format(item['id'], err))
+            else:
+                queue._finish(item['id'], os.path.getsize(item['localfile']), time.time() - t0)
+                with counts_lock:
+                    counts['done'] += 1
+    finally:
+        if session is not None:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+
+def run_worker(queue, sessions_per_host=2, follow=False, poll=5.0, netrcfile=None,
+               logger=None, retry=None, **kwargs):
+    """Carry out the pending transfers in ``queue``.
+
+    Items left running by a dead worker are first returned to pending.  Each
+    host gets up to ``sessions_per_host`` sessions, each with its own thread
+    that takes the next pending item for that host until there are none left.
+
+    :param queue: TransferQueue or SQLite file name
+    :param sessions_per_host: concurrent sessions for each host
+    :param follow: keep running and check for new items every ``poll`` seconds
+        (default=False, return when the queue is drained)
+    :param poll: interval for checking for new items (sec)
+    :param netrcfile: netrc file with credentials (default=~/.netrc)
+    :param logger: logger object (e.g. pyyaks.logger.get_logger())
+    :param retry: ska_ftp.retry.RetryPolicy for each session (default=RetryPolicy())
+    :param **kwargs: additional keyword args for ``SFTP`` or ``FTP``
+    :returns: dict with the number of items 'done' and 'failed' by this worker
+    """
+    if not isinstance(queue, TransferQueue):
+        queue = TransferQueue(queue)
+    kwargs = dict(kwargs, netrcfile=netrcfile, retry=retry or RetryPolicy())
+    counts = {'done': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+    recovered = queue.recover()
+    if recovered and logger:
+        logger.info('ska_ftp: returned {} interrupted transfers to the queue'.format(recovered))
+
+    threads = {}
+    while True:
+        for key in queue._hosts():
+            alive = [thread for thread in threads.get(key, []) if thread.is_alive()]
+            while len(alive) < sessions_per_host:
+                thread = threading.Thread(target=_drain_host,
+                                          args=(queue,) + key + (kwargs, counts,
+                                                                 counts_lock, logger),
+                                          daemon=True)
+                thread.start()
+                alive.append(thread)
+            threads[key] = alive
+        alive = [thread for key_threads in threads.values() for thread in key_threads
+                 if thread.is_alive()]
+        if alive:
+            alive[0].join(poll)
+        elif follow:
+            time.sleep(poll)
+        else:
+            break
+    return counts
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='Persistent queue of file transfers')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE,
+                        help='Queue file (default={})'.format(DEFAULT_QUEUE))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = subparsers.add_parser('enqueue', help='Add transfers to the queue')
+    enqueue.add_argument('direction', choices=['put', 'get'], help='Transfer direction')
+    enqueue.add_argument('host', help='Host name or host:port')
+    enqueue.add_argument('dest_dir', help='Destination directory (remote for put, local '
+                                          'for get)')
+    enqueue.add_argument('files', nargs='+', help='Local (put) or remote (get) files')
+    enqueue.add_argument('--protocol', default='sftp', choices=sorted(PROTOCOLS),
+                         help='Protocol (default=sftp)')
+
+    status = subparsers.add_parser('status', help='Show the number of items in each state')
+    status.add_argument('--state', choices=STATES, help='Also list the items in this state')
+
+    retry = subparsers.add_parser('retry', help='Return failed items to pending')
+    retry.add_argument('ids', nargs='*', type=int, help='Item ids (default=all failed)')
+    retry.add_argument('--force', action='store_true',
+                       help='Also return running items to pending (e.g. of a stuck worker)')
+    return parser
+
+
+def main(args=None):
+    opt = get_parser().parse_args(args)
+    with TransferQueue(os.path.expanduser(opt.queue)) as queue:
+        if opt.command == 'enqueue':
+            if opt.direction == 'put':
+                ids = queue.put(opt.host, [(path, posixpath.join(opt.dest_dir,
+                                                                 os.path.basename(path)))
+                                           for path in opt.files], protocol=opt.protocol)
+            else:
+                ids = queue.get(opt.host, [(path, os.path.join(opt.dest_dir,
+                                                               posixpath.basename(path)))
+                                           for path in opt.files], protocol=opt.protocol)
+            print('Queued {} transfers'.format(len(ids)))
+        elif opt.command == 'status':
+            for state, count in queue.counts().items():
+                print('{:8s} {}'.format(state, count))
+            if opt.state:
+                for item in queue.items(opt.state):
+                    print('{id:6d} {direction} {host} {localfile} {remotefile} '
+                          '{error}'.format(**item))
+        else:
+            n_items = queue.retry(opt.ids or None, force=opt.force)
+            print('Returned {} items to pending'.format(n_items))
+    return 0
+
+
+def get_worker_parser():
+    parser = argparse.ArgumentParser(description='Carry out the transfers in the queue')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE,
+                        help='Queue file (default={})'.format(DEFAULT_QUEUE))
+    parser.add_argument('--sessions-per-host', type=int, default=2,
+                        help='Concurrent sessions for each host (default=2)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep running and wait for new transfers')
+    parser.add_argument('--poll', type=float, default=5.0,
+                        help='Interval for checking for new transfers in sec (default=5)')
+    parser.add_argument('--netrc', help='Netrc file with credentials (default=~/.netrc)')
+    return parser
+
+
+def worker_main(args=None):
+    opt = get_worker_parser().parse_args(args)
+    counts = run_worker(os.path.expanduser(opt.queue), sessions_per_host=opt.sessions_per_host,
+                        follow=opt.follow, poll=opt.poll, netrcfile=opt.netrc)
+    print('Transferred {done} files, {failed} failed'.format(**counts))
+    return 0 if counts['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
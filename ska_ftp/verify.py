@@ -0,0 +1,72 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Checksum verification of transfers.
+
+Data are hashed as they stream through ``get()`` or ``put()``.  The digest is
+then compared to a hash computed by the server (SFTP ``check-file`` extension,
+FTP ``HASH`` or ``XMD5``/``XSHA1``/``XSHA256``/``XSHA512``) or, if the server
+cannot hash files, to a sidecar checksum file ``<remotefile>.<algorithm>`` in
+``md5sum`` format.
+"""
+
+import hashlib
+
+__all__ = ['ChecksumError', 'new_hasher', 'hash_file', 'parse_sidecar']
+
+ALGORITHMS = ('md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512')
+
+# Names used by the FTP HASH command (draft-bryan-ftpext-hash)
+FTP_HASH_NAMES = {'md5': 'MD5', 'sha1': 'SHA-1', 'sha256': 'SHA-256', 'sha512': 'SHA-512'}
+
+
+class ChecksumError(IOError):
+    """Transferred data do not match the remote checksum"""
+
+
+def new_hasher(algorithm):
+    """Return a new hashlib object for ``algorithm`` (e.g. 'md5' or 'sha256').
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError('verify must be one of {}'.format(', '.join(ALGORITHMS)))
+    return hashlib.new(algorithm)
+
+
+def hash_file(path, hasher, length=None, block_size=2 ** 20):
+    """Update ``hasher`` with the first ``length`` bytes of local file ``path``
+    (default=whole file).
+    """
+    with open(path, 'rb') as fh:
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = block_size if remaining is None else min(block_size, remaining)
+            data = fh.read(size)
+            if not data:
+                break
+            hasher.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+    return hasher
+
+
+def parse_sidecar(text):
+    """Digest (bytes) from the contents of an ``md5sum`` style checksum file.
+    """
+    return bytes.fromhex(text.split()[0])
+
+
+def check(session, remotefile, algorithm, digest):
+    """Compare ``digest`` to the remote hash of ``remotefile``.
+
+    :returns: True if the hashes match, None if no remote hash is available
+    :raises ChecksumError: if the hashes differ
+    """
+    remote_digest = session._remote_hash(remotefile, algorithm)
+    if remote_digest is None:
+        if session.logger:
+            session.logger.info('ska_ftp: no {} hash available for {}'
+                                .format(algorithm, remotefile))
+        return None
+    if remote_digest != digest:
+        raise ChecksumError('{} mismatch for {}!  local {} != remote {}'.format(
+            algorithm, remotefile, digest.hex(), remote_digest.hex()))
+    return True
@@ -0,0 +1,201 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Recursive traversal of a remote directory tree with concurrent listing.
+
+``walk()`` works like ``os.walk()`` (top-down) but lists up to ``workers``
+directories at a time, each worker using its own clone of the session (a new
+channel for SFTP, a new connection for FTP).  Results are yielded as soon as
+each listing arrives, so directories come in completion order and only the
+frontier of directories still to be listed is held in memory.  ``glob()``
+matches a pattern against the tree and only descends into directories that
+can lead to a match.
+"""
+
+import queue
+import fnmatch
+import threading
+import posixpath
+from collections import deque
+
+__all__ = ['walk', 'glob']
+
+
+def _raise(err):
+    raise err
+
+
+def _relpath(dirpath, top):
+    """Path of ``dirpath`` relative to ``top`` (as yielded by walk)"""
+    return dirpath[len(top):].lstrip('/')
+
+
+def _split(entries):
+    dir_entries = [entry for entry in entries if entry.is_dir]
+    file_entries = [entry for entry in entries if not entry.is_dir]
+    return dir_entries, file_entries
+
+
+def _walk_serial(session, top, onerror):
+    todo = deque([top])
+    while todo:
+        dirpath = todo.popleft()
+        try:
+            entries = session.ls_entries(dirpath)
+        except Exception as err:
+            if onerror is not None:
+                onerror(err)
+            continue
+        dir_entries, file_entries = _split(entries)
+        yield dirpath, dir_entries, file_entries
+        todo.extend(posixpath.join(dirpath, entry.name) for entry in dir_entries)
+
+
+def _walk_entries(session, top, workers=4, onerror=None):
+    """Generator of (dirpath, dir_entries, file_entries) for the tree at ``top``
+    where the entries are RemoteEntry lists.  Remove items from ``dir_entries``
+    to skip those directories.
+    """
+    if workers <= 1:
+        yield from _walk_serial(session, top, onerror)
+        return
+
+    cwd = session._cwd()
+    work = queue.Queue()
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def worker():
+        try:
+            worker_session = session._clone(cwd)
+        except Exception as err:
+            results.put((None, None, err))
+            return
+        try:
+            while True:
+                dirpath = work.get()
+                if dirpath is None or stop.is_set():
+                    break
+                try:
+                    results.put((dirpath, worker_session.ls_entries(dirpath), None))
+                except Exception as err:
+                    results.put((dirpath, None, err))
+        finally:
+            try:
+                worker_session.close()
+            except Exception:
+                pass
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    outstanding = 1
+    work.put(top)
+    n_failed = 0
+    try:
+        while outstanding:
+            dirpath, entries, err = results.get()
+            if dirpath is None:
+                # Worker could not connect, the others carry on
+                n_failed += 1
+                if n_failed == workers:
+                    raise err
+                continue
+            outstanding -= 1
+            if err is not None:
+                if onerror is not None:
+                    onerror(err)
+                continue
+            dir_entries, file_entries = _split(entries)
+            yield dirpath, dir_entries, file_entries
+            for entry in dir_entries:
+                work.put(posixpath.join(dirpath, entry.name))
+                outstanding += 1
+    finally:
+        stop.set()
+        for _ in threads:
+            work.put(None)
+
+
+def walk(session, top, workers=4, onerror=None):
+    """Generate ``(dirpath, dirnames, filenames)`` for each directory in the remote
+    tree rooted at ``top``, like ``os.walk()``.
+
+    Sibling directories are listed concurrently by ``workers`` clones of
+    ``session`` (with ``workers=1`` the tree is listed serially by ``session``
+    itself).  Directories are yielded in completion order, always after their
+    parent.  As with ``os.walk()`` the caller can remove names from
+    ``dirnames`` to skip those subdirectories, and listing errors are ignored
+    unless ``onerror`` is given.  Symbolic links to directories are not followed.
+
+    :param session: ska_ftp.SFTP or ska_ftp.FTP object
+    :param top: remote directory
+    :param workers: maximum number of concurrent directory listings
+    :param onerror: function called with the exception if a listing fails
+    :returns: generator of (dirpath, dirnames, filenames)
+    """
+    for dirpath, dir_entries, file_entries in _walk_entries(session, top or '.',
+                                                            workers, onerror):
+        dirnames = [entry.name for entry in dir_entries]
+        yield dirpath, dirnames, [entry.name for entry in file_entries]
+        keep = set(dirnames)
+        dir_entries[:] = [entry for entry in dir_entries if entry.name in keep]
+
+
+def _has_magic(part):
+    return any(char in part for char in '*?[')
+
+
+def _match(parts, patterns):
+    """True if path ``parts`` match ``patterns`` (where '**' matches any depth)"""
+    if not patterns:
+        return not parts
+    if patterns[0] == '**':
+        return any(_match(parts[ii:], patterns[1:]) for ii in range(len(parts) + 1))
+    return (bool(parts) and fnmatch.fnmatchcase(parts[0], patterns[0])
+            and _match(parts[1:], patterns[1:]))
+
+
+def _may_contain(parts, patterns):
+    """True if a path below directory ``parts`` could match ``patterns``"""
+    if not parts:
+        return bool(patterns)
+    if not patterns:
+        return False
+    if patterns[0] == '**':
+        return True
+    return (fnmatch.fnmatchcase(parts[0], patterns[0])
+            and _may_contain(parts[1:], patterns[1:]))
+
+
+def glob(session, pattern, workers=4, onerror=None):
+    """Generate remote paths that match ``pattern``, e.g. ``'data/*/2026*/*.fits.gz'``.
+
+    Each path component is matched with ``fnmatch`` rules (``*``, ``?`` and
+    ``[...]``, which also match names starting with a dot) and a ``**``
+    component matches any number of directories.  The tree is traversed with
+    ``walk()`` below the leading components that have no wildcards, skipping
+    directories that cannot contain a match.  Paths are yielded as they are
+    found, not sorted.
+
+    :param session: ska_ftp.SFTP or ska_ftp.FTP object
+    :param pattern: remote path pattern
+    :param workers: maximum number of concurrent directory listings
+    :param onerror: function called with the exception if a listing fails
+    :returns: generator of matching paths
+    """
+    parts = pattern.split('/')
+    root = []
+    while len(parts) > 1 and not _has_magic(parts[0]):
+        root.append(parts.pop(0))
+    patterns = [part for part in parts if part]
+    root = '/'.join(root) if root != [''] else '/'
+
+    top = root or '.'
+    for dirpath, dirnames, filenames in walk(session, top, workers, onerror):
+        reldir = _relpath(dirpath, top)
+        relparts = reldir.split('/') if reldir else []
+        for name in dirnames + filenames:
+            if _match(relparts + [name], patterns):
+                yield posixpath.join(root, reldir, name)
+        dirnames[:] = [name for name in dirnames if _may_contain(relparts + [name], patterns)]